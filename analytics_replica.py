@@ -0,0 +1,234 @@
+from bson import ObjectId
+from db import GRADE_FIELDS, coerce_grade, parse_comment, parse_comment_blob
+import argparse
+import datetime
+import logging
+import sqlite3
+import json
+import os
+
+DEFAULT_PATH = os.getenv('ANALYTICS_DB_PATH', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'analytics.sqlite3'))
+# Feedback _ids are generated when the answer is spooled, which can be a
+# while before the document reaches MongoDB, so every sync re-reads a window
+# behind the high-water mark. Rows are upserted, so re-reading is harmless.
+DEFAULT_LOOKBACK_SECONDS = int(os.getenv('ANALYTICS_SYNC_LOOKBACK', '600'))
+SYNC_PROJECTION = {'user_email': 1, 'video_name': 1, 'submitted_at': 1, 'comments': 1,
+                   **{field: 1 for field in GRADE_FIELDS}}
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS feedbacks (
+    id TEXT PRIMARY KEY,
+    user_email TEXT,
+    video_name TEXT,
+    safety INTEGER,
+    speed INTEGER,
+    convenience INTEGER,
+    submitted_at TEXT NOT NULL,
+    comment_count INTEGER NOT NULL DEFAULT 0
+);
+CREATE INDEX IF NOT EXISTS feedbacks_video_submitted ON feedbacks (video_name, submitted_at);
+CREATE INDEX IF NOT EXISTS feedbacks_submitted ON feedbacks (submitted_at);
+CREATE TABLE IF NOT EXISTS comments (
+    feedback_id TEXT NOT NULL REFERENCES feedbacks (id),
+    video_name TEXT,
+    start REAL,
+    end REAL,
+    text TEXT
+);
+CREATE INDEX IF NOT EXISTS comments_feedback ON comments (feedback_id);
+CREATE INDEX IF NOT EXISTS comments_video_start ON comments (video_name, start);
+CREATE TABLE IF NOT EXISTS sync_state (
+    key TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+def _iso(value):
+    if isinstance(value, datetime.datetime):
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=datetime.timezone.utc)
+        return value.astimezone(datetime.timezone.utc).isoformat()
+    return value
+
+
+def _text(value):
+    """Bind any stored value as TEXT; documents are not validated on the way in"""
+    if value is None or isinstance(value, str):
+        return value
+    return json.dumps(value, default=str) if isinstance(value, (dict, list)) else str(value)
+
+
+def _parse_stored_comments(feedback_id, comments):
+    """Parse a stored comment list, skipping comments that fail validation"""
+    if not isinstance(comments, list):
+        return []
+    parsed = []
+    for comment in comments:
+        if not isinstance(comment, dict):
+            continue
+        try:
+            parsed.append(parse_comment(comment))
+        except ValueError as e:
+            logging.warning(f"Skipping an invalid comment of feedback {feedback_id}: {e}")
+    return parsed
+
+
+class AnalyticsReplica:
+    """Local, indexed SQLite copy of the feedbacks collection.
+
+    sync() tails feedbacks by _id from a high-water mark stored in the
+    replica itself, so runs are incremental and an interrupted run resumes
+    where the last committed batch ended. Each batch is written in one
+    transaction together with the new high-water mark. Reporting queries go
+    through the small facade below and never touch MongoDB.
+    """
+
+    def __init__(self, path=DEFAULT_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def get_high_water_mark(self):
+        row = self.connection.execute("SELECT value FROM sync_state WHERE key = 'last_id'").fetchone()
+        return ObjectId(row['value']) if row else None
+
+    def sync(self, database, batch_size=1000, lookback_seconds=DEFAULT_LOOKBACK_SECONDS, full=False):
+        """Copy new feedbacks from MongoDB; returns the number of rows written"""
+        high_water_mark = None if full else self.get_high_water_mark()
+        after_id = None
+        if high_water_mark is not None:
+            start = high_water_mark.generation_time - datetime.timedelta(seconds=lookback_seconds)
+            after_id = ObjectId.from_datetime(start)
+
+        collection = database.get_collection('feedbacks')
+        written = 0
+        while True:
+            query = {'_id': {'$gt': after_id}} if after_id is not None else {}
+            batch = list(collection.find(query, projection=SYNC_PROJECTION).sort('_id', 1).limit(batch_size))
+            if not batch:
+                break
+            self._write_batch(batch, high_water_mark)
+            written += len(batch)
+            after_id = batch[-1]['_id']
+            if high_water_mark is None or after_id > high_water_mark:
+                high_water_mark = after_id
+            logging.info(f"Synced {written} feedbacks into {self.path}")
+        return written
+
+    def _write_batch(self, documents, high_water_mark):
+        feedback_rows = []
+        comment_rows = []
+        for document in documents:
+            feedback_id = str(document['_id'])
+            try:
+                feedback_row, rows = self._rows_for(feedback_id, document)
+            except Exception:
+                # One malformed document must not hold back the rest of the collection
+                logging.error(f"Skipping feedback {feedback_id} in the analytics replica", exc_info=True)
+                continue
+            feedback_rows.append(feedback_row)
+            comment_rows.extend(rows)
+
+        last_id = documents[-1]['_id']
+        if high_water_mark is not None and high_water_mark > last_id:
+            last_id = high_water_mark
+        with self.connection:
+            self.connection.executemany('DELETE FROM comments WHERE feedback_id = ?',
+                                        [(row[0],) for row in feedback_rows])
+            self.connection.executemany(
+                'INSERT OR REPLACE INTO feedbacks (id, user_email, video_name, safety, speed, convenience, '
+                'submitted_at, comment_count) VALUES (?, ?, ?, ?, ?, ?, ?, ?)', feedback_rows)
+            self.connection.executemany(
+                'INSERT INTO comments (feedback_id, video_name, start, end, text) VALUES (?, ?, ?, ?, ?)',
+                comment_rows)
+            self.connection.execute("INSERT OR REPLACE INTO sync_state (key, value) VALUES ('last_id', ?)",
+                                    (str(last_id),))
+
+    def _rows_for(self, feedback_id, document):
+        """Return the feedbacks row and the comments rows of one document"""
+        comments = document.get('comments') or []
+        if isinstance(comments, str):
+            comments = parse_comment_blob(comments) or []
+        else:
+            comments = _parse_stored_comments(feedback_id, comments)
+        submitted_at = document.get('submitted_at')
+        if not isinstance(submitted_at, (datetime.datetime, str)):
+            submitted_at = document['_id'].generation_time
+        video_name = _text(document.get('video_name'))
+        feedback_row = (
+            feedback_id,
+            _text(document.get('user_email')),
+            video_name,
+            *(coerce_grade(document.get(field)) for field in GRADE_FIELDS),
+            _iso(submitted_at),
+            len(comments),
+        )
+        comment_rows = [(feedback_id, video_name, comment['start'], comment['end'], comment['text'])
+                        for comment in comments]
+        return feedback_row, comment_rows
+
+    def query(self, sql, params=()):
+        """Run a read-only query against the replica"""
+        return [dict(row) for row in self.connection.execute(sql, params)]
+
+    def mean_ratings_by_video(self, since=None, until=None):
+        """Mean grades and feedback count per video, optionally for a date range"""
+        conditions, params = self._time_range(since, until)
+        return self.query(
+            'SELECT video_name, COUNT(*) AS count, AVG(safety) AS safety, AVG(speed) AS speed, '
+            f'AVG(convenience) AS convenience FROM feedbacks {conditions} '
+            'GROUP BY video_name ORDER BY video_name', params)
+
+    def comments_between(self, video_name, start, end):
+        """Comments on a video that start within [start, end] seconds"""
+        return self.query(
+            'SELECT feedback_id, start, end, text FROM comments '
+            'WHERE video_name = ? AND start BETWEEN ? AND ? ORDER BY start', (video_name, start, end))
+
+    def _time_range(self, since, until):
+        conditions, params = [], []
+        if since:
+            conditions.append('submitted_at >= ?')
+            params.append(_iso(since))
+        if until:
+            conditions.append('submitted_at < ?')
+            params.append(_iso(until))
+        return ('WHERE ' + ' AND '.join(conditions)) if conditions else '', params
+
+
+def main(argv=None):
+    from feedback_export import parse_date
+
+    parser = argparse.ArgumentParser(description='Sync and query the local SQLite analytics replica.')
+    parser.add_argument('--path', default=DEFAULT_PATH)
+    subcommands = parser.add_subparsers(dest='command', required=True)
+    sync_parser = subcommands.add_parser('sync', help='copy new feedbacks from MongoDB')
+    sync_parser.add_argument('--full', action='store_true', help='re-read the whole collection')
+    sync_parser.add_argument('--batch-size', type=int, default=1000)
+    means_parser = subcommands.add_parser('means', help='mean ratings by video')
+    means_parser.add_argument('--since')
+    means_parser.add_argument('--until')
+    args = parser.parse_args(argv)
+
+    replica = AnalyticsReplica(args.path)
+    try:
+        if args.command == 'sync':
+            from db import Database
+            written = replica.sync(Database(), batch_size=args.batch_size, full=args.full)
+            print(f"✅ Synced {written} feedbacks into {args.path}")
+        else:
+            rows = replica.mean_ratings_by_video(parse_date(args.since), parse_date(args.until))
+            print(json.dumps(rows, indent=2))
+    finally:
+        replica.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -1,75 +1,71 @@
-from flask import Flask, jsonify, render_template, request, redirect, session, url_for, send_from_directory
-import csv
-from google.cloud import storage
-from google.auth.transport.requests import Request
-from google.oauth2 import service_account
+from flask import Flask, Response, g, jsonify, render_template, request, redirect, session, url_for, send_file, stream_with_context
 import datetime
-import requests
+import logging
+import hmac
 import json
 import os
 from dotenv import load_dotenv
-from db import Database
-import tests.verify_credentials
-from configManager import ConfigManager
+from services import Services
+from logging_config import configure_logging
+import metrics
+from video_proxy import proxy_blob
+from page_cache import RenderedPageCache, etag_matches
+from static_assets import StaticAssets
 
 basedir = os.path.abspath(os.path.dirname(__file__))
 static_folder = os.path.join(basedir, 'static')
 CREDENTIALS_PATH = os.path.join(basedir,'credentials','google_cloud_key.json')
-config_manager = ConfigManager()
+
+configure_logging()
 
 app = Flask(__name__, static_folder='static') # the change to 'static' is to fetch the static folder from the root of the project
 app.secret_key = 'your_secret_key'  # Needed for session management
+static_assets = StaticAssets(app.static_folder)
+static_assets.init_app(app)
+metrics.init_app(app, g, request)
 load_dotenv()  # Load environment variables from a .env file
 
-print("\n=== Initializing Application ===")
-try:
-    # First verify environment variables
-    bucket_name = config_manager.get_bucket_name()
-    print(f"Using bucket: {bucket_name}")
-    
-    if config_manager.initialize_with_base64_credentials():
-        storage_client = config_manager.get_storage_client()
-        bucket = config_manager.get_bucket()
-        
-        if storage_client and bucket:
-            app.config['storage_client'] = storage_client
-            app.config['bucket'] = bucket
-            print("✅ Application initialized successfully")
-        else:
-            print("❌ Failed to get storage client or bucket")
-            app.config['storage_client'] = None
-            app.config['bucket'] = None
-    else:
-        print("❌ Failed to initialize with credentials")
-        app.config['storage_client'] = None
-        app.config['bucket'] = None
-        
-except Exception as e:
-    print(f"❌ Error during initialization: {str(e)}")
-    app.config['storage_client'] = None
-    app.config['bucket'] = None
-
-
-# #bucket_name = 'feedbackbucket14'
-# google_key = os.getenv('GOOGLE_APPLICATION_CREDENTIALS')
-# storage_client = config_manager.initialize_storage_client()
-# if storage_client:
-#     bucket = config_manager.get_bucket()
-    
-# else:
-#     print("Storage client not initialized")
-#     bucket = None
-
-videos_folder = os.path.join(basedir, 'videos')
-app.config['VIDEOS_FOLDER'] = videos_folder
+# GCS, MongoDB and everything built on them are created on first use, in the
+# worker that uses them, so importing this module does no network I/O
+services = Services()
 
+# VIDEO_DELIVERY=proxy streams videos through /static/videos/<video_name>
+# instead of redirecting the browser to the bucket; VIDEO_DELIVERY=cache
+# also keeps hot videos on local disk in VIDEOS_FOLDER
+VIDEO_DELIVERY = os.getenv('VIDEO_DELIVERY', 'redirect').lower()
 
-#connect to the database
-print("Connecting to the database")
-db = Database()
+app.config['VIDEOS_FOLDER'] = os.getenv('VIDEOS_FOLDER', os.path.join(basedir, 'videos'))
 app.config['MONGO_URI'] = os.getenv('MONGO_URI')
-VIDEOS_FOLDER = os.path.join(os.getcwd(), 'videos')
-app.config['VIDEOS_FOLDER'] = VIDEOS_FOLDER
+
+# The gallery and home page are the same for every participant until the
+# bucket changes, so they are rendered once per catalog version.
+# GALLERY_DEBUG=true adds the catalog dump to the gallery.
+page_cache = RenderedPageCache()
+GALLERY_DEBUG = os.getenv('GALLERY_DEBUG', 'false').lower() == 'true'
+
+
+def create_app(app_services=None):
+    """Return the app, wired to app_services (e.g. Services(bucket=fake)) if given"""
+    global services
+    if app_services is not None:
+        services = app_services
+    app.extensions['services'] = services
+    return app
+
+
+@app.route('/healthz')
+def healthz():
+    # Liveness: the process is serving requests
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+def readyz():
+    # Readiness: storage and the database are reachable
+    checks = services.readiness()
+    status = 200 if all(checks.values()) else 503
+    return jsonify({'ready': status == 200, 'checks': checks}), status
+
 
 # Home page with links to each video
 @app.route('/', methods=['GET', 'POST'])
@@ -79,9 +75,9 @@ def home():
         session['user_email'] = user_email
         return redirect(url_for('home'))
 
-    user_email = session.get('user_email', None)
-    videos = list_videos() if user_email else {}
-    return render_template('home.html', videos=videos, user_email=user_email)
+    # home.html shows neither the participant nor the catalog, so one
+    # rendering serves everyone and survives catalog changes
+    return cached_page('home', lambda: render_template('home.html'), catalog=False)
 
 @app.route('/sign_in', methods=['POST'])
 def sign_in():
@@ -103,9 +99,12 @@ def submit_questionnaire():
     if not user_email:
         return "User ID is missing.", 400  # Handle cases where there is no user ID
 
-    comments = json.loads(request.form.get('comments', '[]'))
-    summarized_comments = []
-    to_saved_comment = f"Original comment: {comments}\nAnalyzed comment: {summarized_comments}"
+    # Imported here so that importing the app does not load pymongo
+    from db import FeedbackWriteError, coerce_grades, parse_comments
+    try:
+        comments = parse_comments(json.loads(request.form.get('comments') or '[]'))
+    except ValueError:
+        return "Invalid comments.", 400
 
     # Retrieve the form data
     data = {
@@ -114,28 +113,128 @@ def submit_questionnaire():
         'safety': request.form.get('safety'),
         'speed': request.form.get('speed'),
         'convenience': request.form.get('convenience'),
-        'comments':  to_saved_comment
-             
+        'comments': comments,
+        # Filled in by the background CommentAnalyzer once the feedback is written
+        'analyzed_comments': [],
+        'submitted_at': datetime.datetime.now(datetime.timezone.utc)
     }
+    coerce_grades(data)
     
-    db.insert_data('feedbacks', data)
+    try:
+        services.feedback_writer.submit(data)
+    except FeedbackWriteError:
+        return "Your answers could not be saved, please try again.", 503
     return redirect(url_for('thank_you'))
 
 
+@app.route('/api/feedback-summary')
+@app.route('/api/feedback-summary/<video_name>')
+def feedback_summary(video_name=None):
+    db = services.db
+    if db is None:
+        return jsonify({'error': 'Database unavailable'}), 503
+    try:
+        summaries = db.get_feedback_summary(video_name)
+    except Exception as e:
+        logging.error(f"Error reading feedback summary: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+    if video_name and not summaries:
+        return jsonify({'error': 'Video not found'}), 404
+    return jsonify(summaries[0] if video_name else summaries)
+
+
+@app.route('/api/videos')
+def api_videos():
+    """One page of the video catalog: ?sort=name|updated|-updated&limit=24&cursor=..."""
+    from video_catalog import parse_page_args
+    if not session.get('user_email'):
+        return jsonify({'error': 'Not signed in'}), 401
+    video_catalog = services.video_catalog
+    if not video_catalog:
+        return jsonify({'error': 'Storage service unavailable'}), 503
+    try:
+        sort, cursor, limit = parse_page_args(request.args)
+        videos, next_cursor = video_catalog.get_page(sort, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cards = [{
+        'id': video_id,
+        'title': video['title'],
+        'url': video['url'],
+        'thumbnail': video.get('thumbnail'),
+        'updated': video.get('updated'),
+        'page_url': url_for('video_page', video_name=video_id),
+    } for video_id, video in present_videos(videos).items()]
+    return jsonify({'videos': cards, 'next_cursor': next_cursor})
+
+
+@app.route('/api/videos/<video_name>/heatmap')
+def comment_heatmap_view(video_name):
+    comment_heatmap = services.comment_heatmap
+    if comment_heatmap is None:
+        return jsonify({'error': 'Database unavailable'}), 503
+    from comment_heatmap import MIN_BIN_SECONDS
+    try:
+        bin_seconds = float(request.args.get('bin', 1))
+        if not MIN_BIN_SECONDS <= bin_seconds <= 3600:
+            raise ValueError
+    except ValueError:
+        return jsonify({'error': f'bin must be a number of seconds between {MIN_BIN_SECONDS} and 3600'}), 400
+    try:
+        return jsonify(comment_heatmap.get(video_name, bin_seconds))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        logging.error(f"Error building comment heatmap: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+
+
+@app.route('/export/feedbacks.<export_format>')
+def export_feedbacks_view(export_format):
+    from feedback_export import EXPORT_FORMATS, export_feedbacks, parse_date
+    # Exports contain participant emails, so they need EXPORT_TOKEN, sent as
+    # "Authorization: Bearer <token>" to keep it out of URLs and access logs
+    export_token = os.getenv('EXPORT_TOKEN')
+    authorization = request.headers.get('Authorization', '')
+    scheme, _, provided = authorization.partition(' ')
+    if (not export_token or scheme.lower() != 'bearer'
+            or not hmac.compare_digest(provided.strip().encode('utf-8'), export_token.encode('utf-8'))):
+        return "Forbidden", 403
+    if export_format not in EXPORT_FORMATS:
+        return "Unknown export format", 404
+    db = services.db
+    if db is None:
+        return "Database unavailable", 503
+    try:
+        since = parse_date(request.args.get('since'))
+        until = parse_date(request.args.get('until'))
+    except ValueError:
+        return "since/until must be ISO dates", 400
+
+    chunks = export_feedbacks(db, export_format, request.args.get('video_name'), since, until)
+    _, mimetype = EXPORT_FORMATS[export_format]
+    return Response(stream_with_context(chunks), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename=feedbacks.{export_format}',
+        'X-Accel-Buffering': 'no',
+    })
+
+
 @app.route('/video_gallery')
 def video_gallery():
     if not session.get('user_email'):
         return redirect(url_for('home'))
-    if not storage_client or not bucket:
-        print("Storage client not available")
+    if not services.storage_client or not services.bucket:
+        logging.warning("Storage client not available")
         return "Storage service unavailable", 503
     try:
-        videos = list_videos()
-        if not videos and not storage_client:
-            return "Error connecting to storage", 500
-        return render_template('videos.html', videos=videos, bucket_name=bucket_name)
+        # Only the first page is rendered; the page fetches the rest from /api/videos as it scrolls
+        def render():
+            videos, next_cursor = services.video_catalog.get_page()
+            return render_template('videos.html', videos=present_videos(videos), next_cursor=next_cursor,
+                                   bucket_name=services.bucket_name, debug=GALLERY_DEBUG)
+        return cached_page(('videos', GALLERY_DEBUG), render)
     except Exception as e:
-        print(f"Error in video gallery: {e}")
+        logging.error(f"Error in video gallery: {e}")
         return "An error occurred", 500
     
 
@@ -158,124 +257,91 @@ def questionnaire_form():
 @app.route('/static/Videos/<video_name>')
 def video_page(video_name):
     # return render_template('video_page.html', video_name=video_name)
-    videos = list_videos()
-    video = videos.get(video_name)
+    video = get_video(video_name)
     if not video:
         return "Video not found", 404
     return render_template('video_page.html', video=video, video_name=video_name)
 
+def cached_page(key, render, catalog=True):
+    """Serve a page from the render cache with a strong ETag, or 304 if the client has it
+
+    Pages that show the catalog are cached per catalog version.
+    """
+    version = ttl = None
+    if catalog:
+        video_catalog = services.video_catalog
+        version = video_catalog.peek_version() if video_catalog else None
+        url_signer = services.url_signer
+        # Signed URLs expire on their own, so pages embedding them are re-rendered
+        # while the URLs still have at least min_remaining / 2 left
+        ttl = url_signer.min_remaining / 2 if url_signer else None
+    body, etag = page_cache.get((key, version), render, ttl)
+    response = Response(status=304) if etag_matches(request, etag) else Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
 def list_videos():
-    videos = {}
-    try:
-        print("\n=== DEBUG: list_videos() ===")
-        print(f"Storage Client Status: {'Initialized' if storage_client else 'Not Initialized'}")
-        print(f"Bucket Name: {bucket_name}")
-        
-        if not storage_client or not bucket:
-            print("ERROR: Storage client or bucket not initialized")
-            return videos
-        
-        print("Attempting to list blobs...")
-        blobs = bucket.list_blobs()
-        blob_count = 0
-        video_count = 0
-        
-        # List all blobs for debugging
-        for blob in blobs:
-            blob_count += 1
-            print(f"Found blob: {blob.name}")
-            
-            if blob.name.endswith('.mp4'):
-                video_count += 1
-                video_id = os.path.splitext(blob.name)[0]
-                video_url = f"https://storage.googleapis.com/{bucket_name}/{blob.name}"
-                
-                # Create video entry
-                videos[video_id] = {
-                    'title': blob.name.replace('_', ' ').replace('.mp4', ''),
-                    'url': video_url,
-                    'raw_name': blob.name,
-                    'size': blob.size,
-                    'updated': blob.updated.isoformat(),
-                    'public_url': blob.public_url if hasattr(blob, 'public_url') else None,
-                }
-                      # Try to generate thumbnail URL if exists
-                thumbnail_name = f"{video_id}.jpg"
-                if any(b.name == thumbnail_name for b in bucket.list_blobs(prefix=thumbnail_name)):
-                    videos[video_id]['thumbnail'] = f"https://storage.googleapis.com/{bucket_name}/{thumbnail_name}"
-                
-                print(f"Added video {video_count}:")
-                print(f"  ID: {video_id}")
-                print(f"  URL: {video_url}")
-                print(f"  Size: {blob.size} bytes")
-                print(f"  Last Updated: {blob.updated}")
-        
-        print(f"\nSummary:")
-        print(f"Total blobs found: {blob_count}")
-        print(f"Total videos added: {video_count}")
-        
-        if video_count == 0:
-            print("\nTroubleshooting suggestions:")
-            print("1. Verify bucket contains .mp4 files")
-            print("2. Check bucket permissions")
-            print("3. Verify bucket name is correct")
-            print(f"4. Current bucket name: {bucket_name}")
-        
-        print("=== END DEBUG ===\n")
-        
-    except Exception as e:
-        print("\n=== ERROR in list_videos() ===")
-        print(f"Error type: {type(e).__name__}")
-        print(f"Error message: {str(e)}")
-        import traceback
-        print("Traceback:")
-        print(traceback.format_exc())
-        print("=== END ERROR ===\n")
-    
+    """Return the cached {video_id: video} catalog of the bucket"""
+    video_catalog = services.video_catalog
+    if not video_catalog:
+        logging.error("Storage client or bucket not initialized")
+        return {}
+    return present_videos(video_catalog.get_videos())
+
+
+def present_videos(videos):
+    """Sign and/or rewrite the urls of some {video_id: video} catalog entries for this deployment"""
+    url_signer = services.url_signer
+    if url_signer:
+        videos = url_signer.sign_videos(videos)
+    if VIDEO_DELIVERY != 'redirect':
+        videos = {video_id: dict(video, url=url_for('serve_video', video_name=video_id))
+                  for video_id, video in videos.items()}
     return videos
 
 
+def get_video(video_id):
+    """Look up one video without listing the bucket"""
+    video_catalog = services.video_catalog
+    if not video_catalog:
+        return None
+    video = video_catalog.get_video(video_id)
+    url_signer = services.url_signer
+    if video and url_signer:
+        video = url_signer.sign_video(video)
+    if video and VIDEO_DELIVERY != 'redirect':
+        video = dict(video, url=url_for('serve_video', video_name=video_id))
+    return video
+
+
 @app.route('/static/videos/<video_name>')
 def serve_video(video_name):
-    print(f"Serving video: {video_name}")
-    videos = list_videos()
-    video = videos.get(video_name)
+    logging.debug(f"Serving video: {video_name}")
+    video_catalog = services.video_catalog
+    if VIDEO_DELIVERY in ('proxy', 'cache') and video_catalog:
+        blob = video_catalog.get_video_blob(video_name)
+        if blob is None:
+            return "Video not found", 404
+        path = None
+        video_cache = services.video_cache if VIDEO_DELIVERY == 'cache' else None
+        if video_cache:
+            try:
+                path = video_cache.get_path(blob)
+            except Exception as e:
+                logging.error(f"Error caching video {video_name}: {e}")
+        if path is None:
+            return proxy_blob(blob, request)
+        # conditional=True answers Range requests; the file goes out via sendfile
+        return send_file(path, mimetype='video/mp4', conditional=True, etag=str(blob.generation),
+                         last_modified=blob.updated, max_age=3600)
+    video = get_video(video_name)
     if not video:
         return "Video not found", 404
     return redirect(video['url'])
 
 
-        
-@app.route('/save_parsed_anlyazed_comment', methods=['POST'])
-def save_parsed_anlyazed_comment(comments, video_name, user_email, grades):
-    
-    comment_parsed = comment_parse(comments)
-    print(f"Comment parsed in save_parsed_anlyazed_comment: {comment_parsed}")
-    safety , speed, convenience = grades['safety'], grades['speed'], grades['convenience']   
-    # comment_with_paramters = f"{comment_parsed} ,analyze this with the next parameters: video_name:{video_name}\n user_email:{user_email}\n the next grades is 1-5 when 1 is the lowest and 5 is the highest\n safety:{safty}\n speed:{speed}\n convenience:{convenience}" 
-    comment_with_paramters = f"""
-    {comment_parsed}
-    Analyze this with the following parameters:
-    - Video Name: {video_name}
-    - User ID: {user_email}
-    The next grades are from 1 to 5, where 1 is the lowest and 5 is the highest:
-    - Safety: {safety}
-    - Speed: {speed}
-    - Convenience: {convenience}
-"""
-    return comment_parsed
-
-
-@app.route('/comment_parse')
-def comment_parse(comments):
-    parsed_comment = ""
-    i=1
-    for i, comment_data in enumerate(comments, start=1):
-        comment = comment_data['comment']
-        time = comment_data['time']
-        parsed_comment += f"Comment number {i}\nTime: {time}\nComment: {comment}\n"
-    return parsed_comment
-    
 @app.route('/thank_you')
 def thank_you():
     session.pop('user_email', None)
@@ -288,35 +354,6 @@ def logout():
 
 
 
-# Function to save answers to a CSV file
-def save_answers_csv(user_email, video_name, safety, speed, convenience, time=None, comment=None):
-    # Define the full path to the CSV file
-    csv_file_path = os.path.join(os.getcwd(), 'answers.csv')
-
-    # Open a CSV file and append the data
-    with open(csv_file_path, 'a', newline='') as csvfile:
-        fieldnames = ['user_email', 'video_name', 'safety', 'speed', 'convenience', 'time', 'comment']
-        writer = csv.DictWriter(csvfile, fieldnames=fieldnames)
-        
-        # Check if we need to write headers (simplified check)
-        csvfile.seek(0, 2)  # Seek to the end of the file
-        if csvfile.tell() == 0:  # If file is empty, write the header
-            writer.writeheader()
-
-        # Write the data row
-        writer.writerow({
-            'user_email': user_email,
-            'video_name': video_name, 
-            'safety': safety, 
-            'speed': speed, 
-            'convenience': convenience,
-            'time': time,
-            'comment': comment
-        })
-        
-        
-
-
 if __name__ == '__main__':
     port = int(os.environ.get('PORT', 5000))
     app.run(host='0.0.0.0', port=port, debug=True)
@@ -0,0 +1,320 @@
+"""Async serving mode: the participant-facing routes of app.py on an event loop.
+
+Run it under an ASGI server instead of gunicorn's sync workers, e.g.
+
+    hypercorn asgi_app:app --workers 2 --bind 0.0.0.0:$PORT
+
+Each worker handles many participants at once: bucket listings and object
+metadata go through async_gcs over a pooled httpx client, MongoDB reads use
+pymongo's asyncio client, and answers are handed to the same spool-backed
+FeedbackWriter as the WSGI app, whose thread does the inserts. The routes,
+templates, sessions and static assets are the same as app.py's; the
+heatmap and export endpoints stay on the WSGI app.
+"""
+from quart import Quart, Response, g, jsonify, render_template, request, redirect, session, url_for, send_from_directory
+import datetime
+import asyncio
+import logging
+import json
+import os
+from dotenv import load_dotenv
+from services import Services
+from logging_config import configure_logging
+import metrics
+from static_assets import StaticAssets, mimetype_for
+from video_proxy import plan_blob_response
+from page_cache import RenderedPageCache, etag_matches
+
+load_dotenv()
+configure_logging()
+
+app = Quart(__name__, static_folder='static')
+app.secret_key = 'your_secret_key'  # Must match app.py so sessions work in both modes
+static_assets = StaticAssets(app.static_folder)
+static_assets.load()
+app.url_defaults(static_assets.fingerprint_url)
+metrics.init_app(app, g, request)
+
+services = Services()
+
+# Same settings as app.py. VIDEO_DELIVERY=cache streams like proxy here,
+# since the disk cache downloads with the synchronous client.
+VIDEO_DELIVERY = os.getenv('VIDEO_DELIVERY', 'redirect').lower()
+SIGNED_URLS = os.getenv('VIDEO_URL_MODE', 'public').lower() == 'signed'
+page_cache = RenderedPageCache()
+GALLERY_DEBUG = os.getenv('GALLERY_DEBUG', 'false').lower() == 'true'
+
+
+def create_app(app_services=None):
+    """Return the app, wired to app_services (e.g. Services(async_bucket=fake)) if given"""
+    global services
+    if app_services is not None:
+        services = app_services
+    app.extensions['services'] = services
+    return app
+
+
+async def resource(name):
+    """Return a Services resource, building it off the event loop the first time"""
+    if services.is_initialized(name):
+        return getattr(services, name)
+    return await asyncio.to_thread(getattr, services, name)
+
+
+async def serve_static(filename):
+    if filename not in static_assets.originals:
+        return await app.send_static_file(filename)
+    variant, encoding = static_assets.variant_for(filename, request.accept_encodings)
+    response = await send_from_directory(static_assets.build_dir, variant, mimetype=mimetype_for(filename))
+    return static_assets.finish_response(response, filename, encoding)
+
+
+app.view_functions['static'] = serve_static
+
+
+@app.after_serving
+async def close_clients():
+    if services.is_initialized('async_bucket') and services.async_bucket is not None:
+        await services.async_bucket.aclose()
+    if services.is_initialized('async_db') and services.async_db is not None:
+        await services.async_db.close()
+
+
+@app.route('/healthz')
+async def healthz():
+    return jsonify({'status': 'ok'})
+
+
+@app.route('/readyz')
+async def readyz():
+    checks = {'storage': await resource('async_bucket') is not None}
+    try:
+        database = await resource('async_db')
+        checks['database'] = database is not None and await database.ping()
+    except Exception as e:
+        logging.error(f"Database readiness check failed: {e}")
+        checks['database'] = False
+    status = 200 if all(checks.values()) else 503
+    return jsonify({'ready': status == 200, 'checks': checks}), status
+
+
+@app.route('/', methods=['GET', 'POST'])
+async def home():
+    if request.method == 'POST':
+        session['user_email'] = (await request.form).get('user_email')
+        return redirect(url_for('home'))
+
+    # home.html shows neither the participant nor the catalog, so one
+    # rendering serves everyone and survives catalog changes
+    return await cached_page('home', lambda: render_template('home.html'), catalog=False)
+
+
+@app.route('/sign_in', methods=['POST'])
+async def sign_in():
+    user_email = (await request.form).get('user_email')
+    session['user_email'] = user_email
+    if user_email and "@" in user_email:
+        return redirect(url_for('video_gallery'))
+    return "Invalid Email", 401
+
+
+@app.route('/submit-questionnaire', methods=['POST'])
+async def submit_questionnaire():
+    from db import FeedbackWriteError, coerce_grades, parse_comments
+    user_email = session.get('user_email')
+    if not user_email:
+        return "User ID is missing.", 400
+
+    form = await request.form
+    try:
+        comments = parse_comments(json.loads(form.get('comments') or '[]'))
+    except ValueError:
+        return "Invalid comments.", 400
+
+    data = {
+        'user_email': user_email,
+        'video_name': form.get('video_name'),
+        'safety': form.get('safety'),
+        'speed': form.get('speed'),
+        'convenience': form.get('convenience'),
+        'comments': comments,
+        # Filled in by the background CommentAnalyzer once the feedback is written
+        'analyzed_comments': [],
+        'submitted_at': datetime.datetime.now(datetime.timezone.utc)
+    }
+    coerce_grades(data)
+
+    feedback_writer = await resource('feedback_writer')
+    # submit() only appends to the spool and enqueues, but the spool's
+    # periodic fsync must not stall the event loop
+    try:
+        await asyncio.to_thread(feedback_writer.submit, data)
+    except FeedbackWriteError:
+        return "Your answers could not be saved, please try again.", 503
+    return redirect(url_for('thank_you'))
+
+
+@app.route('/api/feedback-summary')
+@app.route('/api/feedback-summary/<video_name>')
+async def feedback_summary(video_name=None):
+    database = await resource('async_db')
+    if database is None:
+        return jsonify({'error': 'Database unavailable'}), 503
+    try:
+        summaries = await database.get_feedback_summary(video_name)
+    except Exception as e:
+        logging.error(f"Error reading feedback summary: {e}")
+        return jsonify({'error': 'An error occurred'}), 500
+    if video_name and not summaries:
+        return jsonify({'error': 'Video not found'}), 404
+    return jsonify(summaries[0] if video_name else summaries)
+
+
+@app.route('/api/videos')
+async def api_videos():
+    """One page of the video catalog: ?sort=name|updated|-updated&limit=24&cursor=..."""
+    from video_catalog import parse_page_args
+    if not session.get('user_email'):
+        return jsonify({'error': 'Not signed in'}), 401
+    video_catalog = await resource('async_video_catalog')
+    if not video_catalog:
+        return jsonify({'error': 'Storage service unavailable'}), 503
+    try:
+        sort, cursor, limit = parse_page_args(request.args)
+        videos, next_cursor = await video_catalog.get_page(sort, cursor, limit)
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    cards = [{
+        'id': video_id,
+        'title': video['title'],
+        'url': video['url'],
+        'thumbnail': video.get('thumbnail'),
+        'updated': video.get('updated'),
+        'page_url': url_for('video_page', video_name=video_id),
+    } for video_id, video in (await present_videos(videos)).items()]
+    return jsonify({'videos': cards, 'next_cursor': next_cursor})
+
+
+@app.route('/video_gallery')
+async def video_gallery():
+    if not session.get('user_email'):
+        return redirect(url_for('home'))
+    if await resource('async_video_catalog') is None:
+        logging.warning("Storage client not available")
+        return "Storage service unavailable", 503
+    try:
+        async def render():
+            video_catalog = await resource('async_video_catalog')
+            videos, next_cursor = await video_catalog.get_page()
+            return await render_template('videos.html', videos=await present_videos(videos),
+                                         next_cursor=next_cursor, bucket_name=services.bucket_name,
+                                         debug=GALLERY_DEBUG)
+        return await cached_page(('videos', GALLERY_DEBUG), render)
+    except Exception as e:
+        logging.error(f"Error in video gallery: {e}")
+        return "An error occurred", 500
+
+
+@app.route('/questionnaire')
+async def questionnaire_form():
+    video_name = request.args.get('video_name', 'DefaultVideo')
+    return await render_template('questionnaire.html', video_name=video_name)
+
+
+@app.route('/static/Videos/<video_name>')
+async def video_page(video_name):
+    video = await get_video(video_name)
+    if not video:
+        return "Video not found", 404
+    return await render_template('video_page.html', video=video, video_name=video_name)
+
+
+async def cached_page(key, render, catalog=True):
+    """Serve a page from the render cache with a strong ETag, or 304 if the client has it
+
+    Pages that show the catalog are cached per catalog version.
+    """
+    version = ttl = None
+    if catalog:
+        video_catalog = await resource('async_video_catalog')
+        version = video_catalog.peek_version() if video_catalog else None
+        url_signer = await resource('url_signer') if SIGNED_URLS else None
+        # Signed URLs expire on their own, so pages embedding them are re-rendered
+        # while the URLs still have at least min_remaining / 2 left
+        ttl = url_signer.min_remaining / 2 if url_signer else None
+    body, etag = await page_cache.get_async((key, version), render, ttl)
+    response = Response('', status=304) if etag_matches(request, etag) else Response(body, mimetype='text/html')
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'private, no-cache'
+    return response
+
+
+async def list_videos():
+    """Return the cached {video_id: video} catalog of the bucket"""
+    video_catalog = await resource('async_video_catalog')
+    if not video_catalog:
+        logging.error("Storage client or bucket not initialized")
+        return {}
+    return await present_videos(await video_catalog.get_videos())
+
+
+async def present_videos(videos):
+    """Sign and/or rewrite the urls of some {video_id: video} catalog entries for this deployment"""
+    url_signer = await resource('url_signer') if SIGNED_URLS else None
+    if url_signer:
+        videos = url_signer.sign_videos(videos)
+    if VIDEO_DELIVERY != 'redirect':
+        videos = {video_id: dict(video, url=url_for('serve_video', video_name=video_id))
+                  for video_id, video in videos.items()}
+    return videos
+
+
+async def get_video(video_id):
+    """Look up one video without listing the bucket"""
+    video_catalog = await resource('async_video_catalog')
+    if not video_catalog:
+        return None
+    video = await video_catalog.get_video(video_id)
+    url_signer = await resource('url_signer') if SIGNED_URLS else None
+    if video and url_signer:
+        video = url_signer.sign_video(video)
+    if video and VIDEO_DELIVERY != 'redirect':
+        video = dict(video, url=url_for('serve_video', video_name=video_id))
+    return video
+
+
+@app.route('/static/videos/<video_name>', methods=['GET', 'HEAD'])
+async def serve_video(video_name):
+    video_catalog = await resource('async_video_catalog')
+    if VIDEO_DELIVERY in ('proxy', 'cache') and video_catalog:
+        blob = await video_catalog.get_video_blob(video_name)
+        if blob is None:
+            return "Video not found", 404
+        status, headers, window = plan_blob_response(blob, request.headers, request.method)
+        if window is None:
+            return Response(b'', status=status, headers=headers)
+        start, end = window
+        response = Response(video_catalog.bucket.iter_range(blob, start, end), status=status, headers=headers)
+        # RESPONSE_TIMEOUT would cut off any video that takes longer than it to send
+        response.timeout = None
+        return response
+    video = await get_video(video_name)
+    if not video:
+        return "Video not found", 404
+    return redirect(video['url'])
+
+
+@app.route('/thank_you')
+async def thank_you():
+    session.pop('user_email', None)
+    return await render_template('thank_you.html')
+
+
+@app.route('/logout')
+async def logout():
+    session.pop('user_email', None)
+    return '', 204
+
+
+if __name__ == '__main__':
+    app.run(host='0.0.0.0', port=int(os.environ.get('PORT', 5000)))
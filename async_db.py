@@ -0,0 +1,45 @@
+from pymongo import AsyncMongoClient
+from mongo_connection import get_connection_manager
+from db import summarize_feedback
+import logging
+
+
+class AsyncDatabase:
+    """Read access to MongoDB for the ASGI app, without blocking the event loop.
+
+    Uses pymongo's native asyncio client with the same URI, pool size and
+    timeouts as the synchronous client in mongo_connection. The client is
+    created on first use, inside the worker's event loop.
+    """
+
+    def __init__(self, connection_manager=None):
+        self.connection_manager = connection_manager or get_connection_manager()
+        # Fail fast on a malformed URI; the network is not touched here
+        self.db_name = self.connection_manager.get_database_name()
+        self._client = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            self._client = AsyncMongoClient(self.connection_manager.mongo_uri, connect=False,
+                                            **self.connection_manager.client_options())
+        return self._client
+
+    @property
+    def db(self):
+        return self.client.get_database(self.db_name)
+
+    async def ping(self):
+        await self.client.admin.command('ping')
+        return True
+
+    async def get_feedback_summary(self, video_name=None):
+        """Same result as Database.get_feedback_summary()"""
+        query = {'_id': video_name} if video_name else {}
+        return [summarize_feedback(summary) async for summary in self.db['feedback_summary'].find(query)]
+
+    async def close(self):
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+            logging.info("Closed async MongoDB client")
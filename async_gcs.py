@@ -0,0 +1,237 @@
+from google.auth.transport.requests import Request
+from urllib.parse import quote
+from gcs_client import HTTP_POOL_SIZE, READ_TIMEOUT, RETRY_DEADLINE_SECONDS
+from video_catalog import DEFAULT_PAGE_SIZE, LIST_FIELDS, VIDEO_GLOB, VideoCatalog, decode_cursor
+from video_proxy import DEFAULT_CHUNK_SIZE, STREAM_RETRIES, IncompleteStream
+import metrics
+import datetime
+import logging
+import asyncio
+import random
+import httpx
+import time
+
+API_URL = 'https://storage.googleapis.com/storage/v1'
+MEDIA_URL = 'https://storage.googleapis.com/download/storage/v1'
+BLOB_FIELDS = 'name,generation,size,updated,crc32c,contentType'
+RETRYABLE_STATUS = (408, 429, 500, 502, 503, 504)
+
+
+class GcsObject:
+    """The metadata of one object, with the attributes VideoCatalog reads"""
+
+    def __init__(self, bucket_name, resource):
+        self.name = resource['name']
+        self.generation = int(resource['generation'])
+        self.size = int(resource.get('size', 0))
+        self.crc32c = resource.get('crc32c')
+        self.content_type = resource.get('contentType')
+        updated = resource.get('updated')
+        self.updated = datetime.datetime.fromisoformat(updated.replace('Z', '+00:00')) if updated else None
+        self.public_url = f"https://storage.googleapis.com/{bucket_name}/{quote(self.name)}"
+
+
+class AsyncBucket:
+    """Non-blocking access to a bucket's metadata and media over the JSON API.
+
+    Uses one pooled httpx.AsyncClient per bucket, created inside the running
+    event loop. Access tokens come from the same credentials as the shared
+    storage.Client, whose background refresher keeps them valid; a token is
+    only fetched here (off the event loop) if it has expired anyway. Calls
+    use the timeouts of gcs_client and are retried on transient errors for
+    up to RETRY_DEADLINE_SECONDS.
+    """
+
+    def __init__(self, name, credentials, pool_size=HTTP_POOL_SIZE):
+        self.name = name
+        self.credentials = credentials
+        self.pool_size = pool_size
+        self._client = None
+        self._token_lock = None
+
+    def _http(self):
+        if self._client is None:
+            connect_timeout, read_timeout = READ_TIMEOUT
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size))
+        return self._client
+
+    async def _auth_headers(self):
+        if not self.credentials.valid:
+            if self._token_lock is None:
+                # Created on first use, inside the running loop: on Python 3.9
+                # a Lock is bound to the event loop current when it is created
+                self._token_lock = asyncio.Lock()
+            async with self._token_lock:
+                if not self.credentials.valid:
+                    await asyncio.to_thread(self.credentials.refresh, Request())
+        return {'Authorization': f"Bearer {self.credentials.token}"}
+
+    async def _get_json(self, url, params):
+        client = self._http()
+        deadline = time.monotonic() + RETRY_DEADLINE_SECONDS
+        delay = 0.5
+        while True:
+            try:
+                response = await client.get(url, params=params, headers=await self._auth_headers())
+                if response.status_code not in RETRYABLE_STATUS:
+                    if response.status_code == 404:
+                        return None
+                    response.raise_for_status()
+                    return response.json()
+                error = httpx.HTTPStatusError(f"GCS returned {response.status_code}",
+                                              request=response.request, response=response)
+            except httpx.TransportError as e:
+                error = e
+            if time.monotonic() + delay > deadline:
+                raise error
+            logging.warning(f"Retrying GCS request to {url}: {error}")
+            await asyncio.sleep(delay * random.uniform(0.5, 1.5))
+            delay = min(delay * 2, 8)
+
+    async def list_blobs(self, fields=LIST_FIELDS, prefix=None):
+        """Return every object in the bucket, following nextPageToken"""
+        params = {'fields': fields, 'maxResults': 1000}
+        if prefix:
+            params['prefix'] = prefix
+        blobs = []
+        while True:
+            page = await self._get_json(f"{API_URL}/b/{self.name}/o", params) or {}
+            blobs.extend(GcsObject(self.name, item) for item in page.get('items', []))
+            if not page.get('nextPageToken'):
+                return blobs
+            params['pageToken'] = page['nextPageToken']
+
+    async def list_page(self, max_results, start_offset=None, match_glob=None, fields=LIST_FIELDS):
+        """Return up to max_results objects from start_offset on, in a single request"""
+        params = {'fields': fields, 'maxResults': max_results}
+        if start_offset:
+            params['startOffset'] = start_offset
+        if match_glob:
+            params['matchGlob'] = match_glob
+        page = await self._get_json(f"{API_URL}/b/{self.name}/o", params) or {}
+        return [GcsObject(self.name, item) for item in page.get('items', [])]
+
+    async def get_blob(self, name):
+        """Return one object's metadata, or None if it does not exist"""
+        resource = await self._get_json(f"{API_URL}/b/{self.name}/o/{quote(name, safe='')}",
+                                        {'fields': BLOB_FIELDS})
+        return GcsObject(self.name, resource) if resource else None
+
+    async def iter_range(self, blob, start, end, chunk_size=DEFAULT_CHUNK_SIZE, retries=STREAM_RETRIES):
+        """Yield bytes start..end (inclusive) of a generation of a blob as they arrive
+
+        A stream that fails or ends early is resumed from the current offset
+        up to retries times per response; after that IncompleteStream is
+        raised, like video_proxy.iter_blob_range.
+        """
+        url = f"{MEDIA_URL}/b/{self.name}/o/{quote(blob.name, safe='')}"
+        params = {'alt': 'media', 'generation': blob.generation}
+        position = start
+        failures = 0
+        while True:
+            try:
+                headers = await self._auth_headers()
+                headers['Range'] = f"bytes={position}-{end}"
+                async with self._http().stream('GET', url, params=params, headers=headers) as response:
+                    if response.status_code in RETRYABLE_STATUS:
+                        raise httpx.HTTPStatusError(f"GCS returned {response.status_code}",
+                                                    request=response.request, response=response)
+                    response.raise_for_status()
+                    async for chunk in response.aiter_bytes(chunk_size):
+                        chunk = chunk[:end - position + 1]
+                        position += len(chunk)
+                        yield chunk
+                if position > end:
+                    return
+                error = f"the stream ended at byte {position}"
+            except (httpx.TransportError, httpx.HTTPStatusError) as e:
+                if isinstance(e, httpx.HTTPStatusError) and e.response.status_code not in RETRYABLE_STATUS:
+                    raise
+                error = e
+            failures += 1
+            if failures > retries:
+                raise IncompleteStream(f"Gave up on {blob.name} at byte {position} of {start}-{end}: {error}")
+            logging.warning(f"Resuming {blob.name} from byte {position}: {error}")
+            await asyncio.sleep(0.1 * failures)
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+class AsyncVideoCatalog(VideoCatalog):
+    """VideoCatalog for an AsyncBucket, used from an event loop.
+
+    Same caching as VideoCatalog, but listings and lookups are awaited and
+    the stale-while-revalidate refresh runs as a task instead of a thread.
+    Concurrent callers share the one refresh in flight.
+    """
+
+    def __init__(self, bucket, bucket_name, **kwargs):
+        super().__init__(bucket, bucket_name, **kwargs)
+        self._refresh_task = None
+
+    async def get_videos(self):
+        if self._loaded_at is None:
+            await self.refresh()
+        elif self.is_stale():
+            self.refresh_in_background()
+        return self._videos
+
+    async def get_page(self, sort='name', cursor=None, limit=DEFAULT_PAGE_SIZE):
+        after = decode_cursor(cursor, sort)
+        if sort == 'name' and self._loaded_at is None:
+            self.refresh_in_background()
+            return self._page_from_listing(await self._list_page(after, limit), after, limit)
+        await self.get_videos()
+        return self._page_from_catalog(sort, after, limit)
+
+    async def _list_page(self, after, limit):
+        try:
+            blobs = await self.bucket.list_page(limit + 2, start_offset=after[0] if after else None,
+                                                match_glob=VIDEO_GLOB)
+        except Exception:
+            metrics.gcs_call('list', 'error')
+            logging.error("Failed to list a page of videos", exc_info=True)
+            return []
+        metrics.gcs_call('list')
+        return blobs
+
+    async def get_video(self, video_id):
+        return (await self._lookup(video_id))[0]
+
+    async def get_video_blob(self, video_id):
+        return (await self._lookup(video_id))[1]
+
+    async def _lookup(self, video_id):
+        cached = self._cached_lookup(video_id)
+        if cached is not None:
+            return cached
+        try:
+            blob = await self.bucket.get_blob(f"{video_id}.mp4")
+        except Exception:
+            metrics.gcs_call('get', 'error')
+            logging.error(f"Failed to fetch metadata for video {video_id}", exc_info=True)
+            return None, None
+        return self._remember_lookup(video_id, blob)
+
+    def refresh_in_background(self):
+        if self._refresh_task is not None and not self._refresh_task.done():
+            return False
+        self._refresh_task = asyncio.get_running_loop().create_task(self._refresh())
+        return True
+
+    async def refresh(self):
+        self.refresh_in_background()
+        # shield() so a cancelled request does not cancel the shared refresh
+        await asyncio.shield(self._refresh_task)
+        return self._videos
+
+    async def _refresh(self):
+        try:
+            self._apply_listing(await self.bucket.list_blobs(fields=LIST_FIELDS))
+        except Exception:
+            self._refresh_failed()
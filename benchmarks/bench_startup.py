@@ -0,0 +1,86 @@
+"""Benchmark app startup: module import and the first requests, with stubbed services.
+
+Each run is a fresh interpreter with the GCS and MongoDB credentials removed
+from the environment, so it needs no network and catches any import-time I/O:
+
+    python benchmarks/bench_startup.py [--runs 10] [--budget-ms 300]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+SCRUBBED_ENV = ('GOOGLE_CREDENTIALS_BASE64', 'GOOGLE_CREDENTIALS_JSON', 'MONGO_URI')
+
+
+def child():
+    start = time.perf_counter()
+    import app
+    import_ms = (time.perf_counter() - start) * 1000
+    heavy = [name for name in ('google.cloud.storage', 'pymongo', 'numpy') if name in sys.modules]
+
+    from benchmarks.fakes import FakeBucket, FakeDatabase, FakeFeedbackWriter
+    from services import Services
+    database = FakeDatabase()
+    flask_app = app.create_app(Services(storage_client=object(), bucket=FakeBucket(), db=database,
+                                        feedback_writer=FakeFeedbackWriter(database)))
+    client = flask_app.test_client()
+    with client.session_transaction() as session:
+        session['user_email'] = 'bench@example.com'
+
+    timings = {}
+    for path in ('/readyz', '/video_gallery', '/video_gallery'):
+        start = time.perf_counter()
+        response = client.get(path)
+        elapsed = (time.perf_counter() - start) * 1000
+        assert response.status_code == 200, (path, response.status_code)
+        timings.setdefault(path, []).append(elapsed)
+    print(json.dumps({
+        'import_ms': import_ms,
+        'readyz_ms': timings['/readyz'][0],
+        'first_gallery_ms': timings['/video_gallery'][0],
+        'warm_gallery_ms': timings['/video_gallery'][1],
+        'heavy_modules_at_import': heavy,
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--budget-ms', type=float, default=300.0,
+                        help='fail if the median import takes longer than this')
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.child:
+        child()
+        return
+
+    env = {key: value for key, value in os.environ.items() if key not in SCRUBBED_ENV}
+    results = []
+    for _ in range(args.runs):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--child'], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        results.append(json.loads(output.strip().splitlines()[-1]))
+
+    for key in ('import_ms', 'readyz_ms', 'first_gallery_ms', 'warm_gallery_ms'):
+        values = [result[key] for result in results]
+        print(f"{key:>18}: median {statistics.median(values):7.1f} ms, max {max(values):7.1f} ms")
+    heavy = results[0]['heavy_modules_at_import']
+    if heavy:
+        print(f"❌ Importing the app loaded {', '.join(heavy)}")
+        sys.exit(1)
+    import_ms = statistics.median(result['import_ms'] for result in results)
+    if import_ms > args.budget_ms:
+        print(f"❌ Median import is over the {args.budget_ms} ms budget")
+        sys.exit(1)
+    print("✅ Startup is within budget and does no import-time I/O")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,158 @@
+"""In-memory stand-ins for GCS and MongoDB, injected through services.Services"""
+import asyncio
+import datetime
+import threading
+import time
+
+
+class FakeBlob:
+    def __init__(self, name, generation=1, size=1024):
+        self.name = name
+        self.generation = generation
+        self.size = size
+        self.crc32c = None
+        self.content_type = 'video/mp4' if name.endswith('.mp4') else 'image/jpeg'
+        self.updated = datetime.datetime(2024, 1, 1, tzinfo=datetime.timezone.utc)
+        self.public_url = f"https://storage.googleapis.com/fake-bucket/{name}"
+
+
+class FakeBucket:
+    """Bucket of `videos` videos, half with thumbnails, that sleeps `latency` per call
+
+    Pass names to hold exactly those objects instead.
+    """
+
+    name = 'fake-bucket'
+
+    def __init__(self, videos=500, latency=0.0, names=None):
+        self.latency = latency
+        if names is None:
+            names = []
+            for i in range(videos):
+                names.append(f"video_{i}.mp4")
+                if i % 2 == 0:
+                    names.append(f"thumbnails/video_{i}.jpg")
+        self.blobs = {name: FakeBlob(name) for name in names}
+        self.calls = {'list_blobs': 0, 'get_blob': 0}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def list_blobs(self, prefix=None, max_results=None, start_offset=None, match_glob=None, **kwargs):
+        self._call('list_blobs')
+        return self.matching(prefix, max_results, start_offset, match_glob)
+
+    def matching(self, prefix=None, max_results=None, start_offset=None, match_glob=None):
+        # Only the '**.mp4' style of glob that VideoCatalog uses
+        suffix = match_glob.lstrip('*') if match_glob else ''
+        names = sorted(name for name in self.blobs if (not prefix or name.startswith(prefix))
+                       and (not start_offset or name >= start_offset) and name.endswith(suffix))
+        return [self.blobs[name] for name in names[:max_results]]
+
+    def get_blob(self, name, **kwargs):
+        self._call('get_blob')
+        return self.blobs.get(name)
+
+    def exists(self):
+        return True
+
+
+class FakeDatabase:
+    """Enough of db.Database for the web routes, counting writes"""
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.documents = []
+        self.calls = {'insert': 0, 'ping': 0}
+        self._lock = threading.Lock()
+
+    def _call(self, name):
+        with self._lock:
+            self.calls[name] += 1
+        if self.latency:
+            time.sleep(self.latency)
+
+    def ping(self):
+        self._call('ping')
+        return True
+
+    def ensure_indexes(self):
+        return True
+
+    def insert_data(self, collection_name, document):
+        return self.insert_many_new(collection_name, [document])
+
+    def insert_many_new(self, collection_name, documents):
+        self._call('insert')
+        with self._lock:
+            self.documents.extend(documents)
+        return list(documents), []
+
+    def get_feedback_summary(self, video_name=None):
+        return []
+
+
+class FakeFeedbackWriter:
+    """Writes each submitted answer straight to a FakeDatabase"""
+
+    def __init__(self, database):
+        self.database = database
+
+    def submit(self, document):
+        self.database.insert_many_new('feedbacks', [document])
+
+    def queue_depth(self):
+        return 0
+
+
+class FakeAsyncBucket:
+    """async_gcs.AsyncBucket over a FakeBucket, awaiting `latency` per call"""
+
+    def __init__(self, bucket, latency=None):
+        self.bucket = bucket
+        self.name = bucket.name
+        self.latency = bucket.latency if latency is None else latency
+
+    async def _call(self, name):
+        with self.bucket._lock:
+            self.bucket.calls[name] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+    async def list_blobs(self, fields=None, prefix=None):
+        await self._call('list_blobs')
+        return [blob for name, blob in self.bucket.blobs.items() if not prefix or name.startswith(prefix)]
+
+    async def list_page(self, max_results, start_offset=None, match_glob=None, fields=None):
+        await self._call('list_blobs')
+        return self.bucket.matching(None, max_results, start_offset, match_glob)
+
+    async def get_blob(self, name):
+        await self._call('get_blob')
+        return self.bucket.blobs.get(name)
+
+    async def iter_range(self, blob, start, end, chunk_size=1024 * 1024):
+        yield bytes(end - start + 1)
+
+    async def aclose(self):
+        pass
+
+
+class FakeAsyncDatabase:
+    """async_db.AsyncDatabase over a FakeDatabase"""
+
+    def __init__(self, database):
+        self.database = database
+
+    async def ping(self):
+        return self.database.ping()
+
+    async def get_feedback_summary(self, video_name=None):
+        return self.database.get_feedback_summary(video_name)
+
+    async def close(self):
+        pass
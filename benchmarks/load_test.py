@@ -0,0 +1,282 @@
+"""Load-test the participant routes offline, against a fake bucket and Mongo stand-in.
+
+The app runs in this process on a real HTTP server, wired through
+services.Services to an in-memory bucket and database that add the given
+latency to every call, and concurrent clients drive one route at a time:
+
+    python benchmarks/load_test.py [--app flask|asgi] [--videos 500] [--clients 16]
+        [--requests 1000] [--gcs-latency 0.05] [--mongo-latency 0.01]
+        [--output results.json] [--compare baseline.json]
+
+For each route it reports p50/p95/p99 latency, throughput and the GCS and
+MongoDB calls made per request, and saves everything as JSON. --compare
+prints the change against an earlier result file and exits non-zero if a
+p95 got worse by more than --max-regression.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import logging
+import os
+import platform
+import random
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+import requests
+
+from benchmarks.fakes import FakeAsyncBucket, FakeAsyncDatabase, FakeBucket, FakeDatabase
+from db import FeedbackWriter
+from services import Services
+
+ROUTES = ('/', '/video_gallery', '/static/Videos/<id>', '/questionnaire', '/submit-questionnaire')
+
+
+def build_services(args):
+    bucket = FakeBucket(args.videos, args.gcs_latency)
+    database = FakeDatabase(args.mongo_latency)
+    writer = FeedbackWriter(database, 'feedbacks', spool=None)
+    services = Services(storage_client=object(), bucket=bucket, db=database, feedback_writer=writer,
+                        async_bucket=FakeAsyncBucket(bucket), async_db=FakeAsyncDatabase(database))
+    return services, bucket, database, writer
+
+
+class FlaskServer:
+    def __init__(self, app):
+        from werkzeug.serving import make_server
+        self.server = make_server('127.0.0.1', 0, app, threaded=True)
+        self.port = self.server.server_port
+
+    def start(self):
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+
+
+class AsgiServer:
+    def __init__(self, app, port):
+        from hypercorn.config import Config
+        self.app = app
+        self.port = port
+        self.config = Config()
+        self.config.bind = [f"127.0.0.1:{port}"]
+        self.config.accesslog = None
+        self._started = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._run, daemon=True).start()
+        self._started.wait(10)
+        wait_until_up(self.port)
+
+    def _run(self):
+        self.loop = asyncio.new_event_loop()
+        self.loop.run_until_complete(self._serve())
+
+    async def _serve(self):
+        from hypercorn.asyncio import serve
+        self._stop = asyncio.Event()
+        self._started.set()
+        await serve(self.app, self.config, shutdown_trigger=self._stop.wait)
+
+    def stop(self):
+        self.loop.call_soon_threadsafe(self._stop.set)
+
+
+def free_port():
+    import socket
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_up(port, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            requests.get(f"http://127.0.0.1:{port}/healthz", timeout=1)
+            return
+        except requests.ConnectionError:
+            time.sleep(0.05)
+    raise RuntimeError("The app did not start")
+
+
+def start_app(args, services):
+    if args.app == 'asgi':
+        import asgi_app
+        server = AsgiServer(asgi_app.create_app(services), free_port())
+    else:
+        import app
+        server = FlaskServer(app.create_app(services))
+    server.start()
+    return server
+
+
+def make_request(route, base_url, http, videos):
+    video_id = random.choice(videos)
+    if route == '/static/Videos/<id>':
+        return http.get(f"{base_url}/static/Videos/{video_id}")
+    if route == '/questionnaire':
+        return http.get(f"{base_url}/questionnaire", params={'video_name': video_id})
+    if route == '/submit-questionnaire':
+        comments = [{'start': random.uniform(0, 60), 'end': random.uniform(60, 120), 'text': 'bench'}]
+        return http.post(f"{base_url}/submit-questionnaire", allow_redirects=False, data={
+            'video_name': video_id,
+            'safety': random.randint(1, 5),
+            'speed': random.randint(1, 5),
+            'convenience': random.randint(1, 5),
+            'comments': json.dumps(comments),
+        })
+    return http.get(f"{base_url}{route}")
+
+
+def run_route(route, args, base_url, videos):
+    local = threading.local()
+
+    def session():
+        if not hasattr(local, 'http'):
+            local.http = requests.Session()
+            local.http.post(f"{base_url}/sign_in", data={'user_email': 'bench@example.com'},
+                            allow_redirects=False)
+        return local.http
+
+    def one(_):
+        start = time.perf_counter()
+        try:
+            response = make_request(route, base_url, session(), videos)
+            ok = response.status_code < 400
+        except requests.RequestException:
+            ok = False
+        return time.perf_counter() - start, ok
+
+    with ThreadPoolExecutor(args.clients) as pool:
+        # Sign every client in before the clock starts
+        list(pool.map(lambda _: session(), range(args.clients)))
+        start = time.perf_counter()
+        outcomes = list(pool.map(one, range(args.requests)))
+        elapsed = time.perf_counter() - start
+    return outcomes, elapsed
+
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * len(sorted_values))) - 1))
+    return sorted_values[index]
+
+
+def summarize(outcomes, elapsed, gcs_calls, mongo_calls):
+    latencies = sorted(seconds * 1000 for seconds, _ in outcomes)
+    count = len(outcomes)
+    return {
+        'requests': count,
+        'errors': sum(1 for _, ok in outcomes if not ok),
+        'p50_ms': percentile(latencies, 0.50),
+        'p95_ms': percentile(latencies, 0.95),
+        'p99_ms': percentile(latencies, 0.99),
+        'mean_ms': sum(latencies) / count if count else None,
+        'throughput_rps': count / elapsed if elapsed else None,
+        'gcs_calls_per_request': {name: calls / count for name, calls in gcs_calls.items()},
+        'mongo_calls_per_request': {name: calls / count for name, calls in mongo_calls.items()},
+    }
+
+
+def diff_calls(after, before):
+    return {name: after[name] - before.get(name, 0) for name in after}
+
+
+def compare(results, baseline_path, max_regression):
+    with open(baseline_path) as f:
+        baseline = json.load(f)['routes']
+    regressed = []
+    print(f"\nCompared with {baseline_path}:")
+    for route, result in results.items():
+        previous = baseline.get(route)
+        if not previous or not previous.get('p95_ms'):
+            continue
+        p95_change = (result['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        rps_change = (result['throughput_rps'] - previous['throughput_rps']) / previous['throughput_rps']
+        print(f"{route:>22}: p95 {p95_change:+.1%}, throughput {rps_change:+.1%}")
+        if p95_change > max_regression:
+            regressed.append(route)
+    return regressed
+
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                              text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--app', choices=('flask', 'asgi'), default='flask')
+    parser.add_argument('--videos', type=int, default=500)
+    parser.add_argument('--clients', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=1000, help='requests per route')
+    parser.add_argument('--gcs-latency', type=float, default=0.05, help='seconds added to every GCS call')
+    parser.add_argument('--mongo-latency', type=float, default=0.01, help='seconds added to every Mongo call')
+    parser.add_argument('--routes', nargs='+', choices=ROUTES, default=list(ROUTES))
+    parser.add_argument('--output', help='JSON file for the results (default: benchmarks/results/<time>.json)')
+    parser.add_argument('--compare', help='earlier result file to compare against')
+    parser.add_argument('--max-regression', type=float, default=0.2,
+                        help='with --compare, fail if a p95 grows by more than this fraction')
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.WARNING)
+    logging.getLogger('werkzeug').setLevel(logging.WARNING)
+    services, bucket, database, writer = build_services(args)
+    server = start_app(args, services)
+    base_url = f"http://127.0.0.1:{server.port}"
+    videos = [f"video_{i}" for i in range(args.videos)]
+
+    results = {}
+    try:
+        for route in args.routes:
+            gcs_before, mongo_before = dict(bucket.calls), dict(database.calls)
+            outcomes, elapsed = run_route(route, args, base_url, videos)
+            # Batched feedback writes count against the route that queued them
+            writer.flush()
+            results[route] = summarize(outcomes, elapsed, diff_calls(bucket.calls, gcs_before),
+                                       diff_calls(database.calls, mongo_before))
+            result = results[route]
+            print(f"{route:>22}: p50 {result['p50_ms']:7.1f} ms  p95 {result['p95_ms']:7.1f} ms  "
+                  f"p99 {result['p99_ms']:7.1f} ms  {result['throughput_rps']:7.1f} req/s  "
+                  f"errors {result['errors']}  GCS/req {result['gcs_calls_per_request']}  "
+                  f"Mongo/req {result['mongo_calls_per_request']}")
+    finally:
+        server.stop()
+
+    report = {
+        'timestamp': datetime.datetime.now(datetime.timezone.utc).isoformat(),
+        'commit': git_commit(),
+        'python': platform.python_version(),
+        'config': vars(args),
+        'routes': results,
+    }
+    output = args.output or os.path.join(
+        ROOT, 'benchmarks', 'results', f"load_test-{args.app}-{time.strftime('%Y%m%d-%H%M%S')}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(output)), exist_ok=True)
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved results to {output}")
+
+    if args.compare:
+        regressed = compare(results, args.compare, args.max_regression)
+        if regressed:
+            print(f"❌ p95 regressed by more than {args.max_regression:.0%} on {', '.join(regressed)}")
+            sys.exit(1)
+        print("✅ No p95 regressions")
+
+
+if __name__ == '__main__':
+    main()
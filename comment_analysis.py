@@ -0,0 +1,386 @@
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from collections import Counter, OrderedDict
+import multiprocessing
+import threading
+import argparse
+import hashlib
+import logging
+import atexit
+import queue
+import time
+import re
+import os
+import metrics
+
+WORD = re.compile(r"[^\W_]+(?:'[^\W_]+)?")
+DUPLICATE_THRESHOLD = float(os.getenv('COMMENT_DUPLICATE_THRESHOLD', '0.6'))
+MAX_KEYWORDS = 5
+MAX_CACHED_ANALYSES = 10000
+MAX_REPRESENTATIVES = 1000
+MAX_CLUSTERED_VIDEOS = 256
+# Words a negator flips, counted from the negator
+NEGATION_SCOPE = 3
+
+STOPWORDS = frozenset("""
+a about above after again all also am an and any are as at be because been before being below between both
+but by can could did do does doing down during each few for from further had has have having he her here
+hers him his how i if in into is it its itself just me more most my no nor not now of off on once only or
+other our out over own same she should so some such than that the their them then there these they this
+those through to too under until up very was we were what when where which while who whom why will with
+would you your yours
+""".split())
+NEGATORS = frozenset("""
+not no never none nothing without hardly barely don't doesn't didn't isn't wasn't aren't weren't can't
+couldn't won't wouldn't shouldn't
+""".split())
+POSITIVE = frozenset("""
+good great safe safely safer smooth smoothly clear calm careful carefully nice excellent comfortable
+correct correctly fine easy confident confidently perfect better best like liked love loved helpful
+right appropriate reasonable steady stable quick efficient polite patient pleasant well
+""".split())
+NEGATIVE = frozenset("""
+bad dangerous dangerously unsafe danger risky scary scared slow slowly late abrupt abruptly sudden
+suddenly aggressive aggressively poor poorly wrong worse worst hard harsh hesitant hesitated confusing
+confused uncomfortable crash collision swerve swerved jerky problem mistake fail failed missed nervous
+awkward reckless rude annoying stuck unclear too
+""".split())
+
+
+def tokenize(text):
+    return WORD.findall(str(text or '').lower())
+
+
+def normalize(text):
+    """The comment's words, lowercased and without punctuation"""
+    return ' '.join(tokenize(text))
+
+
+def content_hash(normalized):
+    return hashlib.sha256(normalized.encode('utf-8')).hexdigest()[:16]
+
+
+def extract_keywords(tokens, limit=MAX_KEYWORDS):
+    """The most frequent non-stopwords, in order of first appearance on ties"""
+    counts = Counter(token for token in tokens if len(token) >= 3 and token not in STOPWORDS
+                     and token not in NEGATORS)
+    first_seen = {}
+    for i, token in enumerate(tokens):
+        first_seen.setdefault(token, i)
+    return sorted(counts, key=lambda token: (-counts[token], first_seen[token]))[:limit]
+
+
+def score_sentiment(tokens):
+    """Return a lexicon-based score in [-1, 1]; words just after a negator count the other way"""
+    positive = negative = 0
+    negated_until = -1
+    for i, token in enumerate(tokens):
+        if token in NEGATORS:
+            negated_until = i + NEGATION_SCOPE
+            continue
+        polarity = 1 if token in POSITIVE else -1 if token in NEGATIVE else 0
+        if i <= negated_until:
+            polarity = -polarity
+        if polarity > 0:
+            positive += 1
+        elif polarity < 0:
+            negative += 1
+    if positive + negative == 0:
+        return 0.0
+    return round((positive - negative) / (positive + negative), 3)
+
+
+def sentiment_label(score):
+    if score >= 0.2:
+        return 'positive'
+    if score <= -0.2:
+        return 'negative'
+    return 'neutral'
+
+
+def analyze_text(normalized):
+    """Keywords and sentiment of one normalized comment"""
+    tokens = normalized.split()
+    score = score_sentiment(tokens)
+    return {'keywords': extract_keywords(tokens), 'sentiment': score, 'sentiment_label': sentiment_label(score)}
+
+
+def jaccard(a, b):
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+def cluster_texts(texts, representatives, threshold=DUPLICATE_THRESHOLD):
+    """Assign each normalized text to a near-duplicate cluster
+
+    representatives is a list of (cluster_id, word set) for the clusters
+    already known on the video. A text joins the first cluster whose
+    representative shares at least threshold of their words (Jaccard), or
+    starts a new one named after its own content hash. Returns the cluster
+    id of every text and the representatives of the new clusters.
+    """
+    known = list(representatives)
+    new = []
+    clusters = []
+    for text in texts:
+        words = frozenset(text.split())
+        if not words:
+            clusters.append(None)
+            continue
+        cluster_id = next((cluster_id for cluster_id, other in known if jaccard(words, other) >= threshold), None)
+        if cluster_id is None:
+            cluster_id = content_hash(text)
+            known.append((cluster_id, words))
+            new.append((cluster_id, words))
+        clusters.append(cluster_id)
+    return clusters, new
+
+
+def analyze_video(new_texts, texts, representatives, threshold=DUPLICATE_THRESHOLD):
+    """The work for one video in one batch, run in a pool process
+
+    Analyzes the texts that are not cached yet and clusters all of them.
+    """
+    analyses = [analyze_text(text) for text in new_texts]
+    clusters, new_representatives = cluster_texts(texts, representatives, threshold)
+    return analyses, clusters, new_representatives
+
+
+class CommentAnalyzer:
+    """Fills analyzed_comments on feedbacks in the background.
+
+    submit() takes feedback documents that were just inserted and only
+    enqueues them. A background thread takes them off the queue in batches,
+    groups the comments by video and analyzes each video's comments:
+    keywords, a sentiment score and a near-duplicate cluster
+    per comment, all computed locally. Results are cached by content hash,
+    so a comment that was seen before (ignoring case and punctuation) is not
+    analyzed again, and each batch is written back with one bulk_write that
+    sets analyzed_comments, one entry per comment, on every feedback.
+
+    By default the analysis runs in the background thread itself: comments
+    are short and the lexicon cheap, so shipping them to a pool costs more
+    than it saves. workers > 0 (COMMENT_ANALYSIS_WORKERS) uses a process
+    pool with the spawn start method instead, since forking a threaded
+    gunicorn worker is unsafe.
+    Cluster representatives are kept per video in this process, so clusters
+    only span the comments this worker has seen since it started.
+    """
+
+    def __init__(self, database, collection_name='feedbacks', workers=None, batch_size=None,
+                 flush_interval=None, max_queue_size=None):
+        self.database = database
+        self.collection_name = collection_name
+        self.workers = workers if workers is not None else int(os.getenv('COMMENT_ANALYSIS_WORKERS', '0'))
+        self.batch_size = batch_size or int(os.getenv('COMMENT_ANALYSIS_BATCH_SIZE', '100'))
+        self.flush_interval = flush_interval or float(os.getenv('COMMENT_ANALYSIS_INTERVAL', '2.0'))
+        self.max_queue_size = max_queue_size or int(os.getenv('COMMENT_ANALYSIS_QUEUE_SIZE', '10000'))
+        self._lock = threading.Lock()
+        self._cache = OrderedDict()
+        # video_name -> [(cluster_id, word set)]
+        self._representatives = OrderedDict()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._pool = None
+
+    def submit(self, documents):
+        """Queue inserted feedback documents for analysis"""
+        self._ensure_started()
+        for document in documents:
+            if document.get('_id') is None or not isinstance(document.get('comments'), list):
+                continue
+            if not document['comments']:
+                continue
+            try:
+                self._queue.put_nowait(document)
+            except queue.Full:
+                # backfill() picks these up later
+                logging.warning("Comment analysis queue is full, skipping a feedback")
+                return
+
+    def flush(self):
+        """Analyze everything currently queued from the calling thread"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                return
+            self.process(batch)
+
+    def close(self, timeout=10):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        if self._pool is not None:
+            self._pool.shutdown()
+            self._pool = None
+
+    def backfill(self, batch_size=None):
+        """Analyze stored feedbacks whose comments were never analyzed; returns how many"""
+        batch_size = batch_size or self.batch_size
+        collection = self.database.get_collection(self.collection_name)
+        query = {'comments.0': {'$exists': True}, 'analyzed_comments': {'$in': [None, []]}}
+        total = 0
+        last_id = None
+        while True:
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            batch = list(collection.find(query, projection={'video_name': 1, 'comments': 1})
+                         .sort('_id', 1).limit(batch_size))
+            if not batch:
+                return total
+            total += self.process(batch)
+            last_id = batch[-1]['_id']
+            logging.info(f"Analyzed comments of {total} feedbacks so far")
+
+    def process(self, documents):
+        """Analyze the comments of some feedbacks and write the results back; returns how many"""
+        documents = [document for document in documents if isinstance(document.get('comments'), list)]
+        by_video = {}
+        for document in documents:
+            texts = by_video.setdefault(document.get('video_name'), {})
+            for comment in document['comments']:
+                if isinstance(comment, dict):
+                    normalized = normalize(comment.get('text'))
+                    texts.setdefault(normalized, content_hash(normalized))
+
+        clusters = {}
+        hits = misses = 0
+        jobs = []
+        scheduled = set()
+        for video_name, texts in by_video.items():
+            new_texts = [text for text, digest in texts.items() if digest not in self._cache and digest not in scheduled]
+            scheduled.update(content_hash(text) for text in new_texts)
+            hits += len(texts) - len(new_texts)
+            misses += len(new_texts)
+            args = (new_texts, list(texts), self._representatives.get(video_name, []))
+            jobs.append((video_name, new_texts, list(texts), self._start(analyze_video, *args)))
+        metrics.cache_result('comment_analysis', True, hits)
+        metrics.cache_result('comment_analysis', False, misses)
+
+        for video_name, new_texts, texts, job in jobs:
+            analyses, video_clusters, new_representatives = job()
+            for text, analysis in zip(new_texts, analyses):
+                self._remember(content_hash(text), analysis)
+            self._add_representatives(video_name, new_representatives)
+            clusters[video_name] = dict(zip(texts, video_clusters))
+
+        results = {}
+        for document in documents:
+            video_clusters = clusters.get(document.get('video_name'), {})
+            analyzed = []
+            for comment in document['comments']:
+                if not isinstance(comment, dict):
+                    analyzed.append(None)
+                    continue
+                normalized = normalize(comment.get('text'))
+                analysis = self._cache.get(content_hash(normalized)) or analyze_text(normalized)
+                analyzed.append(dict(analysis, start=comment.get('start'), end=comment.get('end'),
+                                     cluster=video_clusters.get(normalized)))
+            results[document['_id']] = analyzed
+        if results:
+            self.database.set_analyzed_comments(self.collection_name, results)
+        return len(results)
+
+    def _start(self, function, *args):
+        """Start function(*args) in the pool and return a callable that waits for the result"""
+        pool = self._get_pool()
+        if pool is None:
+            result = function(*args)
+            return lambda: result
+        return pool.submit(function, *args).result
+
+    def _get_pool(self):
+        if self.workers <= 0:
+            return None
+        if self._pool is None:
+            self._pool = ProcessPoolExecutor(self.workers, mp_context=multiprocessing.get_context('spawn'))
+        return self._pool
+
+    def _remember(self, digest, analysis):
+        self._cache[digest] = analysis
+        self._cache.move_to_end(digest)
+        while len(self._cache) > MAX_CACHED_ANALYSES:
+            self._cache.popitem(last=False)
+
+    def _add_representatives(self, video_name, representatives):
+        known = self._representatives.pop(video_name, [])
+        known.extend(representatives)
+        self._representatives[video_name] = known[-MAX_REPRESENTATIVES:]
+        while len(self._representatives) > MAX_CLUSTERED_VIDEOS:
+            self._representatives.popitem(last=False)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # The queue, thread and pool were inherited from the parent process
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='comment-analyzer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            if not batch:
+                continue
+            try:
+                self.process(batch)
+            except BrokenProcessPool:
+                logging.error(f"Comment analysis pool died, dropping {len(batch)} feedbacks for backfill()",
+                              exc_info=True)
+                self._pool = None
+            except Exception:
+                logging.error(f"Failed to analyze the comments of {len(batch)} feedbacks", exc_info=True)
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Analyze feedback comments that were never analyzed.')
+    parser.add_argument('--batch-size', type=int, default=500)
+    parser.add_argument('--workers', type=int, default=None,
+                        help='analysis processes (default: COMMENT_ANALYSIS_WORKERS, or analyze inline)')
+    args = parser.parse_args()
+
+    from db import Database
+    from logging_config import configure_logging
+    configure_logging()
+    analyzer = CommentAnalyzer(Database(), workers=args.workers)
+    started = time.monotonic()
+    total = analyzer.backfill(args.batch_size)
+    analyzer.close()
+    logging.info(f"Analyzed comments of {total} feedbacks in {time.monotonic() - started:.1f}s")
+
+
+if __name__ == '__main__':
+    main()
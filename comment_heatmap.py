@@ -0,0 +1,111 @@
+from db import MAX_VIDEO_SECONDS
+import numpy as np
+import threading
+import logging
+import time
+import os
+import metrics
+
+DEFAULT_TTL_SECONDS = float(os.getenv('HEATMAP_CACHE_TTL', '60'))
+MAX_CACHED_VIDEOS = 256
+MAX_CACHED_BIN_SIZES = 16
+MIN_BIN_SECONDS = 0.1
+# Bounds the memory and response size of one histogram
+MAX_BINS = 100000
+
+
+def load_comment_times(database, video_name, batch_size=10000):
+    """Return the start time, in seconds, of every comment on a video"""
+    pipeline = [
+        {'$match': {'video_name': video_name, 'comments.start': {'$ne': None}}},
+        {'$project': {'_id': 0, 'comments.start': 1}},
+        {'$unwind': '$comments'},
+        {'$match': {'comments.start': {'$type': 'number'}}},
+        {'$project': {'start': '$comments.start'}},
+    ]
+    cursor = database.get_collection('feedbacks').aggregate(pipeline, allowDiskUse=True, batchSize=batch_size)
+    return np.fromiter((document['start'] for document in cursor), dtype=np.float64)
+
+
+def bin_comment_times(times, bin_seconds=1.0):
+    """Histogram comment times into consecutive windows of bin_seconds
+
+    Returns the count of comments starting in [i * bin_seconds,
+    (i + 1) * bin_seconds) for every window up to the last comment. Times
+    past MAX_VIDEO_SECONDS are dropped, and ValueError is raised if
+    bin_seconds is below MIN_BIN_SECONDS or would need more than MAX_BINS
+    windows.
+    """
+    if not bin_seconds >= MIN_BIN_SECONDS:
+        raise ValueError(f"bin_seconds must be at least {MIN_BIN_SECONDS}")
+    times = np.asarray(times, dtype=np.float64)
+    times = times[np.isfinite(times) & (times >= 0) & (times <= MAX_VIDEO_SECONDS)]
+    if times.size == 0:
+        return np.zeros(0, dtype=np.int64)
+    bins = int(times.max() // bin_seconds) + 1
+    if bins > MAX_BINS:
+        raise ValueError(f"bin_seconds={bin_seconds} would need {bins} bins, more than {MAX_BINS}")
+    return np.bincount((times // bin_seconds).astype(np.int64), minlength=bins)
+
+
+class CommentHeatmap:
+    """Per-video cache of comment times and the histograms built from them.
+
+    Comment times are loaded from MongoDB once per video and kept as a NumPy
+    array; histograms for each bin size are computed from that array and
+    cached too. invalidate() drops a video when new feedback for it is
+    written in this process, and the TTL bounds how stale other workers'
+    caches can get.
+    """
+
+    def __init__(self, database, ttl=DEFAULT_TTL_SECONDS, max_videos=MAX_CACHED_VIDEOS):
+        self.database = database
+        self.ttl = ttl
+        self.max_videos = max_videos
+        self._lock = threading.Lock()
+        # video_name -> {'times': array, 'loaded_at': float, 'bins': {bin_seconds: counts}}
+        self._videos = {}
+
+    def get(self, video_name, bin_seconds=1.0):
+        """Return a JSON-ready heatmap of a video's comments"""
+        entry = self._entry(video_name)
+        counts = entry['bins'].get(bin_seconds)
+        if counts is None:
+            counts = bin_comment_times(entry['times'], bin_seconds)
+            if len(entry['bins']) >= MAX_CACHED_BIN_SIZES:
+                entry['bins'].clear()
+            entry['bins'][bin_seconds] = counts
+        return {
+            'video_name': video_name,
+            'bin_seconds': bin_seconds,
+            'total_comments': int(entry['times'].size),
+            'counts': counts.tolist(),
+        }
+
+    def invalidate(self, video_names=None):
+        """Forget cached data for the given videos, or for every video"""
+        with self._lock:
+            if video_names is None:
+                self._videos = {}
+            else:
+                for video_name in video_names:
+                    self._videos.pop(video_name, None)
+
+    def invalidate_documents(self, documents):
+        self.invalidate({document.get('video_name') for document in documents})
+
+    def _entry(self, video_name):
+        entry = self._videos.get(video_name)
+        if entry is not None and time.monotonic() - entry['loaded_at'] < self.ttl:
+            metrics.cache_result('heatmap', True)
+            return entry
+        metrics.cache_result('heatmap', False)
+        times = load_comment_times(self.database, video_name)
+        entry = {'times': times, 'loaded_at': time.monotonic(), 'bins': {}}
+        with self._lock:
+            if len(self._videos) >= self.max_videos:
+                oldest = min(self._videos, key=lambda name: self._videos[name]['loaded_at'])
+                self._videos.pop(oldest, None)
+            self._videos[video_name] = entry
+        logging.info(f"Loaded {times.size} comment times for {video_name}")
+        return entry
@@ -1,32 +1,152 @@
-from pymongo import MongoClient, errors
-from dotenv import load_dotenv
+from pymongo import ASCENDING, UpdateOne, errors
+from bson import ObjectId
+from mongo_connection import get_connection_manager
+import metrics
+import threading
+import datetime
+import ast
+import re
 import logging
-import certifi
+import atexit
+import queue
+import time
 import os
 
+DUPLICATE_KEY_ERROR = 11000
+GRADE_FIELDS = ('safety', 'speed', 'convenience')
+GRADES = (1, 2, 3, 4, 5)
+FEEDBACK_INDEXES = [
+    ([('video_name', ASCENDING), ('user_email', ASCENDING)], 'video_name_user_email'),
+    ([('video_name', ASCENDING), ('submitted_at', ASCENDING)], 'video_name_submitted_at'),
+    ([('submitted_at', ASCENDING)], 'submitted_at'),
+    ([('video_name', ASCENDING), ('comments.start', ASCENDING)], 'video_name_comments_start'),
+]
+TIME_RANGE = re.compile(r'^\s*(\d+(?:\.\d+)?)\s*-\s*(\d+(?:\.\d+)?)\s*$')
+# Comment times past this are rejected; no study video is longer
+MAX_VIDEO_SECONDS = float(os.getenv('MAX_VIDEO_SECONDS', str(4 * 3600)))
+MAX_COMMENT_LENGTH = 2000
+
+
+def coerce_grade(value):
+    """Turn a form value such as '4' into an int grade, or None if it isn't one"""
+    try:
+        grade = int(value)
+    except (TypeError, ValueError):
+        return None
+    return grade if grade in GRADES else None
+
+
+def coerce_grades(document):
+    for field in GRADE_FIELDS:
+        document[field] = coerce_grade(document.get(field))
+    return document
+
+
+def _seconds(value):
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def parse_comment(comment):
+    """Turn one comment from the video page into a {start, end, text} dict
+
+    Accepts the numeric start/end the page sends now, or the older
+    "12.30 - 15.00" time string. Raises ValueError for times outside
+    0..MAX_VIDEO_SECONDS, an end before the start, or text that is an
+    object or array; longer text is cut to MAX_COMMENT_LENGTH.
+    """
+    start, end = _seconds(comment.get('start')), _seconds(comment.get('end'))
+    if start is None:
+        match = TIME_RANGE.match(str(comment.get('time', '')))
+        if match:
+            start, end = float(match.group(1)), float(match.group(2))
+    if end is None:
+        end = start
+    for value in (start, end):
+        # Also false for NaN
+        if value is not None and not 0 <= value <= MAX_VIDEO_SECONDS:
+            raise ValueError(f"Comment time {value} is outside the video")
+    if start is not None and end is not None and end < start:
+        raise ValueError("Comment ends before it starts")
+    text = comment.get('text', comment.get('comment', ''))
+    if isinstance(text, (dict, list)):
+        raise ValueError("Comment text must be a string")
+    text = '' if text is None else str(text)
+    return {'start': start, 'end': end, 'text': text[:MAX_COMMENT_LENGTH]}
+
+
+def parse_comments(comments):
+    """Parse a list of comments, skipping entries that are not objects
+
+    Raises ValueError for a non-list or an invalid comment.
+    """
+    if not isinstance(comments, list):
+        raise ValueError(f"Expected a list of comments, got {type(comments).__name__}")
+    return [parse_comment(comment) for comment in comments if isinstance(comment, dict)]
+
+
+def parse_comment_blob(blob):
+    """Recover the comment list from the old "Original comment: [...]" string"""
+    original = blob.split('\nAnalyzed comment:')[0]
+    original = original.replace('Original comment:', '', 1).strip()
+    try:
+        return parse_comments(ast.literal_eval(original))
+    except (ValueError, SyntaxError):
+        return None
+
+
+def summarize_feedback(summary):
+    """Turn a feedback_summary document into counts, means and distributions"""
+    result = {'video_name': summary['_id'], 'count': summary.get('count', 0)}
+    for field in GRADE_FIELDS:
+        stats = summary.get(field, {})
+        count = stats.get('count', 0)
+        dist = stats.get('dist', {})
+        result[field] = {
+            'count': count,
+            'mean': stats.get('sum', 0) / count if count else None,
+            'distribution': {str(grade): dist.get(str(grade), 0) for grade in GRADES},
+        }
+    return result
+
+
 class Database:
-    def __init__(self):
-        load_dotenv()
-        mongo_uri = os.getenv('MONGO_URI')
-        self.client = MongoClient(mongo_uri, tlsCAFile=certifi.where()) # this is used to connect to the database for the first time
+    """Access to the application's MongoDB database.
+
+    All instances share the process-wide client from mongo_connection, which
+    is only created (and connects) on first use, after gunicorn has forked.
+    """
+
+    def __init__(self, connection_manager=None):
+        self.connection_manager = connection_manager or get_connection_manager()
+        # Fail fast on a malformed URI; the network is not touched here
+        self.db_name = self.connection_manager.get_database_name()
+        self._db = None
+        logging.debug(f"Database name extracted: '{self.db_name}'")
+
+    @property
+    def client(self):
+        return self.connection_manager.get_client()
+
+    @property
+    def db(self):
+        client = self.client
+        if self._db is None or self._db.client is not client:
+            self._db = client.get_database(self.db_name)
+        return self._db
+
+    def ping(self):
+        """Check that MongoDB is reachable"""
         try:
-            self.client = MongoClient(mongo_uri)
-            
-            # Ping the server to ensure the connection is alive
-            self.client.admin.command('ping')
-            db_name = mongo_uri.split('/')[-1].split('?')[0]
-            print(f"Database name extracted: '{db_name}'")  # Debug print
-            if not db_name:
-                raise ValueError("Database name is empty. Check your MONGO_URI.")
-            self.db = self.client.get_database(db_name)
-            print(f"Connected to MongoDB at {mongo_uri}, Database: {db_name}")
-            
-        except errors.ConnectionFailure as e:
+            return self.connection_manager.ping()
+        except errors.ConnectionFailure:
             logging.error("Failed to connect to MongoDB: Connection Failure", exc_info=True)
-            raise e
-        except Exception as e:
-            logging.error("Failed to connect to MongoDB", exc_info=True)
-            raise e
+            raise
+
+    def pool_stats(self):
+        return self.connection_manager.stats()
 
     def get_collection(self, collection_name):
         return self.db[collection_name]
@@ -41,14 +161,478 @@ class Database:
             logging.error("Database connection not initialized.")
             raise Exception("Database connection not initialized.")
 
-    def get_data(self, collection_name):
+    def insert_many_data(self, collection_name, documents):
+        if self.db is not None:
+            collection = self.db[collection_name]
+            result = collection.insert_many(documents, ordered=False)
+            logging.info(f"Inserted {len(result.inserted_ids)} documents into {collection_name}")
+            return result
+        else:
+            logging.error("Database connection not initialized.")
+            raise Exception("Database connection not initialized.")
+
+    def insert_many_new(self, collection_name, documents):
+        """insert_many that tells apart new, duplicate and failed documents
+
+        Returns (inserted, failed). Documents rejected as duplicate keys were
+        already written earlier and are in neither list.
+        """
+        if not documents:
+            return [], []
+        try:
+            self.insert_many_data(collection_name, documents)
+            inserted, failed = list(documents), []
+        except errors.BulkWriteError as e:
+            rejected = {}
+            for error in e.details.get('writeErrors', []):
+                rejected[error['index']] = error.get('code')
+            inserted = [document for i, document in enumerate(documents) if i not in rejected]
+            failed = [documents[i] for i, code in sorted(rejected.items()) if code != DUPLICATE_KEY_ERROR]
+        except Exception:
+            metrics.MONGO_INSERT_FAILURES.labels(collection_name).inc(len(documents))
+            raise
+        metrics.MONGO_INSERTED.labels(collection_name).inc(len(inserted))
+        if failed:
+            metrics.MONGO_INSERT_FAILURES.labels(collection_name).inc(len(failed))
+        return inserted, failed
+
+    def get_data(self, collection_name, limit=0):
         collection = self.db[collection_name]
-        data = list(collection.find({}))
-        logging.info(f"Retrieved data from {collection_name}: {data}")
+        data = list(collection.find({}, limit=limit))
+        logging.info(f"Retrieved {len(data)} documents from {collection_name}")
         return data
     
     def save_feedback(self, data):
         return self.db.feedback.insert_one(data)
     
-    def retrieve_feedback(self):
-        return list(self.db.feedback.find({}))
+    def retrieve_feedback(self, limit=0):
+        return list(self.db.feedback.find({}, limit=limit))
+
+    def set_analyzed_comments(self, collection_name, analyses):
+        """Store comment analyses, {feedback _id: [one entry per comment]}, with one bulk_write"""
+        if not analyses:
+            return None
+        analyzed_at = datetime.datetime.now(datetime.timezone.utc)
+        operations = [UpdateOne({'_id': _id}, {'$set': {'analyzed_comments': analyzed, 'analyzed_at': analyzed_at}})
+                      for _id, analyzed in analyses.items()]
+        return self.db[collection_name].bulk_write(operations, ordered=False)
+
+    def ensure_indexes(self):
+        """Create the secondary indexes of the feedbacks collection"""
+        try:
+            collection = self.db['feedbacks']
+            for keys, name in FEEDBACK_INDEXES:
+                collection.create_index(keys, name=name)
+            logging.info("Ensured indexes on feedbacks")
+            return True
+        except Exception:
+            logging.error("Failed to create indexes on feedbacks", exc_info=True)
+            return False
+
+    def feedback_filter(self, video_name=None, user_email=None, since=None, until=None):
+        query = {}
+        if video_name:
+            query['video_name'] = video_name
+        if user_email:
+            query['user_email'] = user_email
+        if since or until:
+            query['submitted_at'] = {}
+            if since:
+                query['submitted_at']['$gte'] = since
+            if until:
+                query['submitted_at']['$lt'] = until
+        return query
+
+    def find_feedback(self, video_name=None, user_email=None, since=None, until=None,
+                      projection=None, batch_size=500, limit=0):
+        """Return a batched cursor over feedbacks matching the filters
+
+        since/until filter on submitted_at; iterate the cursor rather than
+        materializing it.
+        """
+        query = self.feedback_filter(video_name, user_email, since, until)
+        return self.db['feedbacks'].find(query, projection=projection, limit=limit).batch_size(batch_size)
+
+    def get_feedback_page(self, video_name=None, user_email=None, since=None, until=None,
+                          projection=None, page_size=100, after_id=None):
+        """Return (documents, next_after_id) for one page of feedbacks
+
+        Pages are keyed on _id, so each page is a bounded index scan no matter
+        how deep into the collection it is. Pass the returned next_after_id to
+        get the following page; it is None on the last page.
+        """
+        query = self.feedback_filter(video_name, user_email, since, until)
+        if after_id is not None:
+            query['_id'] = {'$gt': after_id}
+        cursor = self.db['feedbacks'].find(query, projection=projection).sort('_id', ASCENDING).limit(page_size + 1)
+        documents = list(cursor)
+        next_after_id = None
+        if len(documents) > page_size:
+            documents = documents[:page_size]
+            next_after_id = documents[-1]['_id']
+        return documents, next_after_id
+
+    def find_comments_between(self, video_name, start, end):
+        """Return the comments of a video that start within [start, end] seconds
+
+        The $elemMatch is answered with a range scan on the
+        (video_name, comments.start) index; the $unwind then keeps only the
+        matching comments of each feedback.
+        """
+        in_range = {'$gte': start, '$lte': end}
+        pipeline = [
+            {'$match': {'video_name': video_name, 'comments': {'$elemMatch': {'start': in_range}}}},
+            {'$project': {'user_email': 1, 'comments': 1}},
+            {'$unwind': '$comments'},
+            {'$match': {'comments.start': in_range}},
+            {'$sort': {'comments.start': ASCENDING}},
+            {'$project': {'_id': 0, 'feedback_id': '$_id', 'user_email': 1,
+                          'start': '$comments.start', 'end': '$comments.end', 'text': '$comments.text'}},
+        ]
+        return self.db['feedbacks'].aggregate(pipeline, allowDiskUse=True)
+
+    def migrate_comment_blobs(self, batch_size=500):
+        """Convert comments stored as one string into {start, end, text} arrays
+
+        Works through the collection in batches and backfills submitted_at
+        from the ObjectId where it is missing. Returns (migrated, skipped);
+        documents whose string cannot be parsed are left as they are.
+        """
+        collection = self.db['feedbacks']
+        migrated = skipped = 0
+        last_id = None
+        while True:
+            query = {'comments': {'$type': 'string'}}
+            if last_id is not None:
+                query['_id'] = {'$gt': last_id}
+            batch = list(collection.find(query, projection={'comments': 1, 'submitted_at': 1})
+                         .sort('_id', ASCENDING).limit(batch_size))
+            if not batch:
+                break
+            operations = []
+            for document in batch:
+                comments = parse_comment_blob(document['comments'])
+                if comments is None:
+                    skipped += 1
+                    continue
+                update = {'comments': comments}
+                if not document.get('submitted_at'):
+                    update['submitted_at'] = document['_id'].generation_time
+                operations.append(UpdateOne({'_id': document['_id']}, {'$set': update}))
+            if operations:
+                collection.bulk_write(operations, ordered=False)
+                migrated += len(operations)
+            last_id = batch[-1]['_id']
+            logging.info(f"Migrated {migrated} feedback comments so far ({skipped} skipped)")
+        return migrated, skipped
+
+    def update_feedback_summary(self, documents):
+        """Fold newly inserted feedbacks into the per-video feedback_summary
+
+        Each video's summary holds the feedback count and, per grade field,
+        the count, sum and distribution of numeric grades, maintained with $inc.
+        A feedback is counted once however often it is passed in: it is
+        first claimed by setting its `summarized` field, and only the
+        feedbacks this call claimed are added.
+        """
+        ids = [document['_id'] for document in documents if document.get('_id') is not None]
+        if not ids:
+            return None
+        claim = ObjectId()
+        feedbacks = self.db['feedbacks']
+        feedbacks.update_many({'_id': {'$in': ids}, 'summarized': {'$exists': False}},
+                              {'$set': {'summarized': claim}})
+        claimed = {document['_id'] for document in feedbacks.find({'_id': {'$in': ids}, 'summarized': claim},
+                                                                  projection={'_id': 1})}
+        increments = {}
+        for document in documents:
+            if document.get('_id') not in claimed:
+                continue
+            claimed.discard(document['_id'])
+            video_name = document.get('video_name')
+            inc = increments.setdefault(video_name, {})
+            inc['count'] = inc.get('count', 0) + 1
+            for field in GRADE_FIELDS:
+                grade = coerce_grade(document.get(field))
+                if grade is None:
+                    continue
+                for key, amount in ((f"{field}.count", 1), (f"{field}.sum", grade), (f"{field}.dist.{grade}", 1)):
+                    inc[key] = inc.get(key, 0) + amount
+        if not increments:
+            return None
+        operations = [UpdateOne({'_id': video_name}, {'$inc': inc}, upsert=True)
+                      for video_name, inc in increments.items()]
+        return self.db['feedback_summary'].bulk_write(operations, ordered=False)
+
+    def rebuild_feedback_summary(self):
+        """Recompute feedback_summary from scratch with an aggregation pipeline
+
+        Also converts grades stored as strings by older versions of the form.
+        Run it with `python rebuild_feedback_summary.py`.
+        """
+        as_int = {field: {'$convert': {'input': f"${field}", 'to': 'int', 'onError': None, 'onNull': None}}
+                  for field in GRADE_FIELDS}
+        group = {'_id': '$video_name', 'count': {'$sum': 1}}
+        for field in GRADE_FIELDS:
+            valid = {'$in': [f"${field}", list(GRADES)]}
+            group[f"{field}_count"] = {'$sum': {'$cond': [valid, 1, 0]}}
+            group[f"{field}_sum"] = {'$sum': {'$cond': [valid, f"${field}", 0]}}
+            for grade in GRADES:
+                group[f"{field}_{grade}"] = {'$sum': {'$cond': [{'$eq': [f"${field}", grade]}, 1, 0]}}
+        project = {'count': 1}
+        for field in GRADE_FIELDS:
+            project[field] = {
+                'count': f"${field}_count",
+                'sum': f"${field}_sum",
+                'dist': {str(grade): f"${field}_{grade}" for grade in GRADES},
+            }
+        # Feedbacks written from now on are still counted by
+        # update_feedback_summary; the ones that exist now are counted here
+        self.db['feedbacks'].update_many({'summarized': {'$exists': False}}, {'$set': {'summarized': True}})
+        pipeline = [
+            {'$match': {'summarized': {'$exists': True}}},
+            {'$project': dict(as_int, video_name=1)},
+            {'$group': group},
+            {'$project': project},
+            {'$merge': {'into': 'feedback_summary', 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+        ]
+        self.db['feedbacks'].aggregate(pipeline, allowDiskUse=True)
+        logging.info("Rebuilt feedback_summary")
+
+    def get_feedback_summary(self, video_name=None):
+        """Return per-video rating summaries with means, reading only feedback_summary"""
+        query = {'_id': video_name} if video_name else {}
+        return [summarize_feedback(summary) for summary in self.db['feedback_summary'].find(query)]
+
+
+class FeedbackWriteError(Exception):
+    pass
+
+
+class FeedbackWriter:
+    """Buffers documents in memory and writes them to MongoDB in batches.
+
+    submit() only enqueues the document. A background thread flushes the
+    queue with insert_many(ordered=False) once batch_size documents are
+    waiting or flush_interval seconds have passed, retrying failed batches
+    with exponential backoff, and drains what is left on shutdown. When the
+    queue is full, or when synchronous mode is on, submit() writes the
+    document inline instead.
+
+    With a FeedbackSpool attached, every document is appended to the local
+    spool before it is queued. Batches that still fail after the retries
+    stay in the spool and are replayed by the writer thread later, so a
+    MongoDB outage delays answers instead of losing them. The thread also
+    runs in synchronous mode, where it only syncs and replays the spool.
+
+    database may be a callable returning the database, e.g. lambda: services.db,
+    so that a connection that comes up after the writer is created is used.
+
+    on_written, if given, is called with the documents each write inserted,
+    e.g. to update aggregates. After a write that failed without telling
+    which documents made it in, duplicates are passed on too, so a document
+    can be reported more than once and on_written must be idempotent;
+    Database.update_feedback_summary is.
+    """
+
+    def __init__(self, database, collection_name='feedbacks', batch_size=None, flush_interval=None,
+                 max_queue_size=None, max_retries=5, synchronous=None, spool=None, replay_interval=None,
+                 on_written=None):
+        self._database = database
+        self.collection_name = collection_name
+        self.batch_size = batch_size or int(os.getenv('FEEDBACK_BATCH_SIZE', '100'))
+        self.flush_interval = flush_interval or float(os.getenv('FEEDBACK_FLUSH_INTERVAL', '1.0'))
+        self.max_queue_size = max_queue_size or int(os.getenv('FEEDBACK_QUEUE_SIZE', '10000'))
+        self.max_retries = max_retries
+        if synchronous is None:
+            synchronous = os.getenv('FEEDBACK_WRITE_MODE', 'batched').lower() == 'sync'
+        self.synchronous = synchronous
+        self.spool = spool
+        self.replay_interval = replay_interval or float(os.getenv('FEEDBACK_REPLAY_INTERVAL', '60'))
+        self.on_written = on_written
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._pid = os.getpid()
+        self._queue = queue.Queue(maxsize=self.max_queue_size)
+        self._stopping = threading.Event()
+        self._thread = None
+        self._last_replay = None
+        self._failed = False
+
+    @property
+    def database(self):
+        return self._database() if callable(self._database) else self._database
+
+    def submit(self, document):
+        """Queue a document for writing, or write it now in synchronous mode"""
+        if self.synchronous:
+            return self.write_now(document)
+        self._ensure_started()
+        segment = self.spool.append(document) if self.spool else None
+        try:
+            self._queue.put_nowait((document, segment))
+            metrics.QUEUE_DEPTH.set(self._queue.qsize())
+        except queue.Full:
+            logging.warning("Feedback queue is full, writing synchronously")
+            self._write([(document, segment)], retries=1)
+
+    def write_now(self, document):
+        """Write a single document inline, bypassing the queue
+
+        Returns True once MongoDB has the document and False when it could
+        only be kept in the spool, to be replayed later. Without a spool a
+        failed write raises FeedbackWriteError.
+        """
+        if not self.spool:
+            if not self._insert_with_retry([document], retries=1):
+                raise FeedbackWriteError("Could not write the feedback to MongoDB")
+            return True
+        self._ensure_started()
+        segment = self.spool.append(document)
+        written = self._write([(document, segment)], retries=1)
+        if not written:
+            logging.error(f"Feedback {document['_id']} was not written to MongoDB; it stays in the spool for replay")
+        return written
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def flush(self):
+        """Write everything currently queued from the calling thread"""
+        while True:
+            batch = self._drain(self.batch_size)
+            if not batch:
+                break
+            self._write(batch)
+        if self.spool:
+            self.spool.sync()
+
+    def close(self, timeout=10):
+        """Stop the background thread and flush what is left"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        self.flush()
+        if self.spool:
+            self.spool.close()
+
+    def replay_spool(self):
+        """Write documents left in the spool by failed batches or dead workers"""
+        self._last_replay = time.monotonic()
+        database = self.database
+        if not self.spool or database is None:
+            return 0
+        return self.spool.replay(database, self.collection_name, self.batch_size, on_written=self._written)
+
+    def _ensure_started(self):
+        if self._thread is not None and self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                # The queue and thread were inherited from the parent process
+                self._reset()
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='feedback-writer', daemon=True)
+                self._thread.start()
+                atexit.register(self.close)
+
+    def _run(self):
+        while not (self._stopping.is_set() and self._queue.empty()):
+            batch = self._take_batch()
+            metrics.QUEUE_DEPTH.set(self._queue.qsize())
+            if batch:
+                self._write(batch)
+            if self.spool:
+                self.spool.sync()
+                if self._last_replay is None or time.monotonic() - self._last_replay >= self.replay_interval:
+                    try:
+                        self.replay_spool()
+                    except Exception:
+                        logging.error("Failed to replay the feedback spool", exc_info=True)
+
+    def _take_batch(self):
+        batch = []
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _drain(self, limit):
+        batch = []
+        while len(batch) < limit:
+            try:
+                batch.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        return batch
+
+    def _write(self, batch, retries=None):
+        written = self._insert_with_retry([document for document, _ in batch], retries or self.max_retries)
+        if self.spool:
+            segments = {}
+            for _, segment in batch:
+                segments[segment] = segments.get(segment, 0) + 1
+            for segment, count in segments.items():
+                if written:
+                    self.spool.ack(segment, count)
+                else:
+                    self.spool.abandon(segment, count)
+            if not written:
+                # Seal the segment so that the failed documents can be replayed
+                self.spool.rotate()
+            elif self._failed:
+                # MongoDB is back; replay what failed on the writer thread's next pass
+                self._last_replay = None
+            self._failed = not written
+        elif not written:
+            # Only the ids: the documents hold participant emails and free-text answers
+            logging.error(f"Dropping {len(batch)} feedback documents: "
+                          f"{[str(document.get('_id')) for document, _ in batch]}")
+        return written
+
+    def _insert_with_retry(self, documents, retries):
+        database = self.database
+        if database is None:
+            logging.error("Database connection not initialized.")
+            return False
+        delay = 0.5
+        pending = documents
+        uncertain = False
+        for attempt in range(1, retries + 1):
+            try:
+                # insert_many assigns _id client-side, so documents from an
+                # earlier partial attempt come back as duplicate keys
+                inserted, failed = database.insert_many_new(self.collection_name, pending)
+                if uncertain:
+                    # The attempt that raised may have written some of these,
+                    # which now show up as duplicates rather than inserted
+                    failed_ids = {id(document) for document in failed}
+                    inserted = [document for document in pending if id(document) not in failed_ids]
+                self._written(inserted)
+                pending = failed
+                if not pending:
+                    return True
+                logging.warning(f"{len(pending)} feedback documents failed to write (attempt {attempt}/{retries})")
+            except Exception:
+                uncertain = True
+                logging.warning(f"Feedback batch write failed (attempt {attempt}/{retries})", exc_info=True)
+            if attempt < retries:
+                time.sleep(delay)
+                delay = min(delay * 2, 30)
+        return False
+
+    def _written(self, documents):
+        if not documents or not self.on_written:
+            return
+        try:
+            self.on_written(documents)
+        except Exception:
+            logging.error("Failed to run the post-write hook for feedbacks", exc_info=True)
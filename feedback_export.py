@@ -0,0 +1,104 @@
+from bson import json_util
+import argparse
+import datetime
+import json
+import csv
+import io
+import sys
+
+EXPORT_FIELDS = ['_id', 'user_email', 'video_name', 'safety', 'speed', 'convenience', 'submitted_at', 'comments']
+EXPORT_PROJECTION = {field: 1 for field in EXPORT_FIELDS}
+ROWS_PER_CHUNK = 500
+
+
+def parse_date(value):
+    """Parse an ISO date or datetime; naive values are taken as UTC"""
+    if not value:
+        return None
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    return parsed
+
+
+def _csv_value(value):
+    if isinstance(value, datetime.datetime):
+        return value.isoformat()
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, default=str)
+    return '' if value is None else str(value)
+
+
+def iter_csv(documents, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield CSV text in chunks of rows_per_chunk documents, header first"""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(EXPORT_FIELDS)
+    yield buffer.getvalue()
+    buffer.seek(0)
+    buffer.truncate()
+    rows = 0
+    for document in documents:
+        writer.writerow([_csv_value(document.get(field)) for field in EXPORT_FIELDS])
+        rows += 1
+        if rows % rows_per_chunk == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue()
+
+
+def iter_ndjson(documents, rows_per_chunk=ROWS_PER_CHUNK):
+    """Yield one relaxed Extended JSON document per line, in chunks"""
+    lines = []
+    for document in documents:
+        lines.append(json_util.dumps(document))
+        if len(lines) >= rows_per_chunk:
+            yield '\n'.join(lines) + '\n'
+            lines = []
+    if lines:
+        yield '\n'.join(lines) + '\n'
+
+
+EXPORT_FORMATS = {
+    'csv': (iter_csv, 'text/csv'),
+    'ndjson': (iter_ndjson, 'application/x-ndjson'),
+}
+
+
+def export_feedbacks(database, export_format='csv', video_name=None, since=None, until=None, batch_size=1000):
+    """Return a generator of text chunks for the matching feedbacks
+
+    Documents are read through a batched server-side cursor, so memory use
+    does not depend on the size of the collection.
+    """
+    serialize, _ = EXPORT_FORMATS[export_format]
+    cursor = database.find_feedback(video_name=video_name, since=since, until=until,
+                                    projection=EXPORT_PROJECTION, batch_size=batch_size)
+    return serialize(cursor)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Export the feedbacks collection as CSV or NDJSON.')
+    parser.add_argument('--format', choices=sorted(EXPORT_FORMATS), default='csv')
+    parser.add_argument('--video', help='only export feedback for this video')
+    parser.add_argument('--since', help='ISO date; only feedback submitted at or after it')
+    parser.add_argument('--until', help='ISO date; only feedback submitted before it')
+    parser.add_argument('--output', help='file to write to (default: stdout)')
+    args = parser.parse_args(argv)
+
+    from db import Database
+    database = Database()
+    chunks = export_feedbacks(database, args.format, args.video, parse_date(args.since), parse_date(args.until))
+    output = open(args.output, 'w', newline='', encoding='utf-8') if args.output else sys.stdout
+    try:
+        for chunk in chunks:
+            output.write(chunk)
+    finally:
+        if args.output:
+            output.close()
+
+
+if __name__ == '__main__':
+    main()
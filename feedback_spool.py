@@ -0,0 +1,222 @@
+from bson import ObjectId, json_util
+import threading
+import logging
+import glob
+import time
+import os
+
+OPEN_SUFFIX = '.jsonl.open'
+SEALED_SUFFIX = '.jsonl'
+# Not matched by the *.jsonl glob, so rejected documents are never replayed
+REJECTED_SUFFIX = '.rejected'
+
+
+class FeedbackSpool:
+    """Append-only, per-worker write-ahead log of feedback documents.
+
+    Every document gets a client-generated _id and is appended as one JSON
+    line to this worker's open segment before it is handed to MongoDB. Lines
+    are flushed to the OS immediately and fsync'ed in batches, at most
+    fsync_interval seconds apart. Segments are rotated by size and age:
+
+    * a rotated segment whose documents were all acknowledged is deleted;
+    * a segment with documents that could not be written is sealed
+      (renamed to .jsonl) and left for replay().
+
+    replay() drains sealed segments, and open segments left behind by dead
+    workers, into MongoDB. Because the _id is fixed in the spool, replaying
+    a document that already made it in is a harmless duplicate-key error.
+    Documents MongoDB rejects for any other reason are moved to a .rejected
+    file next to the segment, so they do not block the segments after it.
+    """
+
+    def __init__(self, directory=None, fsync_interval=None, max_segment_bytes=None, max_segment_age=None):
+        self.directory = directory or os.getenv(
+            'FEEDBACK_SPOOL_DIR', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'spool'))
+        self.fsync_interval = fsync_interval if fsync_interval is not None else float(os.getenv('FEEDBACK_SPOOL_FSYNC_INTERVAL', '0.2'))
+        self.max_segment_bytes = max_segment_bytes or int(os.getenv('FEEDBACK_SPOOL_SEGMENT_BYTES', str(16 * 1024 * 1024)))
+        self.max_segment_age = max_segment_age or float(os.getenv('FEEDBACK_SPOOL_SEGMENT_AGE', '300'))
+        self._lock = threading.Lock()
+        self._pid = None
+        self._file = None
+        self._segment = None
+        self._segment_opened_at = 0
+        self._sequence = 0
+        self._dirty = False
+        self._last_sync = 0
+        # segment path -> [outstanding documents, abandoned documents]
+        self._pending = {}
+
+    def append(self, document):
+        """Durably record a document and return the segment it was written to"""
+        document.setdefault('_id', ObjectId())
+        line = json_util.dumps(document) + '\n'
+        with self._lock:
+            self._ensure_segment()
+            self._file.write(line)
+            self._file.flush()
+            self._dirty = True
+            self._pending[self._segment][0] += 1
+            segment = self._segment
+            if time.monotonic() - self._last_sync >= self.fsync_interval:
+                self._sync_locked()
+            if (self._file.tell() >= self.max_segment_bytes
+                    or time.monotonic() - self._segment_opened_at >= self.max_segment_age):
+                self._rotate_locked()
+        return segment
+
+    def sync(self):
+        """fsync the open segment, rotating it if it has grown too old"""
+        with self._lock:
+            self._sync_locked()
+            if self._file is not None and time.monotonic() - self._segment_opened_at >= self.max_segment_age:
+                self._rotate_locked()
+
+    def ack(self, segment, count=1):
+        """Mark documents from a segment as written to MongoDB"""
+        self._settle(segment, count, abandoned=False)
+
+    def abandon(self, segment, count=1):
+        """Mark documents from a segment as failed; the segment will be replayed"""
+        self._settle(segment, count, abandoned=True)
+
+    def rotate(self):
+        with self._lock:
+            self._rotate_locked()
+
+    def close(self):
+        with self._lock:
+            if self._file is not None:
+                self._rotate_locked()
+
+    def replay(self, database, collection_name='feedbacks', batch_size=500, on_written=None):
+        """Drain sealed and orphaned segments into MongoDB; returns documents replayed
+
+        on_written is called with every replayed document MongoDB now holds,
+        including duplicates: a spooled document may have been written by
+        a batch that failed before it could tell.
+        """
+        replayed = 0
+        for path in self._replayable_segments():
+            try:
+                documents = self._read_segment(path)
+                rejected = []
+                for start in range(0, len(documents), batch_size):
+                    batch = documents[start:start + batch_size]
+                    _, failed = database.insert_many_new(collection_name, batch)
+                    failed_ids = {document['_id'] for document in failed}
+                    written = [document for document in batch if document['_id'] not in failed_ids]
+                    if written and on_written:
+                        on_written(written)
+                    rejected.extend(failed)
+                if rejected:
+                    self._set_aside(path, rejected)
+                os.remove(path)
+                replayed += len(documents) - len(rejected)
+                logging.info(f"Replayed {len(documents) - len(rejected)} spooled feedback documents from {path}")
+            except Exception:
+                # MongoDB is unreachable; the rest of the segments wait for the next replay
+                logging.error(f"Failed to replay spool segment {path}", exc_info=True)
+                break
+        return replayed
+
+    def _settle(self, segment, count, abandoned):
+        with self._lock:
+            counts = self._pending.get(segment)
+            if counts is None:
+                return
+            counts[0] -= count
+            if abandoned:
+                counts[1] += count
+            if segment != self._segment:
+                self._finish_segment(segment)
+
+    def _ensure_segment(self):
+        if self._pid != os.getpid():
+            # Segments opened by the parent process belong to the parent
+            self._pid = os.getpid()
+            self._file = None
+            self._segment = None
+            self._pending = {}
+        if self._file is None:
+            os.makedirs(self.directory, exist_ok=True)
+            self._sequence += 1
+            name = f"feedback-{self._pid}-{int(time.time() * 1000)}-{self._sequence}{OPEN_SUFFIX}"
+            self._segment = os.path.join(self.directory, name)
+            self._file = open(self._segment, 'a', encoding='utf-8')
+            self._segment_opened_at = time.monotonic()
+            self._pending[self._segment] = [0, 0]
+
+    def _sync_locked(self):
+        if self._file is not None and self._dirty:
+            os.fsync(self._file.fileno())
+            self._dirty = False
+        self._last_sync = time.monotonic()
+
+    def _rotate_locked(self):
+        if self._file is None:
+            return
+        self._sync_locked()
+        self._file.close()
+        segment = self._segment
+        self._file = None
+        self._segment = None
+        self._finish_segment(segment)
+
+    def _finish_segment(self, segment):
+        outstanding, abandoned = self._pending[segment]
+        if outstanding > 0:
+            return
+        del self._pending[segment]
+        if abandoned:
+            os.replace(segment, segment[:-len(OPEN_SUFFIX)] + SEALED_SUFFIX)
+        else:
+            os.remove(segment)
+
+    def _replayable_segments(self):
+        segments = sorted(glob.glob(os.path.join(self.directory, f"*{SEALED_SUFFIX}")))
+        with self._lock:
+            own = set(self._pending) if self._pid == os.getpid() else set()
+        for path in sorted(glob.glob(os.path.join(self.directory, f"*{OPEN_SUFFIX}"))):
+            if path in own:
+                continue
+            # PIDs get reused across container restarts, so an open segment
+            # that is not ours and has not been touched in a while is orphaned
+            pid = int(os.path.basename(path).split('-')[1])
+            stale = time.time() - os.path.getmtime(path) > 2 * self.max_segment_age
+            if pid == os.getpid() or stale or not _pid_alive(pid):
+                segments.append(path)
+        return segments
+
+    def _read_segment(self, path):
+        documents = []
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.endswith('\n'):
+                    # A torn write from a crash; the request never completed
+                    logging.warning(f"Skipping truncated record at the end of {path}")
+                    break
+                documents.append(json_util.loads(line))
+        return documents
+
+    def _set_aside(self, path, documents):
+        """Keep documents MongoDB rejected in a .rejected file for an operator to look at"""
+        base = path[:-len(OPEN_SUFFIX)] if path.endswith(OPEN_SUFFIX) else path[:-len(SEALED_SUFFIX)]
+        rejected_path = base + REJECTED_SUFFIX
+        with open(rejected_path, 'a', encoding='utf-8') as f:
+            for document in documents:
+                f.write(json_util.dumps(document) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        logging.error(f"MongoDB rejected {len(documents)} spooled feedback documents, moved to {rejected_path}: "
+                      f"{[str(document.get('_id')) for document in documents]}")
+
+
+def _pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
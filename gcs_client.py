@@ -0,0 +1,98 @@
+from google.auth.transport.requests import AuthorizedSession, Request
+from google.cloud import storage
+from google.cloud.storage.retry import DEFAULT_RETRY
+from requests.adapters import HTTPAdapter
+import threading
+import datetime
+import logging
+import requests
+import os
+
+# Sized for gthread/threaded workers: one pooled connection per thread
+HTTP_POOL_SIZE = int(os.getenv('GCS_HTTP_POOL_SIZE', '32'))
+# Refresh the access token this long before it expires
+TOKEN_REFRESH_MARGIN_SECONDS = int(os.getenv('GCS_TOKEN_REFRESH_MARGIN', '300'))
+TOKEN_RETRY_SECONDS = 30
+
+# Retry and timeout policy for listing and metadata calls. GCS's own default
+# retries for up to 120 s with a 60 s socket timeout, far longer than a page
+# load is worth waiting for.
+READ_TIMEOUT = (float(os.getenv('GCS_CONNECT_TIMEOUT', '5')), float(os.getenv('GCS_READ_TIMEOUT', '15')))
+RETRY_DEADLINE_SECONDS = float(os.getenv('GCS_RETRY_DEADLINE', '30'))
+READ_RETRY = DEFAULT_RETRY.with_timeout(RETRY_DEADLINE_SECONDS)
+
+_lock = threading.Lock()
+_clients = {}
+_pid = os.getpid()
+
+
+def get_client(credentials, project=None):
+    """Return this process's storage.Client for the given credentials
+
+    Every caller with the same service account and project shares one
+    client, one pooled HTTP session and one background token refresher.
+    """
+    global _pid
+    key = (project, getattr(credentials, 'service_account_email', None))
+    with _lock:
+        if _pid != os.getpid():
+            # Sessions and refresher threads do not survive a fork
+            _clients.clear()
+            _pid = os.getpid()
+        client = _clients.get(key)
+        if client is None:
+            client = _clients[key] = _create_client(credentials, project)
+        return client
+
+
+def _create_client(credentials, project):
+    session = AuthorizedSession(credentials)
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount('https://', adapter)
+    client = storage.Client(project=project, credentials=credentials, _http=session)
+    TokenRefresher(credentials).start()
+    logging.info(f"Created GCS client for project {project} with a pool of {HTTP_POOL_SIZE} connections")
+    return client
+
+
+class TokenRefresher:
+    """Daemon thread that refreshes an access token before it expires.
+
+    Requests only refresh credentials that are already invalid, so keeping
+    the token fresh here means no request ever waits on the token endpoint.
+    """
+
+    def __init__(self, credentials, margin=TOKEN_REFRESH_MARGIN_SECONDS):
+        self.credentials = credentials
+        self.margin = margin
+        self._stop = threading.Event()
+        self._request = Request(requests.Session())
+
+    def start(self):
+        thread = threading.Thread(target=self._run, name='gcs-token-refresh', daemon=True)
+        thread.start()
+        return thread
+
+    def stop(self):
+        self._stop.set()
+
+    def seconds_until_refresh(self):
+        expiry = self.credentials.expiry
+        if not self.credentials.token or expiry is None:
+            return 0
+        # google-auth keeps expiry as a naive UTC datetime
+        now = datetime.datetime.now(datetime.timezone.utc).replace(tzinfo=None)
+        return max(0, (expiry - now).total_seconds() - self.margin)
+
+    def _run(self):
+        while not self._stop.is_set():
+            delay = self.seconds_until_refresh()
+            if delay > 0:
+                self._stop.wait(delay)
+                continue
+            try:
+                self.credentials.refresh(self._request)
+                logging.debug(f"Refreshed GCS access token, valid until {self.credentials.expiry}")
+            except Exception:
+                logging.error("Failed to refresh the GCS access token", exc_info=True)
+                self._stop.wait(TOKEN_RETRY_SECONDS)
@@ -0,0 +1,20 @@
+import tempfile
+import shutil
+import os
+
+# Workers write their metrics here so /metrics can aggregate all of them.
+# This must be set before a worker imports prometheus_client, and gunicorn
+# loads this file in the master before forking.
+metrics_dir = os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                                    os.path.join(tempfile.gettempdir(), 'feedback_metrics'))
+
+
+def on_starting(server):
+    # Files left by a previous run would be counted again
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
@@ -0,0 +1,60 @@
+import threading
+import logging
+import time
+import os
+
+LOG_FORMAT = '%(asctime)s %(levelname)s [%(process)d] %(name)s: %(message)s'
+# Each call site may log this many records per interval before being muted
+RATE_LIMIT_BURST = int(os.getenv('LOG_RATE_LIMIT_BURST', '10'))
+RATE_LIMIT_INTERVAL_SECONDS = float(os.getenv('LOG_RATE_LIMIT_INTERVAL', '60'))
+
+
+class RateLimitFilter(logging.Filter):
+    """Lets through at most `burst` INFO/DEBUG records per call site every `interval` seconds.
+
+    A call site is the logger, file and line the record came from, so one
+    noisy loop cannot drown out everything else. Once a muted site is let
+    through again, its next record says how many were dropped. Warnings
+    and errors are never dropped.
+    """
+
+    def __init__(self, burst=RATE_LIMIT_BURST, interval=RATE_LIMIT_INTERVAL_SECONDS):
+        super().__init__()
+        self.burst = burst
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._windows = {}
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        key = (record.name, record.pathname, record.lineno)
+        now = time.monotonic()
+        with self._lock:
+            started, count, dropped = self._windows.get(key, (now, 0, 0))
+            if now - started >= self.interval:
+                started, count = now, 0
+            if count >= self.burst:
+                self._windows[key] = (started, count, dropped + 1)
+                return False
+            self._windows[key] = (started, count + 1, 0)
+        if dropped:
+            record.msg = f"{record.msg} ({dropped} similar messages suppressed)"
+        return True
+
+
+def configure_logging(level=None):
+    """Log to stderr at LOG_LEVEL (default INFO) through a rate limit
+
+    Does nothing if the root logger already has handlers, e.g. when gunicorn
+    or a test harness set logging up first.
+    """
+    root = logging.getLogger()
+    if root.handlers:
+        return root
+    handler = logging.StreamHandler()
+    handler.setFormatter(logging.Formatter(LOG_FORMAT))
+    handler.addFilter(RateLimitFilter())
+    root.addHandler(handler)
+    root.setLevel(level or os.getenv('LOG_LEVEL', 'INFO').upper())
+    return root
@@ -0,0 +1,93 @@
+from prometheus_client import CONTENT_TYPE_LATEST, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+from prometheus_client import multiprocess
+import inspect
+import asyncio
+import time
+import os
+
+# gunicorn.conf.py sets PROMETHEUS_MULTIPROC_DIR, so every worker records
+# into files there and /metrics, whichever worker answers, sums them all.
+MULTIPROCESS = bool(os.getenv('PROMETHEUS_MULTIPROC_DIR'))
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Time to produce a response, by endpoint',
+    ['endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10))
+REQUESTS = Counter('http_requests_total', 'Responses sent, by endpoint and status',
+                   ['endpoint', 'method', 'status'])
+GCS_REQUESTS = Counter('gcs_requests_total', 'Calls to Google Cloud Storage',
+                       ['operation', 'outcome'])
+MONGO_INSERTED = Counter('mongo_inserted_documents_total', 'Documents inserted into MongoDB',
+                         ['collection'])
+MONGO_INSERT_FAILURES = Counter('mongo_insert_failed_documents_total',
+                                'Documents MongoDB rejected for reasons other than duplicates',
+                                ['collection'])
+CACHE_REQUESTS = Counter('cache_requests_total', 'Cache lookups, by cache and result',
+                         ['cache', 'result'])
+QUEUE_DEPTH = Gauge('feedback_queue_depth', 'Answers waiting in the FeedbackWriter queue',
+                    multiprocess_mode='livesum')
+
+
+def gcs_call(operation, outcome='ok'):
+    GCS_REQUESTS.labels(operation, outcome).inc()
+
+
+def cache_result(cache, hit, count=1):
+    if count:
+        CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc(count)
+
+
+def render():
+    """Return the metrics page body and its content type"""
+    if MULTIPROCESS:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    from prometheus_client import REGISTRY
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def init_app(app, g, request):
+    """Time every request of a Flask or Quart app and serve /metrics
+
+    g and request are the framework's context proxies, e.g.
+    metrics.init_app(app, flask.g, flask.request). On a Quart app the hooks
+    are coroutines, since Quart runs plain functions in its thread pool.
+    """
+
+    def start_timer():
+        g.metrics_started_at = time.perf_counter()
+
+    def record(response):
+        started_at = getattr(g, 'metrics_started_at', None)
+        if started_at is not None:
+            # Label by route rule, not URL, so video names do not explode the series
+            endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+            REQUEST_LATENCY.labels(endpoint, request.method).observe(time.perf_counter() - started_at)
+            REQUESTS.labels(endpoint, request.method, str(response.status_code)).inc()
+        return response
+
+    def metrics_view():
+        body, content_type = render()
+        return body, 200, {'Content-Type': content_type}
+
+    if inspect.iscoroutinefunction(app.full_dispatch_request):
+        async def start_timer_async():
+            start_timer()
+
+        async def record_async(response):
+            return record(response)
+
+        async def metrics_view_async():
+            # In multiprocess mode render() reads every worker's files
+            body, content_type = await asyncio.to_thread(render)
+            return body, 200, {'Content-Type': content_type}
+
+        app.before_request(start_timer_async)
+        app.after_request(record_async)
+        app.add_url_rule('/metrics', 'metrics', metrics_view_async)
+        return
+
+    app.before_request(start_timer)
+    app.after_request(record)
+    app.add_url_rule('/metrics', 'metrics', metrics_view)
@@ -0,0 +1,14 @@
+from db import Database
+
+
+def migrate_comments(batch_size=500):
+    db = Database()
+    db.ensure_indexes()
+    migrated, skipped = db.migrate_comment_blobs(batch_size=batch_size)
+    print(f"✅ Migrated {migrated} feedback documents")
+    if skipped:
+        print(f"⚠️ Skipped {skipped} documents whose comments could not be parsed")
+
+
+if __name__ == '__main__':
+    migrate_comments()
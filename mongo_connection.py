@@ -0,0 +1,172 @@
+from pymongo import MongoClient, monitoring
+from dotenv import load_dotenv
+import threading
+import logging
+import certifi
+import os
+
+
+class PoolStatsListener(monitoring.ConnectionPoolListener):
+    """Keeps running counters of the client's connection pool activity"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.open_connections = 0
+            self.checked_out = 0
+            self.checkouts = 0
+            self.checkout_failures = 0
+            self.total_wait_seconds = 0.0
+            self.max_wait_seconds = 0.0
+            self.pool_clears = 0
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                'open_connections': self.open_connections,
+                'checked_out': self.checked_out,
+                'checkouts': self.checkouts,
+                'checkout_failures': self.checkout_failures,
+                'avg_wait_ms': 1000 * self.total_wait_seconds / self.checkouts if self.checkouts else 0.0,
+                'max_wait_ms': 1000 * self.max_wait_seconds,
+                'pool_clears': self.pool_clears,
+            }
+
+    def connection_created(self, event):
+        with self._lock:
+            self.open_connections += 1
+
+    def connection_closed(self, event):
+        with self._lock:
+            self.open_connections -= 1
+
+    def connection_checked_out(self, event):
+        with self._lock:
+            self.checked_out += 1
+            self.checkouts += 1
+            self.total_wait_seconds += event.duration
+            self.max_wait_seconds = max(self.max_wait_seconds, event.duration)
+
+    def connection_checked_in(self, event):
+        with self._lock:
+            self.checked_out -= 1
+
+    def connection_check_out_failed(self, event):
+        with self._lock:
+            self.checkout_failures += 1
+
+    def pool_cleared(self, event):
+        with self._lock:
+            self.pool_clears += 1
+
+    def pool_created(self, event):
+        pass
+
+    def pool_ready(self, event):
+        pass
+
+    def pool_closed(self, event):
+        pass
+
+    def connection_ready(self, event):
+        pass
+
+    def connection_check_out_started(self, event):
+        pass
+
+
+class MongoConnectionManager:
+    """Owns the single MongoClient of the current process.
+
+    The client is created on first use rather than at import, so under
+    gunicorn each worker builds its own client after the fork. If the
+    process id changes (a fork after the client was created) the inherited
+    client is dropped and a fresh one is built. Pool sizing, timeouts and
+    retry settings come from the environment.
+    """
+
+    def __init__(self, mongo_uri=None):
+        load_dotenv()
+        self.mongo_uri = mongo_uri or os.getenv('MONGO_URI')
+        self.pool_stats = PoolStatsListener()
+        self._lock = threading.Lock()
+        self._client = None
+        self._pid = None
+
+    def client_options(self):
+        options = {
+            'maxPoolSize': int(os.getenv('MONGO_MAX_POOL_SIZE', '20')),
+            'minPoolSize': int(os.getenv('MONGO_MIN_POOL_SIZE', '0')),
+            'maxIdleTimeMS': int(os.getenv('MONGO_MAX_IDLE_TIME_MS', '300000')),
+            'waitQueueTimeoutMS': int(os.getenv('MONGO_WAIT_QUEUE_TIMEOUT_MS', '2000')),
+            'connectTimeoutMS': int(os.getenv('MONGO_CONNECT_TIMEOUT_MS', '5000')),
+            'serverSelectionTimeoutMS': int(os.getenv('MONGO_SERVER_SELECTION_TIMEOUT_MS', '5000')),
+            'socketTimeoutMS': int(os.getenv('MONGO_SOCKET_TIMEOUT_MS', '10000')),
+            'retryWrites': os.getenv('MONGO_RETRY_WRITES', 'true').lower() == 'true',
+            'retryReads': os.getenv('MONGO_RETRY_READS', 'true').lower() == 'true',
+            'appname': os.getenv('MONGO_APP_NAME', 'feedback_for_videos'),
+            'event_listeners': [self.pool_stats],
+        }
+        if self.mongo_uri and self.mongo_uri.startswith('mongodb+srv://'):
+            options['tlsCAFile'] = certifi.where()
+        return options
+
+    def get_client(self):
+        """Return this process's MongoClient, creating it if needed"""
+        if self._client is not None and self._pid == os.getpid():
+            return self._client
+        with self._lock:
+            if self._client is not None and self._pid != os.getpid():
+                # Never reuse sockets inherited from the parent process
+                self._client = None
+                self.pool_stats.reset()
+            if self._client is None:
+                if not self.mongo_uri:
+                    raise ValueError("MONGO_URI is not set.")
+                self._client = MongoClient(self.mongo_uri, connect=False, **self.client_options())
+                self._pid = os.getpid()
+                logging.info(f"Created MongoClient for process {self._pid}")
+        return self._client
+
+    def get_database_name(self):
+        db_name = (self.mongo_uri or '').split('/')[-1].split('?')[0]
+        if not db_name:
+            raise ValueError("Database name is empty. Check your MONGO_URI.")
+        return db_name
+
+    def get_database(self):
+        return self.get_client().get_database(self.get_database_name())
+
+    def ping(self):
+        self.get_client().admin.command('ping')
+        return True
+
+    def stats(self):
+        """Pool statistics for monitoring"""
+        stats = self.pool_stats.snapshot()
+        stats['max_pool_size'] = self.client_options()['maxPoolSize']
+        stats['connected'] = self._client is not None and self._pid == os.getpid()
+        return stats
+
+    def close(self):
+        with self._lock:
+            if self._client is not None and self._pid == os.getpid():
+                self._client.close()
+            self._client = None
+
+
+_connection_manager = None
+_connection_manager_lock = threading.Lock()
+
+
+def get_connection_manager():
+    """Return the process-wide MongoConnectionManager"""
+    global _connection_manager
+    if _connection_manager is None:
+        with _connection_manager_lock:
+            if _connection_manager is None:
+                _connection_manager = MongoConnectionManager()
+    return _connection_manager
@@ -0,0 +1,120 @@
+import contextlib
+import metrics
+import threading
+import asyncio
+import hashlib
+import time
+
+MAX_ENTRIES = 32
+
+
+class RenderedPageCache:
+    """Rendered pages, keyed by everything their content depends on.
+
+    Pages such as the gallery are the same for every participant until the
+    bucket changes, so callers key them by the catalog version and render
+    only on a miss. Each entry carries a strong ETag computed from the body,
+    so a re-render that produces the same bytes keeps the same ETag and
+    browsers can keep revalidating with If-None-Match. An entry can also be
+    given a ttl, for pages that embed something that expires on its own,
+    like signed URLs.
+
+    Concurrent misses on one key are single-flight: the first caller
+    renders while the others wait for it and are served its entry.
+    """
+
+    def __init__(self, max_entries=MAX_ENTRIES):
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = {}
+        # key -> [lock, callers holding or waiting for it]; entries are
+        # dropped when the last one is done, so only in-flight keys are kept
+        self._key_locks = {}
+        self._async_key_locks = {}
+
+    def get(self, key, render, ttl=None):
+        """Return (body, etag) for key, calling render() to build it on a miss"""
+        cached = self._fresh(key)
+        if cached is None:
+            with self._key_lock(key):
+                cached = self._fresh(key)
+                if cached is None:
+                    metrics.cache_result('rendered_page', False)
+                    return self.store(key, render(), ttl)
+        metrics.cache_result('rendered_page', True)
+        return cached
+
+    async def get_async(self, key, render, ttl=None):
+        """Like get(), for a coroutine function render() on the event loop"""
+        cached = self._fresh(key)
+        if cached is None:
+            async with self._async_key_lock(key):
+                cached = self._fresh(key)
+                if cached is None:
+                    metrics.cache_result('rendered_page', False)
+                    return self.store(key, await render(), ttl)
+        metrics.cache_result('rendered_page', True)
+        return cached
+
+    def lookup(self, key):
+        """Return the cached (body, etag) for key, or None"""
+        cached = self._fresh(key)
+        metrics.cache_result('rendered_page', cached is not None)
+        return cached
+
+    def _fresh(self, key):
+        entry = self._entries.get(key)
+        if entry is None or (entry[2] is not None and entry[2] <= time.monotonic()):
+            return None
+        return entry[0], entry[1]
+
+    @contextlib.contextmanager
+    def _key_lock(self, key):
+        with self._lock:
+            entry = self._key_locks.get(key)
+            if entry is None:
+                entry = self._key_locks[key] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[key]
+
+    @contextlib.asynccontextmanager
+    async def _async_key_lock(self, key):
+        # Only touched from the event loop's thread, so no lock is needed here
+        entry = self._async_key_locks.get(key)
+        if entry is None:
+            entry = self._async_key_locks[key] = [asyncio.Lock(), 0]
+        entry[1] += 1
+        try:
+            async with entry[0]:
+                yield
+        finally:
+            entry[1] -= 1
+            if not entry[1]:
+                del self._async_key_locks[key]
+
+    def store(self, key, body, ttl=None):
+        """Cache a freshly rendered body and return (body, etag)"""
+        if isinstance(body, str):
+            body = body.encode('utf-8')
+        etag = hashlib.sha256(body).hexdigest()[:32]
+        with self._lock:
+            if len(self._entries) >= self.max_entries:
+                self._entries = {}
+            self._entries[key] = (body, etag, time.monotonic() + ttl if ttl else None)
+        return body, etag
+
+    def clear(self):
+        with self._lock:
+            self._entries = {}
+
+
+def etag_matches(request, etag):
+    """True if the request's If-None-Match already names this strong ETag"""
+    return request.if_none_match.contains(etag)
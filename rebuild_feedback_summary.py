@@ -0,0 +1,21 @@
+"""Recompute the per-video feedback_summary from the feedbacks collection.
+
+    python rebuild_feedback_summary.py
+
+/api/feedback-summary only reads feedback_summary, which the app keeps up
+to date as new feedback is written. Run this once after deploying the
+summary, so that feedback written before it is counted, and again whenever
+the summary looks off. It is safe to run while the app is serving.
+"""
+from db import Database
+
+
+def rebuild_feedback_summary():
+    db = Database()
+    db.ensure_indexes()
+    db.rebuild_feedback_summary()
+    print(f"✅ Rebuilt the feedback summary of {len(db.get_feedback_summary())} videos")
+
+
+if __name__ == '__main__':
+    rebuild_feedback_summary()
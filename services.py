@@ -0,0 +1,248 @@
+import threading
+import logging
+import time
+import os
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+# A resource that failed to initialize is retried after this long
+RETRY_INTERVAL_SECONDS = float(os.getenv('SERVICE_RETRY_INTERVAL', '30'))
+
+
+class Services:
+    """The app's GCS, MongoDB and derived resources, created on first use.
+
+    Nothing here touches the network, or imports the Google Cloud and NumPy
+    libraries, until a request actually needs it, so importing the app is
+    cheap and every gunicorn worker builds its own clients after the fork.
+    Resources are per process: if the process id changes they are rebuilt.
+    A resource whose initialization failed is retried after
+    RETRY_INTERVAL_SECONDS instead of leaving the worker broken for good.
+
+    Keyword arguments replace individual resources, e.g.
+    Services(bucket=fake_bucket, db=fake_db) for tests and benchmarks.
+    """
+
+    def __init__(self, **overrides):
+        self._overrides = overrides
+        self._lock = threading.RLock()
+        self._pid = os.getpid()
+        self._instances = {}
+        self._failed_at = {}
+
+    def _get(self, name, factory):
+        if name in self._overrides:
+            return self._overrides[name]
+        if self._pid != os.getpid():
+            with self._lock:
+                if self._pid != os.getpid():
+                    self._instances = {}
+                    self._failed_at = {}
+                    self._pid = os.getpid()
+        if name in self._instances:
+            return self._instances[name]
+        failed_at = self._failed_at.get(name)
+        if failed_at is not None and time.monotonic() - failed_at < RETRY_INTERVAL_SECONDS:
+            return None
+        with self._lock:
+            if name in self._instances:
+                return self._instances[name]
+            try:
+                instance = factory()
+            except Exception as e:
+                logging.error(f"Error initializing {name}: {str(e)}")
+                instance = None
+            if instance is None:
+                self._failed_at[name] = time.monotonic()
+            else:
+                self._instances[name] = instance
+                self._failed_at.pop(name, None)
+            return instance
+
+    def is_initialized(self, name):
+        return name in self._overrides or name in self._instances
+
+    # --- Google Cloud Storage ---
+
+    @property
+    def config_manager(self):
+        return self._get('config_manager', self._create_config_manager)
+
+    @property
+    def bucket_name(self):
+        if 'bucket_name' in self._overrides:
+            return self._overrides['bucket_name']
+        bucket = self._instances.get('bucket', self._overrides.get('bucket'))
+        if bucket is not None and getattr(bucket, 'name', None):
+            return bucket.name
+        config_manager = self.config_manager
+        return config_manager.get_bucket_name() if config_manager else None
+
+    @property
+    def storage_client(self):
+        return self._get('storage_client', self._create_storage_client)
+
+    @property
+    def bucket(self):
+        return self._get('bucket', self._create_bucket)
+
+    @property
+    def video_catalog(self):
+        return self._get('video_catalog', self._create_video_catalog)
+
+    @property
+    def url_signer(self):
+        if os.getenv('VIDEO_URL_MODE', 'public').lower() != 'signed':
+            return None
+        return self._get('url_signer', self._create_url_signer)
+
+    @property
+    def video_cache(self):
+        return self._get('video_cache', self._create_video_cache)
+
+    def _create_config_manager(self):
+        from configManager import ConfigManager
+        return ConfigManager(load_credentials=False)
+
+    def _create_storage_client(self):
+        config_manager = self.config_manager
+        if config_manager is None:
+            return None
+        logging.info(f"Initializing storage for bucket {config_manager.get_bucket_name()}")
+        if not config_manager.initialize_with_base64_credentials():
+            logging.error("Failed to initialize storage with the configured credentials")
+            return None
+        storage_client = config_manager.get_storage_client()
+        if storage_client and config_manager.get_bucket():
+            logging.info("Storage initialized successfully")
+        return storage_client
+
+    def _create_bucket(self):
+        if self.storage_client is None:
+            return None
+        return self.config_manager.get_bucket()
+
+    def _create_video_catalog(self):
+        from video_catalog import VideoCatalog
+        bucket = self.bucket
+        return VideoCatalog(bucket, self.bucket_name) if bucket else None
+
+    def _create_url_signer(self):
+        from signed_urls import SignedUrlService
+        bucket = self.bucket
+        if bucket is None:
+            return None
+        try:
+            return SignedUrlService(bucket, self.config_manager.credentials)
+        except Exception as e:
+            logging.error(f"Signed URLs unavailable, falling back to public URLs: {str(e)}")
+            return None
+
+    def _create_video_cache(self):
+        from video_cache import VideoDiskCache
+        return VideoDiskCache(os.getenv('VIDEOS_FOLDER', os.path.join(BASE_DIR, 'videos')))
+
+    # --- Async clients, used by asgi_app ---
+
+    @property
+    def async_bucket(self):
+        return self._get('async_bucket', self._create_async_bucket)
+
+    @property
+    def async_video_catalog(self):
+        return self._get('async_video_catalog', self._create_async_video_catalog)
+
+    @property
+    def async_db(self):
+        return self._get('async_db', self._create_async_db)
+
+    def _create_async_bucket(self):
+        from async_gcs import AsyncBucket
+        # Loads the credentials through the synchronous client first
+        if self.bucket is None:
+            return None
+        return AsyncBucket(self.bucket_name, self.config_manager.credentials)
+
+    def _create_async_video_catalog(self):
+        from async_gcs import AsyncVideoCatalog
+        bucket = self.async_bucket
+        return AsyncVideoCatalog(bucket, self.bucket_name) if bucket else None
+
+    def _create_async_db(self):
+        from async_db import AsyncDatabase
+        return AsyncDatabase()
+
+    # --- MongoDB ---
+
+    @property
+    def db(self):
+        return self._get('db', self._create_db)
+
+    @property
+    def comment_heatmap(self):
+        return self._get('comment_heatmap', self._create_comment_heatmap)
+
+    @property
+    def feedback_writer(self):
+        return self._get('feedback_writer', self._create_feedback_writer)
+
+    @property
+    def comment_analyzer(self):
+        if os.getenv('COMMENT_ANALYSIS', 'on').lower() == 'off':
+            return None
+        return self._get('comment_analyzer', self._create_comment_analyzer)
+
+    def _create_db(self):
+        from db import Database
+        logging.info("Connecting to the database")
+        db = Database()
+        threading.Thread(target=db.ensure_indexes, name='ensure-indexes', daemon=True).start()
+        return db
+
+    def _create_comment_heatmap(self):
+        from comment_heatmap import CommentHeatmap
+        db = self.db
+        return CommentHeatmap(db) if db is not None else None
+
+    def _create_comment_analyzer(self):
+        from comment_analysis import CommentAnalyzer
+        db = self.db
+        return CommentAnalyzer(db) if db is not None else None
+
+    def _create_feedback_writer(self):
+        from db import FeedbackWriter
+        from feedback_spool import FeedbackSpool
+        # Answers are still accepted into the spool while Mongo is unavailable
+        # and replayed once it is back. The database is looked up on every
+        # write, so a connection that failed at first is retried.
+        return FeedbackWriter(lambda: self.db, 'feedbacks', spool=FeedbackSpool(),
+                              on_written=self._on_feedback_written)
+
+    def _on_feedback_written(self, documents):
+        """Keep derived data in step with newly inserted feedbacks"""
+        db = self.db
+        if db is None:
+            return
+        if self.comment_heatmap is not None:
+            self.comment_heatmap.invalidate_documents(documents)
+        db.update_feedback_summary(documents)
+        if self.comment_analyzer is not None:
+            self.comment_analyzer.submit(documents)
+
+    # --- Readiness ---
+
+    def readiness(self):
+        """Initialize everything and report which dependencies are usable"""
+        checks = {}
+        try:
+            bucket = self.bucket
+            checks['storage'] = bucket is not None
+        except Exception:
+            logging.error("Storage readiness check failed", exc_info=True)
+            checks['storage'] = False
+        try:
+            db = self.db
+            checks['database'] = db is not None and bool(db.ping())
+        except Exception:
+            logging.error("Database readiness check failed", exc_info=True)
+            checks['database'] = False
+        return checks
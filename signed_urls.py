@@ -0,0 +1,136 @@
+from google.cloud import storage
+import threading
+import datetime
+import logging
+import random
+import time
+import os
+import metrics
+
+DEFAULT_EXPIRATION_SECONDS = int(os.getenv('SIGNED_URL_EXPIRATION', '3600'))
+# A cached URL is handed out only while it has at least this long left
+DEFAULT_MIN_REMAINING_SECONDS = int(os.getenv('SIGNED_URL_MIN_REMAINING', '900'))
+# A cached URL this much longer-lived than that is re-signed in the background
+DEFAULT_REFRESH_AHEAD_SECONDS = int(os.getenv('SIGNED_URL_REFRESH_AHEAD', '900'))
+MAX_CACHED_URLS = 10000
+
+
+class SignedUrlService:
+    """Hands out V4 signed GET URLs for blobs in a private bucket.
+
+    URLs are signed locally with the service account's private key, so no
+    IAM signBlob call is made, and each one is cached until it has less
+    than min_remaining seconds of validity left. A gallery render therefore
+    only signs the blobs it has not seen recently, in one pass through
+    sign_many().
+
+    URLs that get within refresh_ahead seconds of that point are still
+    handed out but re-signed on a background thread, so only blobs that
+    were never signed are signed on the request path. Expiries are spread
+    randomly so that a catalog signed in one go does not come due at once.
+    """
+
+    def __init__(self, bucket, credentials, expiration=DEFAULT_EXPIRATION_SECONDS,
+                 min_remaining=DEFAULT_MIN_REMAINING_SECONDS, refresh_ahead=DEFAULT_REFRESH_AHEAD_SECONDS):
+        if not hasattr(credentials, 'sign_bytes'):
+            raise ValueError("Signed URLs need service account credentials with a private key")
+        if min_remaining + refresh_ahead >= expiration:
+            raise ValueError("min_remaining plus refresh_ahead must be shorter than expiration")
+        self.bucket = bucket
+        self.credentials = credentials
+        self.expiration = expiration
+        self.min_remaining = min_remaining
+        self.refresh_ahead = refresh_ahead
+        # Expiries are shortened by up to this much, leaving at least as long
+        # before a fresh URL is due for its background refresh
+        self.jitter = (expiration - min_remaining - refresh_ahead) // 2
+        self._lock = threading.Lock()
+        self._refresh_lock = threading.Lock()
+        # blob name -> (url, expires_at as a time.time() timestamp)
+        self._urls = {}
+
+    def sign(self, blob_name):
+        """Return a signed URL for one blob"""
+        return self.sign_many([blob_name])[blob_name]
+
+    def sign_many(self, blob_names):
+        """Return {blob_name: signed_url}, reusing every URL that is still fresh"""
+        now = time.time()
+        urls = {}
+        missing = []
+        due = []
+        for name in blob_names:
+            cached = self._urls.get(name)
+            if cached is not None and cached[1] - now >= self.min_remaining:
+                urls[name] = cached[0]
+                if cached[1] - now < self.min_remaining + self.refresh_ahead:
+                    due.append(name)
+            else:
+                missing.append(name)
+        metrics.cache_result('signed_url', True, len(urls))
+        metrics.cache_result('signed_url', False, len(missing))
+        if missing:
+            signed = self._sign_uncached(missing, now)
+            urls.update(signed)
+        if due:
+            self.refresh_in_background(due)
+        return urls
+
+    def refresh_in_background(self, blob_names):
+        """Re-sign blob_names on a thread unless a refresh is already running"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._refresh_locked, args=(blob_names,), name='signed-url-refresh',
+                                  daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            self._refresh_lock.release()
+            raise
+        return True
+
+    def _refresh_locked(self, blob_names):
+        try:
+            self._sign_uncached(blob_names, time.time())
+        except Exception:
+            logging.error("Failed to refresh signed URLs", exc_info=True)
+        finally:
+            self._refresh_lock.release()
+
+    def sign_videos(self, videos):
+        """Return a copy of a {video_id: video} catalog with signed url/thumbnail fields"""
+        names = []
+        for video in videos.values():
+            names.append(video['raw_name'])
+            if video.get('thumbnail_name'):
+                names.append(video['thumbnail_name'])
+        urls = self.sign_many(names)
+        return {video_id: self.sign_video(video, urls) for video_id, video in videos.items()}
+
+    def sign_video(self, video, urls=None):
+        """Return a copy of one video entry with signed url/thumbnail fields"""
+        if video is None:
+            return None
+        if urls is None:
+            names = [video['raw_name']] + ([video['thumbnail_name']] if video.get('thumbnail_name') else [])
+            urls = self.sign_many(names)
+        signed = dict(video, url=urls[video['raw_name']])
+        if video.get('thumbnail_name'):
+            signed['thumbnail'] = urls[video['thumbnail_name']]
+        return signed
+
+    def _sign_uncached(self, blob_names, now):
+        signed = {}
+        for name in blob_names:
+            expires_at = int(now) + self.expiration - random.randint(0, self.jitter)
+            blob = storage.Blob(name, self.bucket)
+            url = blob.generate_signed_url(
+                version='v4', expiration=datetime.datetime.fromtimestamp(expires_at, tz=datetime.timezone.utc),
+                method='GET', credentials=self.credentials)
+            signed[name] = (url, expires_at)
+        with self._lock:
+            if len(self._urls) + len(signed) > MAX_CACHED_URLS:
+                self._urls = {key: value for key, value in self._urls.items() if value[1] - now >= self.min_remaining}
+            self._urls.update(signed)
+        logging.info(f"Signed {len(signed)} URLs")
+        return {name: url for name, (url, _) in signed.items()}
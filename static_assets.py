@@ -0,0 +1,142 @@
+from flask import request, send_from_directory
+import mimetypes
+import hashlib
+import logging
+import json
+import glob
+import gzip
+import os
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+BASE_DIR = os.path.abspath(os.path.dirname(__file__))
+DEFAULT_PATTERNS = ('css/*.css', 'js/*.js', 'Videos/thumbnails/*.jpg')
+COMPRESSIBLE = ('.css', '.js', '.svg', '.json', '.txt')
+IMMUTABLE_CACHE_CONTROL = 'public, max-age=31536000, immutable'
+MANIFEST_NAME = 'manifest.json'
+
+
+class StaticAssets:
+    """Content-hashed, precompressed copies of the static assets.
+
+    build() copies every asset matching the patterns to build_dir under a
+    name that includes a hash of its contents (css/main.3f2a9c1b7d4e.css)
+    and writes .gz, and .br when the brotli package is installed, next to
+    text assets, plus a manifest of the names. It runs at deploy time,
+    `python static_assets.py`, not in the web workers.
+
+    init_app() loads the manifest, rewrites url_for('static', ...) to those
+    names and serves them with a one-year immutable Cache-Control, picking
+    the precompressed variant the client accepts. Anything not in the
+    manifest, or everything if there is no build, falls through to Flask's
+    normal static handling.
+    """
+
+    def __init__(self, static_folder=None, build_dir=None, patterns=DEFAULT_PATTERNS):
+        self.static_folder = static_folder or os.path.join(BASE_DIR, 'static')
+        self.build_dir = build_dir or os.getenv('STATIC_BUILD_DIR', os.path.join(BASE_DIR, '.static_build'))
+        self.patterns = patterns
+        self.manifest = {}
+        self.originals = {}
+
+    def build(self):
+        """Fingerprint and precompress the assets and write the manifest"""
+        manifest = {}
+        for pattern in self.patterns:
+            for path in sorted(glob.glob(os.path.join(self.static_folder, pattern))):
+                filename = os.path.relpath(path, self.static_folder).replace(os.sep, '/')
+                manifest[filename] = self._build_asset(path, filename)
+        self._write(os.path.join(self.build_dir, MANIFEST_NAME),
+                    json.dumps(manifest, indent=2, sort_keys=True).encode('utf-8'))
+        self._use(manifest)
+        logging.info(f"Fingerprinted {len(manifest)} static assets into {self.build_dir}")
+        return manifest
+
+    def load(self):
+        """Read the manifest written by build(); without one, assets are served unfingerprinted"""
+        try:
+            with open(os.path.join(self.build_dir, MANIFEST_NAME), encoding='utf-8') as f:
+                manifest = json.load(f)
+        except FileNotFoundError:
+            logging.warning(f"No static asset build in {self.build_dir}; run `python static_assets.py`")
+            manifest = {}
+        self._use(manifest)
+        return manifest
+
+    def _use(self, manifest):
+        self.manifest = manifest
+        self.originals = {fingerprinted: filename for filename, fingerprinted in manifest.items()}
+
+    def _build_asset(self, path, filename):
+        with open(path, 'rb') as f:
+            content = f.read()
+        digest = hashlib.sha256(content).hexdigest()[:12]
+        root, extension = os.path.splitext(filename)
+        fingerprinted = f"{root}.{digest}{extension}"
+        target = os.path.join(self.build_dir, fingerprinted)
+        if extension in COMPRESSIBLE:
+            self._write_once(target + '.gz', lambda: gzip.compress(content, compresslevel=9, mtime=0))
+            if brotli is not None:
+                self._write_once(target + '.br', lambda: brotli.compress(content, quality=11))
+        self._write_once(target, lambda: content)
+        return fingerprinted
+
+    def _write_once(self, target, make_content):
+        # Names are content-addressed, so an existing file is already correct
+        if not os.path.exists(target):
+            self._write(target, make_content())
+
+    def _write(self, target, content):
+        os.makedirs(os.path.dirname(target), exist_ok=True)
+        temp_path = f"{target}.{os.getpid()}.tmp"
+        with open(temp_path, 'wb') as f:
+            f.write(content)
+        os.replace(temp_path, target)
+
+    def init_app(self, app):
+        self.load()
+        app.url_defaults(self.fingerprint_url)
+        self._send_static_file = app.send_static_file
+        app.view_functions['static'] = self.serve
+        app.extensions['static_assets'] = self
+
+    def fingerprint_url(self, endpoint, values):
+        if endpoint == 'static' and values.get('filename') in self.manifest:
+            values['filename'] = self.manifest[values['filename']]
+
+    def variant_for(self, filename, accept_encodings):
+        """Return the file in build_dir to send and its Content-Encoding, if any"""
+        if filename.endswith(COMPRESSIBLE):
+            for candidate, suffix in (('br', '.br'), ('gzip', '.gz')):
+                if accept_encodings[candidate] and os.path.exists(os.path.join(self.build_dir, filename + suffix)):
+                    return filename + suffix, candidate
+        return filename, None
+
+    def finish_response(self, response, filename, encoding):
+        response.headers['Cache-Control'] = IMMUTABLE_CACHE_CONTROL
+        if filename.endswith(COMPRESSIBLE):
+            response.vary.add('Accept-Encoding')
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        return response
+
+    def serve(self, filename):
+        if filename not in self.originals:
+            return self._send_static_file(filename)
+        variant, encoding = self.variant_for(filename, request.accept_encodings)
+        response = send_from_directory(self.build_dir, variant, max_age=31536000,
+                                       mimetype=mimetype_for(filename))
+        return self.finish_response(response, filename, encoding)
+
+
+def mimetype_for(filename):
+    return mimetypes.guess_type(filename)[0] or 'application/octet-stream'
+
+
+if __name__ == '__main__':
+    assets = StaticAssets()
+    for original, fingerprinted in assets.build().items():
+        print(f"{original} -> {fingerprinted}")
@@ -0,0 +1,92 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from analytics_replica import AnalyticsReplica
+
+
+class FakeCursor:
+    def __init__(self, documents):
+        self.documents = documents
+
+    def sort(self, key, direction):
+        return FakeCursor(sorted(self.documents, key=lambda document: document[key]))
+
+    def limit(self, count):
+        return self.documents[:count]
+
+
+class FakeCollection:
+    def __init__(self):
+        self.documents = []
+
+    def find(self, query, projection=None):
+        after = query.get('_id', {}).get('$gt')
+        return FakeCursor([document for document in self.documents if after is None or document['_id'] > after])
+
+
+class FakeDatabase:
+    def __init__(self):
+        self.collection = FakeCollection()
+
+    def get_collection(self, name):
+        return self.collection
+
+
+def feedback(**fields):
+    document = {'_id': ObjectId(), 'user_email': 'a@example.com', 'video_name': 'video_1', 'safety': 4,
+                'speed': 3, 'convenience': 5, 'submitted_at': datetime.datetime.now(datetime.timezone.utc),
+                'comments': [{'start': 1.0, 'end': 2.0, 'text': 'ok'}]}
+    document.update(fields)
+    return document
+
+
+def verify_analytics_replica():
+    try:
+        print("\n=== Verifying Analytics Replica ===")
+
+        database = FakeDatabase()
+        good = feedback()
+        # Shapes stored before submissions were validated
+        bad = feedback(user_email={'$where': 'x'}, video_name=['video_2'], submitted_at={'$date': 1},
+                       comments=[{'start': 1.0, 'end': 2.0, 'text': {'$where': 'x'}},
+                                 {'start': 3.0, 'end': 4.0, 'text': 'kept'}])
+        after = feedback(video_name='video_3')
+        database.collection.documents = [good, bad, after]
+
+        replica = AnalyticsReplica(':memory:')
+        replica.sync(database, batch_size=2)
+        if replica.get_high_water_mark() != after['_id']:
+            print("❌ The sync did not get past a document with non-string fields")
+            return False
+        rows = {row['id']: row for row in replica.query('SELECT * FROM feedbacks')}
+        if len(rows) != 3 or rows[str(bad['_id'])]['comment_count'] != 1:
+            print(f"❌ Expected all 3 feedbacks, the malformed one with 1 valid comment, got {rows}")
+            return False
+        print("✅ A document with non-string fields is stored instead of failing its batch")
+
+        newer = feedback(video_name='video_4')
+        database.collection.documents.append(newer)
+        replica.sync(database)
+        if replica.get_high_water_mark() != newer['_id']:
+            print("❌ A later sync did not advance the high-water mark")
+            return False
+        print("✅ Later syncs keep advancing the high-water mark")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the analytics replica: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_analytics_replica():
+        print("🎉 Analytics replica verification successful!")
+    else:
+        print("❌ Analytics replica verification failed!")
+        sys.exit(1)
@@ -0,0 +1,84 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import comment_analysis
+from comment_analysis import CommentAnalyzer, analyze_text, normalize
+
+
+class FakeDatabase:
+    """Records every batch of analyses written back"""
+
+    def __init__(self):
+        self.writes = []
+
+    def set_analyzed_comments(self, collection_name, analyses):
+        self.writes.append(analyses)
+
+
+def feedback(_id, video_name, *texts):
+    return {'_id': _id, 'video_name': video_name,
+            'comments': [{'start': i, 'end': i + 1, 'text': text} for i, text in enumerate(texts)]}
+
+
+def verify_comment_analysis():
+    try:
+        print("\n=== Verifying Comment Analysis ===")
+
+        if analyze_text(normalize("Not safe, braking too late"))['sentiment_label'] != 'negative':
+            print("❌ A negated positive word was not scored as negative")
+            return False
+        if analyze_text(normalize("Smooth and careful lane change"))['sentiment_label'] != 'positive':
+            print("❌ A positive comment was not scored as positive")
+            return False
+        print("✅ Sentiment follows the lexicon and negation")
+
+        calls = []
+        original = comment_analysis.analyze_text
+
+        def counting_analyze_text(text):
+            calls.append(text)
+            return original(text)
+
+        comment_analysis.analyze_text = counting_analyze_text
+        database = FakeDatabase()
+        analyzer = CommentAnalyzer(database, workers=0)
+        analyzer.process([
+            feedback(1, 'video_1', "Too fast at the turn", "too fast at the turn!!", "Nice smooth stop"),
+            feedback(2, 'video_1', "Too fast at the turn"),
+            feedback(3, 'video_2', "Too fast at the turn"),
+        ])
+        analyzer.process([feedback(4, 'video_1', "nice smooth stop")])
+        comment_analysis.analyze_text = original
+
+        if len(calls) != 2:
+            print(f"❌ Expected 2 distinct comments to be analyzed, got {len(calls)}: {calls}")
+            return False
+        print("✅ Identical comments were analyzed once")
+
+        if len(database.writes) != 2 or sorted(database.writes[0]) != [1, 2, 3]:
+            print(f"❌ Expected one write per batch, got {database.writes}")
+            return False
+        first = database.writes[0][1]
+        if len(first) != 3 or first[0]['cluster'] != first[1]['cluster'] or first[0]['cluster'] == first[2]['cluster']:
+            print(f"❌ Wrong near-duplicate clusters: {[item['cluster'] for item in first]}")
+            return False
+        if database.writes[1][4][0]['cluster'] != first[2]['cluster']:
+            print("❌ A later batch did not join the cluster an earlier batch started")
+            return False
+        print("✅ One bulk write per batch, with near-duplicates clustered across batches")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying comment analysis: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_comment_analysis():
+        print("🎉 Comment analysis verification successful!")
+    else:
+        print("❌ Comment analysis verification failed!")
+        sys.exit(1)
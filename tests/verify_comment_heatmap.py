@@ -0,0 +1,87 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from comment_heatmap import MAX_BINS, CommentHeatmap, bin_comment_times
+
+
+class FakeCollection:
+    def __init__(self, starts):
+        self.starts = starts
+
+    def aggregate(self, pipeline, **kwargs):
+        return [{'start': start} for start in self.starts]
+
+
+class FakeDatabase:
+    def __init__(self, starts):
+        self.collection = FakeCollection(starts)
+
+    def get_collection(self, name):
+        return self.collection
+
+
+def verify_comment_heatmap():
+    try:
+        print("\n=== Verifying Comment Heatmap ===")
+
+        counts = bin_comment_times([0.5, 1.5, 1.7, 4.2], 1.0)
+        if counts.tolist() != [1, 2, 0, 0, 1]:
+            print(f"❌ Wrong histogram: {counts.tolist()}")
+            return False
+        print("✅ Comment times are binned per window")
+
+        counts = bin_comment_times([1, 2e7, 1e9], 1.0)
+        if counts.tolist() != [0, 1]:
+            print(f"❌ Far-out comment times were binned: {len(counts)} bins")
+            return False
+        print("✅ Comment times past the longest video are dropped")
+
+        for bin_seconds in (0.000001, 0.0, -1.0, float('nan')):
+            try:
+                bin_comment_times([1, 20], bin_seconds)
+                print(f"❌ bin_seconds={bin_seconds} was accepted")
+                return False
+            except ValueError:
+                pass
+        try:
+            bin_comment_times([1, 12000], 0.1)
+            print(f"❌ A histogram of more than {MAX_BINS} bins was built")
+            return False
+        except ValueError:
+            pass
+        print("✅ Bin sizes that are too small or need too many bins are rejected")
+
+        import app
+        from services import Services
+        app.services = Services(comment_heatmap=CommentHeatmap(FakeDatabase([1.0, 20.0, 1e9])))
+        client = app.app.test_client()
+        expected = {'bin=1': 200, 'bin=0.000001': 400, 'bin=0.1': 200, 'bin=nan': 400, 'bin=5000': 400}
+        for query, status in expected.items():
+            response = client.get(f"/api/videos/video_1/heatmap?{query}")
+            if response.status_code != status:
+                print(f"❌ Expected {status} for ?{query}, got {response.status_code}")
+                return False
+        if len(client.get("/api/videos/video_1/heatmap?bin=1").get_json()['counts']) != 21:
+            print("❌ The endpoint binned a comment past the longest video")
+            return False
+        app.services = Services(comment_heatmap=CommentHeatmap(FakeDatabase([1.0, 14000.0])))
+        if client.get("/api/videos/video_1/heatmap?bin=0.1").status_code != 400:
+            print("❌ The endpoint built a histogram of more than MAX_BINS bins")
+            return False
+        print("✅ The heatmap endpoint answers 400 instead of building huge histograms")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the comment heatmap: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_comment_heatmap():
+        print("🎉 Comment heatmap verification successful!")
+    else:
+        print("❌ Comment heatmap verification failed!")
+        sys.exit(1)
@@ -0,0 +1,63 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId
+
+from db import Database
+
+try:
+    import mongomock
+except ImportError:
+    mongomock = None
+
+
+class FakeConnectionManager:
+    def __init__(self):
+        self.client = mongomock.MongoClient()
+
+    def get_database_name(self):
+        return 'verify'
+
+    def get_client(self):
+        return self.client
+
+
+def verify_feedback_summary():
+    try:
+        print("\n=== Verifying Feedback Summary ===")
+
+        database = Database(FakeConnectionManager())
+        documents = [{'_id': ObjectId(), 'video_name': 'video_1', 'safety': 4, 'speed': 2, 'convenience': 5},
+                     {'_id': ObjectId(), 'video_name': 'video_1', 'safety': 2, 'speed': None, 'convenience': 3}]
+        database.db['feedbacks'].insert_many([dict(document) for document in documents])
+
+        database.update_feedback_summary(documents[:1])
+        # A retry or spool replay reports the first document again, as a duplicate
+        database.update_feedback_summary(documents)
+        database.update_feedback_summary(documents)
+        summary = database.get_feedback_summary('video_1')[0]
+        if summary['count'] != 2 or summary['safety']['count'] != 2 or summary['speed']['count'] != 1:
+            print(f"❌ Expected each feedback to be counted once, got {summary}")
+            return False
+        if summary['safety']['mean'] != 3:
+            print(f"❌ Wrong mean safety: {summary['safety']['mean']}")
+            return False
+        print("✅ Feedbacks reported more than once are counted once")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the feedback summary: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if mongomock is None:
+        print("⚠️ mongomock is not installed; skipping the feedback summary verification")
+    elif verify_feedback_summary():
+        print("🎉 Feedback summary verification successful!")
+    else:
+        print("❌ Feedback summary verification failed!")
+        sys.exit(1)
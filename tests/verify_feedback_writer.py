@@ -0,0 +1,139 @@
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from bson import ObjectId, json_util
+
+from db import FeedbackWriteError, FeedbackWriter
+from feedback_spool import FeedbackSpool
+
+
+class FakeDatabase:
+    """Stores inserted documents by _id; raises while down and rejects documents marked poison"""
+
+    def __init__(self):
+        self.documents = {}
+        self.down = False
+        self.lose_reply = False
+
+    def insert_many_new(self, collection_name, documents):
+        if self.down:
+            raise ConnectionError("MongoDB is down")
+        if self.lose_reply:
+            # The documents are written but the reply never arrives
+            self.lose_reply = False
+            self.documents.update((document['_id'], document) for document in documents)
+            raise ConnectionError("Connection reset")
+        failed = [document for document in documents if document.get('poison')]
+        inserted = [document for document in documents
+                    if document['_id'] not in self.documents and not document.get('poison')]
+        for document in inserted:
+            self.documents[document['_id']] = document
+        return inserted, failed
+
+
+def wait_for(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.05)
+    return condition()
+
+
+def verify_feedback_writer():
+    try:
+        print("\n=== Verifying Feedback Writer ===")
+
+        database = FakeDatabase()
+        current = {'db': None}
+        written = []
+        spool = FeedbackSpool(tempfile.mkdtemp())
+        writer = FeedbackWriter(lambda: current['db'], synchronous=True, spool=spool, flush_interval=0.05,
+                                replay_interval=60, on_written=written.extend)
+
+        if writer.submit({'video_name': 'video_1'}) is not False:
+            print("❌ A write without a database was reported as written")
+            return False
+        current['db'] = database
+        database.down = True
+        if writer.submit({'video_name': 'video_2'}) is not False:
+            print("❌ A write while MongoDB is down was reported as written")
+            return False
+        if database.documents:
+            print("❌ Documents were written while MongoDB was down")
+            return False
+        print("✅ Synchronous writes while MongoDB is unavailable stay in the spool")
+
+        database.down = False
+        if writer.submit({'video_name': 'video_3'}) is not True:
+            print("❌ A write after MongoDB came back was not reported as written")
+            return False
+        if not wait_for(lambda: len(database.documents) == 3):
+            print(f"❌ Expected the spooled documents to be replayed, MongoDB has {len(database.documents)}")
+            return False
+        if sorted(document['video_name'] for document in written) != ['video_1', 'video_2', 'video_3']:
+            print(f"❌ The post-write hook saw {written}")
+            return False
+        print("✅ Spooled documents were replayed once MongoDB was back, using the database resolved at write time")
+
+        writer.close()
+        if os.listdir(spool.directory):
+            print(f"❌ Spool segments were left behind: {os.listdir(spool.directory)}")
+            return False
+
+        unspooled = FeedbackWriter(lambda: None, synchronous=True)
+        try:
+            unspooled.submit({'video_name': 'video_4'})
+            print("❌ A failed write without a spool was not reported")
+            return False
+        except FeedbackWriteError:
+            pass
+        print("✅ A failed write without a spool raises FeedbackWriteError")
+
+        directory = tempfile.mkdtemp()
+        segments = {
+            'feedback-1-1000-1.jsonl': [{'_id': ObjectId(), 'video_name': 'video_5', 'poison': True},
+                                        {'_id': ObjectId(), 'video_name': 'video_6'}],
+            'feedback-1-2000-2.jsonl': [{'_id': ObjectId(), 'video_name': 'video_7'}],
+        }
+        for name, documents in segments.items():
+            with open(os.path.join(directory, name), 'w', encoding='utf-8') as f:
+                f.writelines(json_util.dumps(document) + '\n' for document in documents)
+        database = FakeDatabase()
+        replayed = FeedbackSpool(directory).replay(database)
+        if replayed != 2 or sorted(document['video_name'] for document in database.documents.values()) != [
+                'video_6', 'video_7']:
+            print(f"❌ A rejected document stopped the replay: {replayed} replayed")
+            return False
+        if sorted(os.listdir(directory)) != ['feedback-1-1000-1.rejected']:
+            print(f"❌ Expected only the rejected document to be left, got {os.listdir(directory)}")
+            return False
+        print("✅ A rejected document is set aside and the segments after it are still replayed")
+
+        written = []
+        database = FakeDatabase()
+        database.lose_reply = True
+        writer = FeedbackWriter(database, spool=None, on_written=written.extend)
+        document = {'_id': ObjectId(), 'video_name': 'video_8'}
+        if not writer._insert_with_retry([document], retries=2) or written != [document]:
+            print(f"❌ A document written by an attempt whose reply was lost was not reported: {written}")
+            return False
+        print("✅ Documents an earlier attempt wrote are still reported when they come back as duplicates")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the feedback writer: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_feedback_writer():
+        print("🎉 Feedback writer verification successful!")
+    else:
+        print("❌ Feedback writer verification failed!")
+        sys.exit(1)
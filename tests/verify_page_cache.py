@@ -0,0 +1,77 @@
+import asyncio
+import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from page_cache import RenderedPageCache
+
+
+def verify_page_cache():
+    try:
+        print("\n=== Verifying Rendered Page Cache ===")
+
+        cache = RenderedPageCache()
+        renders = []
+
+        def render():
+            renders.append(threading.current_thread().name)
+            time.sleep(0.2)
+            return 'gallery'
+
+        results = []
+        threads = [threading.Thread(target=lambda: results.append(cache.get(('videos', 1), render)))
+                   for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        if len(renders) != 1 or len(set(results)) != 1 or len(results) != 8:
+            print(f"❌ Expected 8 concurrent misses to render once, rendered {len(renders)} times")
+            return False
+        if cache._key_locks:
+            print(f"❌ Per-key locks were left behind: {cache._key_locks}")
+            return False
+        print("✅ Concurrent misses on one key render the page once")
+
+        cache = RenderedPageCache()
+        async_renders = []
+
+        async def async_render():
+            async_renders.append(1)
+            await asyncio.sleep(0.2)
+            return 'gallery'
+
+        async def fetch_all():
+            return await asyncio.gather(*(cache.get_async(('videos', 1), async_render) for _ in range(8)))
+
+        results = asyncio.run(fetch_all())
+        if len(async_renders) != 1 or len(set(results)) != 1:
+            print(f"❌ Expected 8 concurrent async misses to render once, rendered {len(async_renders)} times")
+            return False
+        if cache._async_key_locks:
+            print(f"❌ Per-key async locks were left behind: {cache._async_key_locks}")
+            return False
+        print("✅ Concurrent async misses on one key render the page once")
+
+        cache.get(('videos', 2), lambda: 'other')
+        if len(async_renders) != 1 or cache.get(('videos', 1), render) != results[0]:
+            print("❌ A cached page was rendered again")
+            return False
+        print("✅ Later requests are served from the cache")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the page cache: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_page_cache():
+        print("🎉 Page cache verification successful!")
+    else:
+        print("❌ Page cache verification failed!")
+        sys.exit(1)
@@ -0,0 +1,158 @@
+import base64
+import json
+import os
+import re
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import google_crc32c
+
+from upload_videos import BulkUploader, UploadState, find_files
+
+CHUNK_SIZE = 256 * 1024
+
+
+class Killed(BaseException):
+    """Stands in for the uploader being killed mid-upload"""
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=None, headers=None):
+        self.status_code = status_code
+        self.headers = headers or {}
+        self.content = json.dumps(body).encode() if body is not None else b''
+
+    def json(self):
+        return json.loads(self.content)
+
+
+class FakeGcs:
+    """Enough of the GCS JSON upload API for google-resumable-media"""
+
+    name = 'fake-bucket'
+
+    def __init__(self):
+        self.objects = {}
+        self.sessions = {}
+        self.requests = 0
+        self.kill_after_chunks = None
+
+    def list_blobs(self, prefix=None, **kwargs):
+        return [FakeObject(name, data) for name, data in self.objects.items()]
+
+    def _store(self, metadata, data):
+        crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode('ascii')
+        if metadata.get('crc32c') and metadata['crc32c'] != crc32c:
+            return FakeResponse(400, {'error': 'crc32c mismatch'})
+        self.objects[metadata['name']] = data
+        return FakeResponse(200, {'name': metadata['name'], 'size': str(len(data)), 'crc32c': crc32c})
+
+    def request(self, method, url, data=None, headers=None, timeout=None, **kwargs):
+        self.requests += 1
+        headers = headers or {}
+        if 'uploadType=multipart' in url:
+            boundary = re.search(rb'boundary="?([^";]+)', headers['content-type']).group(1)
+            parts = data.split(b'--' + boundary)
+            metadata = json.loads(parts[1].split(b'\r\n\r\n', 1)[1])
+            return self._store(metadata, parts[2].split(b'\r\n\r\n', 1)[1][:-2])
+        if 'uploadType=resumable' in url:
+            session = f"https://upload.example/session/{len(self.sessions)}"
+            self.sessions[session] = {'metadata': json.loads(data), 'data': b''}
+            return FakeResponse(200, headers={'location': session})
+        session = self.sessions[url]
+        received = session['data']
+        content_range = headers.get('content-range', '')
+        if content_range.startswith('bytes */'):
+            if session.get('done'):
+                return self._store(session['metadata'], received)
+            return FakeResponse(308, headers={'range': f"bytes=0-{len(received) - 1}"} if received else {})
+        if self.kill_after_chunks is not None:
+            if self.kill_after_chunks == 0:
+                raise Killed()
+            self.kill_after_chunks -= 1
+        start, end, total = re.match(r'bytes (\d+)-(\d+)/(\d+|\*)', content_range).groups()
+        session['data'] = received[:int(start)] + data
+        if total != '*' and int(end) + 1 == int(total):
+            session['done'] = True
+            return self._store(session['metadata'], session['data'])
+        return FakeResponse(308, headers={'range': f"bytes=0-{int(end)}"})
+
+
+class FakeObject:
+    def __init__(self, name, data):
+        self.name = name
+        self.size = len(data)
+        self.crc32c = base64.b64encode(google_crc32c.Checksum(data).digest()).decode('ascii')
+
+
+def verify_upload():
+    try:
+        print("\n=== Verifying Bulk Upload ===")
+
+        directory = tempfile.mkdtemp()
+        os.makedirs(os.path.join(directory, 'thumbnails'))
+        files = {
+            'small.mp4': os.urandom(1000),
+            'large.mp4': os.urandom(CHUNK_SIZE * 5 + 123),
+            'thumbnails/small.jpg': os.urandom(500),
+            'notes.txt': b'ignored',
+        }
+        for name, data in files.items():
+            with open(os.path.join(directory, name), 'wb') as f:
+                f.write(data)
+
+        gcs = FakeGcs()
+        state_path = os.path.join(directory, '.upload_state.json')
+        uploader = BulkUploader(object, gcs, workers=1, chunk_size=CHUNK_SIZE, state=UploadState(state_path))
+        uploader.transport = gcs
+        large = [entry for entry in find_files(directory) if entry[1] == 'large.mp4']
+        gcs.kill_after_chunks = 2
+        try:
+            uploader.upload_file(*large[0])
+            print("❌ The simulated kill did not interrupt the upload")
+            return False
+        except Killed:
+            pass
+        if not UploadState(state_path).get('large.mp4', [len(files['large.mp4']),
+                                                          os.stat(large[0][0]).st_mtime_ns,
+                                                          FakeObject('', files['large.mp4']).crc32c]):
+            print("❌ The interrupted session was not saved")
+            return False
+
+        gcs.kill_after_chunks = None
+        uploader = BulkUploader(object, gcs, workers=4, chunk_size=CHUNK_SIZE, state=UploadState(state_path))
+        uploader.transport = gcs
+        results = uploader.upload_all(find_files(directory))
+        if results['uploaded'] != 3 or results['failed']:
+            print(f"❌ Expected 3 uploads, got {results}")
+            return False
+        if any(gcs.objects.get(name) != data for name, data in files.items() if name != 'notes.txt'):
+            print("❌ The bucket does not hold the local files' bytes")
+            return False
+        if len(gcs.sessions) != 1:
+            print(f"❌ Expected the interrupted session to be resumed, {len(gcs.sessions)} sessions were started")
+            return False
+        print("✅ Interrupted upload resumed from its saved session; every object matches its file")
+
+        requests_before = gcs.requests
+        results = uploader.upload_all(find_files(directory))
+        if results['skipped'] != 3 or gcs.requests != requests_before:
+            print(f"❌ Expected unchanged files to be skipped without uploads, got {results}")
+            return False
+        print("✅ Files whose crc32c already matches were skipped")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying uploads: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_upload():
+        print("🎉 Upload verification successful!")
+    else:
+        print("❌ Upload verification failed!")
+        sys.exit(1)
@@ -0,0 +1,115 @@
+import datetime
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.fakes import FakeBucket
+from video_catalog import VideoCatalog
+
+
+def verify_single_list_call_per_refresh():
+    try:
+        print("\n=== Verifying Video Catalog Listing ===")
+
+        names = [f"video_{i}.mp4" for i in range(500)]
+        names += [f"video_{i}.jpg" for i in range(0, 500, 2)]
+        names += [f"thumbnails/video_{i}.jpg" for i in range(1, 500, 4)]
+        bucket = FakeBucket(names=names)
+        catalog = VideoCatalog(bucket, 'fake-bucket', ttl=0)
+
+        videos = catalog.refresh()
+        if bucket.calls['list_blobs'] != 1:
+            print(f"❌ Expected 1 list call for the first refresh, got {bucket.calls['list_blobs']}")
+            return False
+        print("✅ First refresh made exactly one list call")
+
+        if len(videos) != 500:
+            print(f"❌ Expected 500 videos, got {len(videos)}")
+            return False
+
+        expected = {
+            'video_0': "https://storage.googleapis.com/fake-bucket/video_0.jpg",
+            'video_1': "https://storage.googleapis.com/fake-bucket/thumbnails/video_1.jpg",
+            'video_3': None,
+        }
+        for video_id, thumbnail in expected.items():
+            if videos[video_id].get('thumbnail') != thumbnail:
+                print(f"❌ Wrong thumbnail for {video_id}: {videos[video_id].get('thumbnail')}")
+                return False
+        print("✅ Thumbnails resolved from the root and thumbnails/ prefix")
+
+        catalog.refresh()
+        if bucket.calls['list_blobs'] != 2:
+            print(f"❌ Expected 2 list calls after the second refresh, got {bucket.calls['list_blobs']}")
+            return False
+        print("✅ Second refresh made exactly one more list call")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying the catalog: {str(e)}")
+        return False
+
+
+def verify_pagination():
+    try:
+        print("\n=== Verifying Video Catalog Pagination ===")
+
+        bucket = FakeBucket(names=[f"video_{i}.mp4" for i in range(2000)])
+        for i, blob in enumerate(bucket.blobs.values()):
+            blob.updated += datetime.timedelta(minutes=i)
+        catalog = VideoCatalog(bucket, 'fake-bucket')
+        # Keep the cold catalog cold to see what a first page costs on its own
+        catalog.refresh_in_background = lambda: False
+
+        videos, cursor = catalog.get_page(limit=24)
+        if bucket.calls['list_blobs'] != 1 or len(videos) != 24 or not cursor:
+            print(f"❌ Expected one list call for a cold page of 24, got {bucket.calls['list_blobs']} calls, {len(videos)} videos")
+            return False
+        print("✅ A cold first page cost one list call")
+
+        cold_next, _ = catalog.get_page(cursor=cursor, limit=24)
+        del catalog.refresh_in_background
+        catalog.refresh()
+        warm_next, _ = catalog.get_page(cursor=cursor, limit=24)
+        if list(cold_next) != list(warm_next):
+            print("❌ A cursor from a cold page continues differently once the catalog is loaded")
+            return False
+        print("✅ Cursors continue the same way from a listing page and from the catalog")
+
+        for sort in ('name', 'updated', '-updated'):
+            seen, cursor = [], None
+            while True:
+                videos, cursor = catalog.get_page(sort, cursor, limit=97)
+                seen.extend(videos)
+                if not cursor:
+                    break
+            if len(seen) != 2000 or len(set(seen)) != 2000:
+                print(f"❌ Paging by {sort} returned {len(seen)} videos, {len(set(seen))} distinct")
+                return False
+        if seen[0] != 'video_1999':
+            print(f"❌ Expected the newest video first for -updated, got {seen[0]}")
+            return False
+        print("✅ Every sort order pages through all 2000 videos exactly once")
+
+        try:
+            catalog.get_page('updated', catalog.get_page('name')[1])
+            print("❌ A name cursor was accepted for sort=updated")
+            return False
+        except ValueError:
+            print("✅ Cursors are rejected for a different sort order")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying pagination: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_single_list_call_per_refresh() and verify_pagination():
+        print("🎉 Video catalog verification successful!")
+    else:
+        print("❌ Video catalog verification failed!")
+        sys.exit(1)
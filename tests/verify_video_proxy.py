@@ -0,0 +1,120 @@
+import asyncio
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import httpx
+
+from async_gcs import AsyncBucket
+from video_proxy import IncompleteStream, iter_blob_range
+
+DATA = bytes(range(256)) * 40
+
+
+class FlakyBlob:
+    """Serves DATA, failing the download at each offset listed in fail_at once"""
+
+    def __init__(self, fail_at=(), short_at=()):
+        self.name = 'video_1.mp4'
+        self.generation = 1
+        self.size = len(DATA)
+        self.fail_at = list(fail_at)
+        self.short_at = list(short_at)
+
+    def download_as_bytes(self, start, end, checksum=None):
+        if start in self.fail_at:
+            self.fail_at.remove(start)
+            raise ConnectionError("Connection reset")
+        if start in self.short_at:
+            self.short_at.remove(start)
+            return b''
+        return DATA[start:end + 1]
+
+
+class Credentials:
+    valid = True
+    token = 'token'
+
+
+class BrokenStream(httpx.AsyncByteStream):
+    """Sends some bytes, then fails like a connection reset by GCS"""
+
+    def __init__(self, data):
+        self.data = data
+
+    async def __aiter__(self):
+        yield self.data
+        raise httpx.ReadError("Connection reset")
+
+
+def flaky_transport(failures):
+    def handler(request):
+        start, end = (int(value) for value in request.headers['Range'][len('bytes='):].split('-'))
+        if failures:
+            failures.pop()
+            return httpx.Response(206, stream=BrokenStream(DATA[start:start + 1000]))
+        return httpx.Response(206, content=DATA[start:end + 1])
+    return httpx.MockTransport(handler)
+
+
+async def read_async(failures, retries=3):
+    bucket = AsyncBucket('bench-bucket', Credentials())
+    bucket._client = httpx.AsyncClient(transport=flaky_transport(failures))
+    try:
+        return b''.join([chunk async for chunk in bucket.iter_range(FlakyBlob(), 100, len(DATA) - 1,
+                                                                     retries=retries)])
+    finally:
+        await bucket.aclose()
+
+
+def verify_video_proxy():
+    try:
+        print("\n=== Verifying Video Proxy Streaming ===")
+
+        body = b''.join(iter_blob_range(FlakyBlob(fail_at=[1124], short_at=[2148]), 100, len(DATA) - 1,
+                                        chunk_size=1024))
+        if body != DATA[100:]:
+            print(f"❌ Expected {len(DATA) - 100} bytes after resuming, got {len(body)}")
+            return False
+        print("✅ A failed or empty download is resumed from the current offset")
+
+        body = b''
+        try:
+            for chunk in iter_blob_range(FlakyBlob(fail_at=[1124] * 3), 100, len(DATA) - 1, chunk_size=1024,
+                                         retries=2):
+                body += chunk
+            print("❌ A stream that kept failing ended as if it were complete")
+            return False
+        except IncompleteStream:
+            pass
+        if body != DATA[100:1124]:
+            print("❌ Bytes were skipped before giving up")
+            return False
+        print("✅ A stream that keeps failing raises instead of ending early")
+
+        body = asyncio.run(read_async([1, 1]))
+        if body != DATA[100:]:
+            print(f"❌ Expected {len(DATA) - 100} bytes after resuming the async stream, got {len(body)}")
+            return False
+        try:
+            asyncio.run(read_async([1, 1, 1], retries=2))
+            print("❌ An async stream that kept failing ended as if it were complete")
+            return False
+        except IncompleteStream:
+            pass
+        print("✅ The async stream resumes from the current offset and raises when it keeps failing")
+
+        return True
+
+    except Exception as e:
+        print(f"\n❌ ERROR: Unexpected error while verifying video proxy streaming: {str(e)}")
+        return False
+
+
+if __name__ == "__main__":
+    if verify_video_proxy():
+        print("🎉 Video proxy verification successful!")
+    else:
+        print("❌ Video proxy verification failed!")
+        sys.exit(1)
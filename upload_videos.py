@@ -0,0 +1,291 @@
+"""Upload a directory of study videos and thumbnails to the bucket.
+
+    python upload_videos.py DIRECTORY [--prefix PREFIX] [--workers 8] [--chunk-size-mb 16]
+
+Every .mp4 and .jpg under DIRECTORY becomes the object PREFIX + its path
+relative to DIRECTORY, using the same credentials and bucket as the app.
+Files already in the bucket with the same size and crc32c are skipped.
+An interrupted run picks up where it stopped when it is run again.
+"""
+from google.auth.transport.requests import AuthorizedSession
+from google.resumable_media import common
+from google.resumable_media.requests import MultipartUpload, ResumableUpload
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from requests.adapters import HTTPAdapter
+from configManager import ConfigManager
+from gcs_client import READ_RETRY, READ_TIMEOUT
+from logging_config import configure_logging
+import google_crc32c
+import mimetypes
+import threading
+import argparse
+import requests
+import logging
+import base64
+import json
+import time
+import sys
+import os
+
+UPLOAD_URL = 'https://storage.googleapis.com/upload/storage/v1/b/{bucket}/o?uploadType={upload_type}'
+EXTENSIONS = ('.mp4', '.jpg')
+# Resumable upload chunks must be a multiple of 256 KiB
+CHUNK_QUANTUM = 256 * 1024
+DEFAULT_CHUNK_SIZE = 16 * 1024 * 1024
+READ_SIZE = 8 * 1024 * 1024
+MAX_ATTEMPTS = 5
+
+
+class SessionExpired(Exception):
+    pass
+
+
+def file_crc32c(path):
+    """Return a file's crc32c, base64-encoded as GCS reports it"""
+    checksum = google_crc32c.Checksum()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(READ_SIZE), b''):
+            checksum.update(chunk)
+    return base64.b64encode(checksum.digest()).decode('ascii')
+
+
+def find_files(directory, prefix=''):
+    """Return (path, object name) for every video and thumbnail under directory"""
+    files = []
+    for root, dirs, names in os.walk(directory):
+        dirs[:] = sorted(name for name in dirs if not name.startswith('.'))
+        for name in sorted(names):
+            if name.lower().endswith(EXTENSIONS):
+                path = os.path.join(root, name)
+                files.append((path, prefix + os.path.relpath(path, directory).replace(os.sep, '/')))
+    return files
+
+
+class UploadState:
+    """Resumable upload sessions in progress, kept in a JSON file.
+
+    A session URL is saved as soon as an upload is initiated and removed when
+    the upload completes, so a run that was killed can continue the upload
+    on the next run. A saved session is only reused while the local file
+    still has the size, mtime and crc32c it had when the session started.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._lock = threading.Lock()
+        try:
+            with open(path) as f:
+                self._sessions = json.load(f)
+        except FileNotFoundError:
+            self._sessions = {}
+        except ValueError:
+            logging.warning(f"Ignoring unreadable upload state in {path}")
+            self._sessions = {}
+
+    def get(self, name, fingerprint):
+        session = self._sessions.get(name)
+        if session and session.get('fingerprint') == fingerprint:
+            return session['url']
+        return None
+
+    def put(self, name, fingerprint, url):
+        with self._lock:
+            self._sessions[name] = {'url': url, 'fingerprint': fingerprint}
+            self._save()
+
+    def remove(self, name):
+        with self._lock:
+            if self._sessions.pop(name, None) is not None:
+                self._save()
+
+    def _save(self):
+        temporary = f"{self.path}.tmp"
+        with open(temporary, 'w') as f:
+            json.dump(self._sessions, f, indent=2)
+        os.replace(temporary, self.path)
+
+
+class BulkUploader:
+    """Uploads files to a bucket from a thread pool, verifying every one.
+
+    Files up to chunk_size go up in a single multipart request. Larger
+    files use a resumable session and are sent chunk_size bytes at a time;
+    when a chunk fails beyond google-resumable-media's own retries, the
+    upload asks GCS how much it already has and continues from there.
+
+    The crc32c of each file is sent with its metadata, so GCS rejects an
+    upload whose content does not match. The crc32c GCS reports back for
+    the stored object is compared with the local one too.
+    """
+
+    def __init__(self, credentials, bucket, workers=8, chunk_size=DEFAULT_CHUNK_SIZE, state=None,
+                 max_attempts=MAX_ATTEMPTS):
+        if chunk_size % CHUNK_QUANTUM:
+            raise ValueError("chunk_size must be a multiple of 256 KiB")
+        self.bucket = bucket
+        self.workers = workers
+        self.chunk_size = chunk_size
+        self.state = state
+        self.max_attempts = max_attempts
+        self.transport = AuthorizedSession(credentials)
+        adapter = HTTPAdapter(pool_connections=workers, pool_maxsize=workers)
+        self.transport.mount('https://', adapter)
+
+    def existing_objects(self, prefix=''):
+        """Return {name: (size, crc32c)} for the objects under prefix, from one listing"""
+        blobs = self.bucket.list_blobs(prefix=prefix or None, fields='items(name,size,crc32c),nextPageToken',
+                                       timeout=READ_TIMEOUT, retry=READ_RETRY)
+        return {blob.name: (blob.size, blob.crc32c) for blob in blobs}
+
+    def upload_all(self, files, prefix=''):
+        """Upload (path, object name) pairs; returns counts of each outcome and the bytes sent"""
+        existing = self.existing_objects(prefix)
+        results = {'uploaded': 0, 'skipped': 0, 'failed': 0, 'bytes': 0}
+        with ThreadPoolExecutor(self.workers) as pool:
+            futures = {pool.submit(self.upload_file, path, name, existing.get(name)): name for path, name in files}
+            for future in as_completed(futures):
+                try:
+                    outcome, size = future.result()
+                except Exception:
+                    logging.error(f"Failed to upload {futures[future]}", exc_info=True)
+                    results['failed'] += 1
+                    continue
+                results[outcome] += 1
+                if outcome == 'uploaded':
+                    results['bytes'] += size
+        return results
+
+    def upload_file(self, path, name, existing=None):
+        """Upload one file unless existing, its (size, crc32c) in the bucket, matches; returns (outcome, size)"""
+        stat = os.stat(path)
+        crc32c = file_crc32c(path)
+        if existing == (stat.st_size, crc32c):
+            logging.info(f"Skipping {name}: the bucket already has it")
+            return 'skipped', stat.st_size
+        content_type = mimetypes.guess_type(path)[0] or 'application/octet-stream'
+        metadata = {'name': name, 'crc32c': crc32c, 'contentType': content_type}
+        started = time.monotonic()
+        with open(path, 'rb') as stream:
+            if stat.st_size <= self.chunk_size:
+                upload = MultipartUpload(self._url('multipart'))
+                resource = upload.transmit(self.transport, stream.read(), metadata, content_type).json()
+            else:
+                fingerprint = [stat.st_size, stat.st_mtime_ns, crc32c]
+                resource = self._upload_resumable(stream, metadata, content_type, stat.st_size, fingerprint)
+        if resource.get('crc32c') != crc32c:
+            raise ValueError(f"crc32c of {name} in the bucket is {resource.get('crc32c')}, expected {crc32c}")
+        elapsed = time.monotonic() - started
+        logging.info(f"Uploaded {name}: {stat.st_size / 1e6:.1f} MB in {elapsed:.1f}s")
+        return 'uploaded', stat.st_size
+
+    def _upload_resumable(self, stream, metadata, content_type, size, fingerprint):
+        name = metadata['name']
+        session_url = self.state.get(name, fingerprint) if self.state else None
+        if session_url:
+            logging.info(f"Resuming the upload of {name} from an earlier run")
+        attempt = 0
+        while True:
+            try:
+                if session_url is None:
+                    stream.seek(0)
+                    upload = ResumableUpload(self._url('resumable'), self.chunk_size)
+                    upload.initiate(self.transport, stream, metadata, content_type, total_bytes=size)
+                    session_url = upload.resumable_url
+                    if self.state:
+                        self.state.put(name, fingerprint, session_url)
+                else:
+                    upload, resource = self._resume(session_url, stream, size)
+                    if resource is not None:
+                        break
+                    logging.info(f"Continuing {name} from byte {upload.bytes_uploaded} of {size}")
+                response = None
+                while not upload.finished:
+                    response = upload.transmit_next_chunk(self.transport)
+                resource = response.json()
+                break
+            except SessionExpired:
+                logging.warning(f"The upload session of {name} expired, starting over")
+                session_url = None
+                if self.state:
+                    self.state.remove(name)
+            except (requests.RequestException, common.InvalidResponse) as e:
+                attempt += 1
+                if attempt >= self.max_attempts:
+                    raise
+                logging.warning(f"Upload of {name} interrupted (attempt {attempt}/{self.max_attempts}): {e}")
+                time.sleep(min(2 ** attempt, 30))
+        if self.state:
+            self.state.remove(name)
+        return resource
+
+    def _resume(self, session_url, stream, size):
+        """Attach to an existing upload session
+
+        Returns (upload, None) positioned after the bytes GCS already has,
+        or (None, object resource) if the session had completed.
+        """
+        upload = ResumableUpload(self._url('resumable'), self.chunk_size)
+        # google-resumable-media has no public way to adopt a session started
+        # elsewhere; these are the fields initiate() sets, after which
+        # recover() asks GCS for its progress and seeks the stream to it
+        upload._resumable_url = session_url
+        upload._stream = stream
+        upload._total_bytes = size
+        upload._make_invalid()
+        try:
+            upload.recover(self.transport)
+        except common.InvalidResponse as e:
+            if e.response.status_code in (200, 201):
+                return None, e.response.json()
+            if e.response.status_code in (404, 410):
+                raise SessionExpired()
+            raise
+        return upload, None
+
+    def _url(self, upload_type):
+        return UPLOAD_URL.format(bucket=self.bucket.name, upload_type=upload_type)
+
+
+def load_bucket():
+    """Return (credentials, bucket) the way the app finds them"""
+    config_manager = ConfigManager(load_credentials=False)
+    if os.getenv('GOOGLE_CREDENTIALS_BASE64'):
+        ready = config_manager.initialize_with_base64_credentials()
+    else:
+        ready = config_manager.initialize_credentials()
+    if not ready or config_manager.storage_client is None:
+        raise RuntimeError("Could not load Google Cloud credentials")
+    return config_manager.credentials, config_manager.storage_client.bucket(config_manager.get_bucket_name())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('directory')
+    parser.add_argument('--prefix', default='', help="prepended to every object name, e.g. 'study-2/'")
+    parser.add_argument('--workers', type=int, default=8, help='files uploaded at the same time')
+    parser.add_argument('--chunk-size-mb', type=int, default=DEFAULT_CHUNK_SIZE // (1024 * 1024),
+                        help='resumable chunk size; smaller files are sent in one request')
+    parser.add_argument('--state', help='where to keep sessions for resuming (default: DIRECTORY/.upload_state.json)')
+    args = parser.parse_args()
+
+    configure_logging()
+    files = find_files(args.directory, args.prefix)
+    total_bytes = sum(os.path.getsize(path) for path, _ in files)
+    logging.info(f"Found {len(files)} files, {total_bytes / 1e9:.2f} GB, in {args.directory}")
+
+    credentials, bucket = load_bucket()
+    state = UploadState(args.state or os.path.join(args.directory, '.upload_state.json'))
+    uploader = BulkUploader(credentials, bucket, workers=args.workers,
+                            chunk_size=args.chunk_size_mb * 1024 * 1024, state=state)
+    started = time.monotonic()
+    results = uploader.upload_all(files, args.prefix)
+    elapsed = time.monotonic() - started
+    print(f"✅ Uploaded {results['uploaded']} files ({results['bytes'] / 1e9:.2f} GB) in {elapsed:.1f}s, "
+          f"{results['bytes'] / 1e6 / elapsed if elapsed else 0:.1f} MB/s; skipped {results['skipped']}")
+    if results['failed']:
+        print(f"❌ {results['failed']} files failed; run again to resume them")
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,186 @@
+import google_crc32c
+import contextlib
+import threading
+import hashlib
+import logging
+import base64
+import glob
+import os
+import metrics
+
+try:
+    import fcntl
+except ImportError:  # Windows development machines
+    fcntl = None
+
+DEFAULT_MAX_BYTES = int(os.getenv('VIDEO_CACHE_MAX_BYTES', str(2 * 1024 * 1024 * 1024)))
+CACHE_SUFFIX = '.mp4'
+
+
+class ChecksumMismatch(Exception):
+    pass
+
+
+class _Crc32cWriter:
+    """File wrapper that computes the crc32c of everything written through it"""
+
+    def __init__(self, file):
+        self.file = file
+        self.checksum = google_crc32c.Checksum()
+
+    def write(self, data):
+        self.checksum.update(data)
+        return self.file.write(data)
+
+    def flush(self):
+        self.file.flush()
+
+
+class VideoDiskCache:
+    """Size-bounded on-disk LRU cache of video blobs.
+
+    A blob is downloaded once, checked against the crc32c GCS reports for it
+    and atomically moved into the cache directory, named after the blob and
+    its generation so an overwritten video is never served stale. Hits touch
+    the file's mtime, and eviction removes the least recently used files
+    until the directory fits in max_bytes. Because the state lives in the
+    directory itself, every gunicorn worker sharing it sees the same cache;
+    concurrent first requests for a video are single-flighted with a lock
+    per video inside the process and a lock file across processes.
+    Eviction runs under one cache-wide lock, and counts the downloads this
+    process has in flight, so concurrent misses do not overshoot max_bytes.
+    """
+
+    def __init__(self, directory, max_bytes=DEFAULT_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        # path -> [lock, threads holding or waiting for it]; entries are
+        # dropped when the last one is done, so only in-flight paths are kept
+        self._key_locks = {}
+        self._evict_lock = threading.Lock()
+        self._reserved = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def get_path(self, blob):
+        """Return a local path holding the blob's bytes, downloading it if needed
+
+        Returns None when the blob is too large to cache.
+        """
+        if blob.size is None or blob.size > self.max_bytes:
+            return None
+        path = self._path_for(blob)
+        if self._touch(path):
+            metrics.cache_result('video_disk', True)
+            return path
+        with self._key_lock(path):
+            with self._file_lock(path):
+                if self._touch(path):
+                    metrics.cache_result('video_disk', True)
+                    return path
+                metrics.cache_result('video_disk', False)
+                self._download(blob, path)
+        return path
+
+    def _path_for(self, blob):
+        digest = hashlib.sha1(blob.name.encode('utf-8')).hexdigest()
+        return os.path.join(self.directory, f"{digest}-{blob.generation}{CACHE_SUFFIX}")
+
+    def _touch(self, path):
+        try:
+            os.utime(path)
+            return True
+        except FileNotFoundError:
+            return False
+
+    @contextlib.contextmanager
+    def _key_lock(self, path):
+        with self._lock:
+            entry = self._key_locks.get(path)
+            if entry is None:
+                entry = self._key_locks[path] = [threading.Lock(), 0]
+            entry[1] += 1
+        try:
+            with entry[0]:
+                yield
+        finally:
+            with self._lock:
+                entry[1] -= 1
+                if not entry[1]:
+                    del self._key_locks[path]
+
+    def _file_lock(self, path):
+        prefix = os.path.basename(path).split('-')[0]
+        return _FileLock(os.path.join(self.directory, f"{prefix}.lock"))
+
+    def _download(self, blob, path):
+        # Drop older generations of the same video
+        prefix = os.path.basename(path).split('-')[0]
+        for stale in glob.glob(os.path.join(self.directory, f"{prefix}-*{CACHE_SUFFIX}")):
+            if stale != path:
+                _remove(stale)
+        self._evict(blob.size)
+
+        temp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        try:
+            with open(temp_path, 'wb') as f:
+                writer = _Crc32cWriter(f)
+                blob.download_to_file(writer, if_generation_match=blob.generation, checksum=None)
+                metrics.gcs_call('download')
+                f.flush()
+                os.fsync(f.fileno())
+            if blob.crc32c:
+                expected = base64.b64decode(blob.crc32c)
+                if writer.checksum.digest() != expected:
+                    raise ChecksumMismatch(f"crc32c mismatch for {blob.name}")
+            os.replace(temp_path, path)
+            logging.info(f"Cached {blob.name} ({blob.size} bytes) at {path}")
+        finally:
+            _remove(temp_path)
+            with self._evict_lock:
+                self._reserved -= blob.size
+
+    def _evict(self, incoming_bytes):
+        """Make room for incoming_bytes and reserve it until the download finishes"""
+        with self._evict_lock, _FileLock(os.path.join(self.directory, 'evict.lock')):
+            entries = []
+            for path in glob.glob(os.path.join(self.directory, f"*{CACHE_SUFFIX}")):
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime, stat.st_size, path))
+            total = sum(size for _, size, _ in entries) + self._reserved
+            entries.sort()
+            for _, size, path in entries:
+                if total + incoming_bytes <= self.max_bytes:
+                    break
+                # Open file handles keep working after unlink, so readers are safe
+                _remove(path)
+                total -= size
+                logging.info(f"Evicted {path} from the video cache")
+            self._reserved += incoming_bytes
+
+
+class _FileLock:
+    def __init__(self, path):
+        self.path = path
+        self.file = None
+
+    def __enter__(self):
+        if fcntl is not None:
+            self.file = open(self.path, 'a')
+            fcntl.flock(self.file, fcntl.LOCK_EX)
+        return self
+
+    def __exit__(self, *exc_info):
+        if self.file is not None:
+            fcntl.flock(self.file, fcntl.LOCK_UN)
+            self.file.close()
+
+
+def _remove(path):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,343 @@
+from gcs_client import READ_RETRY, READ_TIMEOUT
+from bisect import bisect_left, bisect_right
+import metrics
+import hashlib
+import logging
+import base64
+import json
+import os
+import threading
+import time
+
+# Only the metadata we actually use, so each listing page stays small
+LIST_FIELDS = 'items(name,generation,size,updated,crc32c),nextPageToken'
+THUMBNAILS_PREFIX = 'thumbnails/'
+DEFAULT_TTL_SECONDS = int(os.getenv('VIDEO_CATALOG_TTL', '60'))
+NEGATIVE_TTL_SECONDS = int(os.getenv('VIDEO_NOT_FOUND_TTL', '10'))
+MAX_LOOKUPS = 1024
+# get_page() orders; a leading '-' means descending, i.e. newest first
+SORT_ORDERS = ('name', 'updated', '-updated')
+DEFAULT_PAGE_SIZE = 24
+MAX_PAGE_SIZE = 100
+VIDEO_GLOB = '**.mp4'
+
+
+class VideoCatalog:
+    """Process-wide cache of the videos in the bucket, keyed by video id.
+
+    The catalog is listed once and then served from memory. When the TTL
+    expires the stale catalog keeps being served while a single background
+    thread re-lists the bucket; entries whose blob generation did not change
+    are reused as-is, so only new or modified videos are rebuilt.
+
+    Each refresh is a single listing of the bucket. Videos, root-level
+    thumbnails and the thumbnails/ folder all come from that one pass and
+    are kept in a name -> blob index, so resolving a thumbnail is a lookup
+    rather than another list call.
+
+    Single-video routes use get_video(), which never lists the bucket: it
+    answers from the catalog when it is loaded and otherwise fetches the one
+    blob's metadata, memoizing hits for the TTL and misses for a shorter
+    negative TTL so a flood of 404s does not reach GCS.
+
+    The gallery and /api/videos use get_page(), which serves the catalog a
+    page at a time behind an opaque keyset cursor. In name order, the
+    bucket's own listing order, a cold catalog is not listed in full for the
+    first page: the page is a single listing call for limit objects from the
+    cursor on, and the full catalog loads in the background for the next
+    ones. Ordering by update time needs every video, so it always pages
+    through the full catalog.
+    """
+
+    def __init__(self, bucket, bucket_name, ttl=DEFAULT_TTL_SECONDS, negative_ttl=NEGATIVE_TTL_SECONDS):
+        self.bucket = bucket
+        self.bucket_name = bucket_name
+        self.ttl = ttl
+        self.negative_ttl = negative_ttl
+        self._videos = {}
+        self._index = {}
+        self._lookups = {}
+        self._loaded_at = None
+        self.version = None
+        # sort field -> (the _videos dict it was built from, sort keys, video ids)
+        self._sorted = {}
+        self._refresh_lock = threading.Lock()
+
+    def get_videos(self):
+        """Return the {video_id: video} dict, refreshing it if needed"""
+        if self._loaded_at is None:
+            self.refresh()
+        elif self.is_stale():
+            self.refresh_in_background()
+        return self._videos
+
+    def peek_version(self):
+        """Return a hash that changes whenever a video or thumbnail in the bucket does
+
+        Never waits for a listing: a cold or stale catalog is refreshed in the
+        background, and until a listing has succeeded this returns None.
+        """
+        if self.is_stale():
+            self.refresh_in_background()
+        return self.version
+
+    def get_page(self, sort='name', cursor=None, limit=DEFAULT_PAGE_SIZE):
+        """Return ({video_id: video}, next_cursor) for one page; next_cursor is None on the last one
+
+        Raises ValueError for a cursor that was not made by this sort order.
+        """
+        after = decode_cursor(cursor, sort)
+        if sort == 'name' and self._loaded_at is None:
+            self.refresh_in_background()
+            return self._page_from_listing(self._list_page(after, limit), after, limit)
+        self.get_videos()
+        return self._page_from_catalog(sort, after, limit)
+
+    def _list_page(self, after, limit):
+        # start_offset is inclusive, so ask for the cursor's own blob, the
+        # page, and one more to tell whether there is a next page
+        try:
+            blobs = list(self.bucket.list_blobs(
+                max_results=limit + 2, start_offset=after[0] if after else None, match_glob=VIDEO_GLOB,
+                fields=LIST_FIELDS, timeout=READ_TIMEOUT, retry=READ_RETRY))
+        except Exception:
+            metrics.gcs_call('list', 'error')
+            logging.error("Failed to list a page of videos", exc_info=True)
+            return []
+        metrics.gcs_call('list')
+        return blobs
+
+    def _page_from_listing(self, blobs, after, limit):
+        # Thumbnails are not known until the full catalog is loaded
+        blobs = [blob for blob in blobs if blob.name.endswith('.mp4') and (not after or blob.name > after[0])]
+        videos = {}
+        for blob in blobs[:limit]:
+            video_id = os.path.splitext(blob.name)[0]
+            videos[video_id] = self._build_entry(video_id, blob)
+        next_cursor = None
+        if len(blobs) > limit:
+            next_cursor = encode_cursor('name', sort_key(videos[video_id], 'name'))
+        return videos, next_cursor
+
+    def _page_from_catalog(self, sort, after, limit):
+        videos = self._videos
+        field = sort.lstrip('-')
+        keys, ids = self._sorted_keys(field, videos)
+        if sort.startswith('-'):
+            end = bisect_left(keys, after) if after else len(keys)
+            start = max(0, end - limit)
+            page = ids[start:end][::-1]
+            more = start > 0
+        else:
+            start = bisect_right(keys, after) if after else 0
+            end = start + limit
+            page = ids[start:end]
+            more = end < len(ids)
+        next_cursor = encode_cursor(sort, sort_key(videos[page[-1]], field)) if page and more else None
+        return {video_id: videos[video_id] for video_id in page}, next_cursor
+
+    def _sorted_keys(self, field, videos):
+        cached = self._sorted.get(field)
+        if cached is not None and cached[0] is videos:
+            return cached[1], cached[2]
+        ordered = sorted((sort_key(video, field), video_id) for video_id, video in videos.items())
+        keys = [key for key, _ in ordered]
+        ids = [video_id for _, video_id in ordered]
+        self._sorted[field] = (videos, keys, ids)
+        return keys, ids
+
+    def get_video(self, video_id):
+        """Look up a single video by id with at most one metadata request"""
+        return self._lookup(video_id)[0]
+
+    def get_video_blob(self, video_id):
+        """Return the .mp4 blob of a video, found the same way as get_video()"""
+        return self._lookup(video_id)[1]
+
+    def _lookup(self, video_id):
+        cached = self._cached_lookup(video_id)
+        if cached is not None:
+            return cached
+        try:
+            blob = self.bucket.get_blob(f"{video_id}.mp4", timeout=READ_TIMEOUT, retry=READ_RETRY)
+        except Exception:
+            metrics.gcs_call('get', 'error')
+            logging.error(f"Failed to fetch metadata for video {video_id}", exc_info=True)
+            return None, None
+        return self._remember_lookup(video_id, blob)
+
+    def _cached_lookup(self, video_id):
+        """Return (video, blob) if it can be answered without GCS, else None"""
+        video = self._videos.get(video_id)
+        if video is not None:
+            if self.is_stale():
+                self.refresh_in_background()
+            metrics.cache_result('video_catalog', True)
+            return video, self._index.get(f"{video_id}.mp4")
+
+        cached = self._lookups.get(video_id)
+        if cached is not None and cached[2] > time.monotonic():
+            metrics.cache_result('video_catalog', True)
+            return cached[0], cached[1]
+        metrics.cache_result('video_catalog', False)
+        return None
+
+    def _remember_lookup(self, video_id, blob):
+        metrics.gcs_call('get')
+        video = None
+        if blob is not None:
+            video = self._build_entry(video_id, blob, self._thumbnail_name(video_id, self._index))
+        self._remember(video_id, video, blob, time.monotonic() + (self.ttl if video else self.negative_ttl))
+        return video, blob
+
+    def _remember(self, video_id, video, blob, expires_at):
+        if len(self._lookups) >= MAX_LOOKUPS:
+            now = time.monotonic()
+            self._lookups = {key: value for key, value in self._lookups.items() if value[2] > now}
+            if len(self._lookups) >= MAX_LOOKUPS:
+                self._lookups = {}
+        self._lookups[video_id] = (video, blob, expires_at)
+
+    def get_blob(self, name):
+        """Look up any blob seen by the last refresh by its name"""
+        return self._index.get(name)
+
+    def is_stale(self):
+        return self._loaded_at is None or time.monotonic() - self._loaded_at >= self.ttl
+
+    def refresh_in_background(self):
+        """Start a refresh thread unless one is already running"""
+        if not self._refresh_lock.acquire(blocking=False):
+            return False
+        thread = threading.Thread(target=self._refresh_locked, name='video-catalog-refresh', daemon=True)
+        try:
+            thread.start()
+        except Exception:
+            self._refresh_lock.release()
+            raise
+        return True
+
+    def refresh(self):
+        """Re-list the bucket synchronously"""
+        with self._refresh_lock:
+            # Another caller may have refreshed while we were waiting
+            if self._loaded_at is not None and not self.is_stale():
+                return self._videos
+            self._refresh()
+        return self._videos
+
+    def _refresh_locked(self):
+        try:
+            self._refresh()
+        finally:
+            self._refresh_lock.release()
+
+    def _refresh(self):
+        try:
+            self._apply_listing(self.bucket.list_blobs(fields=LIST_FIELDS, timeout=READ_TIMEOUT, retry=READ_RETRY))
+        except Exception:
+            self._refresh_failed()
+
+    def _apply_listing(self, blobs):
+        """Rebuild the catalog from one listing of the bucket"""
+        index = {blob.name: blob for blob in blobs}
+        metrics.gcs_call('list')
+        version = catalog_version(index)
+
+        videos = {}
+        changed = 0
+        for name, blob in index.items():
+            if not name.endswith('.mp4'):
+                continue
+            video_id = os.path.splitext(name)[0]
+            thumbnail_name = self._thumbnail_name(video_id, index)
+            previous = self._videos.get(video_id)
+            previous_blob = self._index.get(name)
+            if (previous is not None and previous_blob is not None
+                    and previous_blob.generation == blob.generation
+                    and previous.get('thumbnail_name') == thumbnail_name):
+                videos[video_id] = previous
+            else:
+                videos[video_id] = self._build_entry(video_id, blob, thumbnail_name)
+                changed += 1
+
+        removed = len(set(self._videos) - set(videos))
+        # Swap in whole dicts so readers never see a half-built catalog
+        self._videos = videos
+        self._index = index
+        self._lookups = {}
+        self.version = version
+        self._loaded_at = time.monotonic()
+        logging.info(f"Video catalog refreshed: {len(videos)} videos, {changed} changed, {removed} removed")
+
+    def _refresh_failed(self):
+        metrics.gcs_call('list', 'error')
+        logging.error("Failed to refresh video catalog", exc_info=True)
+        if self._loaded_at is None:
+            self._loaded_at = time.monotonic()
+
+    def _thumbnail_name(self, video_id, index):
+        for thumbnail_name in (f"{video_id}.jpg", f"{THUMBNAILS_PREFIX}{video_id}.jpg"):
+            if thumbnail_name in index:
+                return thumbnail_name
+        return None
+
+    def _build_entry(self, video_id, blob, thumbnail_name=None):
+        video = {
+            'title': blob.name.replace('_', ' ').replace('.mp4', ''),
+            'url': f"https://storage.googleapis.com/{self.bucket_name}/{blob.name}",
+            'raw_name': blob.name,
+            'size': blob.size,
+            'updated': blob.updated.isoformat() if blob.updated else None,
+            'public_url': blob.public_url if hasattr(blob, 'public_url') else None,
+        }
+        if thumbnail_name:
+            video['thumbnail_name'] = thumbnail_name
+            video['thumbnail'] = f"https://storage.googleapis.com/{self.bucket_name}/{thumbnail_name}"
+        return video
+
+
+def sort_key(video, field):
+    """The key a video sorts by in get_page(), unique thanks to the blob name"""
+    if field == 'name':
+        return [video['raw_name']]
+    return [video.get('updated') or '', video['raw_name']]
+
+
+def encode_cursor(sort, key):
+    return base64.urlsafe_b64encode(json.dumps([sort] + key).encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor, sort):
+    """Return the sort key a cursor points after, or None for the first page"""
+    if not cursor:
+        return None
+    try:
+        data = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        raise ValueError("Invalid cursor")
+    length = 2 if sort == 'name' else 3
+    if (not isinstance(data, list) or len(data) != length or data[0] != sort
+            or not all(isinstance(part, str) for part in data[1:])):
+        raise ValueError(f"Cursor does not belong to sort={sort}")
+    return data[1:]
+
+
+def parse_page_args(args):
+    """Return (sort, cursor, limit) from a request's query string, or raise ValueError"""
+    sort = args.get('sort', 'name')
+    if sort not in SORT_ORDERS:
+        raise ValueError(f"sort must be one of {', '.join(SORT_ORDERS)}")
+    try:
+        limit = int(args.get('limit', DEFAULT_PAGE_SIZE))
+    except ValueError:
+        raise ValueError("limit must be a number")
+    return sort, args.get('cursor') or None, min(max(limit, 1), MAX_PAGE_SIZE)
+
+
+def catalog_version(index):
+    """Hash the name and generation of every blob in a listing"""
+    digest = hashlib.sha1()
+    for name in sorted(index):
+        digest.update(f"{name}:{index[name].generation}\n".encode('utf-8'))
+    return digest.hexdigest()[:16]
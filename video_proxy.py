@@ -0,0 +1,137 @@
+from flask import Response
+from werkzeug.http import http_date, parse_date, parse_range_header, quote_etag
+import logging
+import time
+import os
+
+DEFAULT_CHUNK_SIZE = int(os.getenv('VIDEO_PROXY_CHUNK_SIZE', str(1024 * 1024)))
+CACHE_CONTROL = os.getenv('VIDEO_PROXY_CACHE_CONTROL', 'private, max-age=3600')
+# Times a response resumes from where GCS stopped sending before giving up
+STREAM_RETRIES = int(os.getenv('VIDEO_PROXY_STREAM_RETRIES', '3'))
+
+
+class RangeNotSatisfiable(Exception):
+    pass
+
+
+class IncompleteStream(Exception):
+    """GCS stopped sending a blob after the response headers went out.
+
+    Raised from the body iterator so that the server drops the connection
+    instead of ending the body early; the client sees fewer bytes than the
+    Content-Length it was promised and asks for the rest again.
+    """
+
+
+def resolve_range(range_header, size):
+    """Return the (start, end) byte window asked for, or None for the whole blob
+
+    end is inclusive. Multi-range requests are answered with the whole blob,
+    which HTTP allows; raises RangeNotSatisfiable for ranges past the end.
+    """
+    if not range_header:
+        return None
+    parsed = parse_range_header(range_header)
+    if parsed is None or parsed.units != 'bytes' or len(parsed.ranges) != 1:
+        return None
+    window = parsed.range_for_length(size)
+    if window is None:
+        raise RangeNotSatisfiable()
+    start, stop = window
+    return start, stop - 1
+
+
+def iter_blob_range(blob, start, end, chunk_size=DEFAULT_CHUNK_SIZE, retries=STREAM_RETRIES):
+    """Yield bytes start..end (inclusive) of a blob, one ranged download per chunk
+
+    A failed or short download is retried from the current offset up to
+    retries times per response; after that IncompleteStream is raised.
+    """
+    position = start
+    failures = 0
+    while position <= end:
+        chunk_end = min(position + chunk_size - 1, end)
+        try:
+            data = blob.download_as_bytes(start=position, end=chunk_end, checksum=None)
+            error = None if data else f"no bytes at offset {position}"
+        except Exception as e:
+            data, error = None, e
+        if error is not None:
+            failures += 1
+            if failures > retries:
+                raise IncompleteStream(f"Gave up on {blob.name} at byte {position} of {start}-{end}: {error}")
+            logging.warning(f"Resuming {blob.name} from byte {position}: {error}")
+            time.sleep(0.1 * failures)
+            continue
+        data = data[:end - position + 1]
+        yield data
+        position += len(data)
+
+
+def plan_blob_response(blob, request_headers, method='GET'):
+    """Work out how to answer a request for a blob from its metadata alone
+
+    Returns (status, headers, window), where window is the inclusive
+    (start, end) byte range to send or None when no body is sent. Shared by
+    the WSGI and ASGI apps, which only differ in how they stream the bytes.
+    """
+    size = blob.size
+    etag = quote_etag(str(blob.generation))
+    headers = {
+        'Accept-Ranges': 'bytes',
+        'ETag': etag,
+        'Cache-Control': CACHE_CONTROL,
+        'Content-Type': blob.content_type or 'video/mp4',
+    }
+    if blob.updated:
+        headers['Last-Modified'] = http_date(blob.updated)
+
+    if_none_match = request_headers.get('If-None-Match')
+    if if_none_match and etag in [tag.strip() for tag in if_none_match.split(',')]:
+        return 304, headers, None
+
+    range_header = request_headers.get('Range')
+    if_range = request_headers.get('If-Range')
+    if range_header and if_range and not _if_range_matches(if_range, etag, blob.updated):
+        # The client's partial copy is of an older version; send everything
+        range_header = None
+
+    try:
+        window = resolve_range(range_header, size)
+    except RangeNotSatisfiable:
+        headers['Content-Range'] = f"bytes */{size}"
+        return 416, headers, None
+
+    if window is None:
+        start, end, status = 0, size - 1, 200
+    else:
+        start, end = window
+        status = 206
+        headers['Content-Range'] = f"bytes {start}-{end}/{size}"
+    headers['Content-Length'] = str(end - start + 1)
+
+    if method == 'HEAD' or size == 0:
+        return status, headers, None
+    return status, headers, (start, end)
+
+
+def proxy_blob(blob, request, chunk_size=DEFAULT_CHUNK_SIZE):
+    """Stream a blob through the app, honouring Range and conditional headers
+
+    The ETag is the blob generation, so it changes whenever the object is
+    overwritten, and at most chunk_size bytes are held in memory per request.
+    """
+    status, headers, window = plan_blob_response(blob, request.headers, request.method)
+    if window is None:
+        return Response(status=status, headers=headers)
+    start, end = window
+    logging.debug(f"Proxying {blob.name} bytes {start}-{end}")
+    return Response(iter_blob_range(blob, start, end, chunk_size), status=status, headers=headers,
+                    direct_passthrough=True)
+
+
+def _if_range_matches(if_range, etag, updated):
+    if if_range.startswith('"') or if_range.startswith('W/'):
+        return if_range == etag
+    since = parse_date(if_range)
+    return since is not None and updated is not None and updated.replace(microsecond=0) <= since